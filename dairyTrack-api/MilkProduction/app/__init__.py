@@ -18,22 +18,19 @@ from app.routes.milk_expiry_check import milk_expiry_bp
 from app.routes.scheduler import scheduler_bp  # Add this import
 from app.socket import init_socketio
 from app.services.notificationScheduler import notification_scheduler
+from app.services.notificationQueue import notification_check_queue
+from app.services.recipient_directory import recipient_directory
+from app.services.notification_dedup import notification_dedup
+from app.services.notification_archive import notification_archive
+from app.services.batch_provenance import batch_provenance
+from app.services.user_cascade import user_cascade
+from app.services.session_store import session_store
+from app.services.password_hasher import password_hasher
+from app.services.notification import notification_service
 
 import os
 import logging
 
-# Tambahan untuk scheduler preventif
-from apscheduler.schedulers.background import BackgroundScheduler
-from app.services.notification import check_milk_production_and_notify, check_milk_expiry_and_notify
-
-background_scheduler = BackgroundScheduler()
-
-def start_background_jobs():
-    # Jalankan fungsi notifikasi setiap 1 jam
-    background_scheduler.add_job(check_milk_production_and_notify, 'interval', minutes=5)
-    background_scheduler.add_job(check_milk_expiry_and_notify, 'interval', minutes=5)
-    background_scheduler.start()
-
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
@@ -47,8 +44,35 @@ def create_app():
     db.init_app(app)
     migrate = Migrate(app, db)
 
-    # Initialize notification scheduler
+    # Initialize notification scheduler (single job registry for all background jobs)
     notification_scheduler.init_app(app)
+
+    # Initialize the debounced notification check queue (milking-session writes)
+    notification_check_queue.init_app(app)
+
+    # Cached notification recipients (roles and cow managers)
+    recipient_directory.init_app(app)
+
+    # LRU in front of the notification_dedup key table
+    notification_dedup.init_app(app)
+
+    # Archive of notifications moved out by the retention job
+    notification_archive.init_app(app)
+
+    # Sealed milk batch -> cows cache for expiry notifications
+    batch_provenance.init_app(app)
+
+    # Foreign key graph driven user deletion (background runs need the app)
+    user_cascade.init_app(app)
+
+    # Login sessions (user_sessions) behind an in-memory token cache
+    session_store.init_app(app)
+
+    # Password hash policy (PASSWORD_HASH_METHOD) and its hashing pool
+    password_hasher.init_app(app)
+
+    # Notification rate limit backend (shared SQL counters by default)
+    notification_service.init_app(app)
     
     # Enable CORS
     CORS(app, resources={r"/*": {"origins": "http://localhost:3000"}})
@@ -56,15 +80,14 @@ def create_app():
     # Initialize Socket.IO
     socketio = init_socketio(app)
 
-    # Start notification scheduler and background jobs after app context is available
+    # Start notification scheduler after app context is available
     @app.before_first_request
     def start_notification_scheduler():
         try:
             notification_scheduler.start()
-            start_background_jobs()  # Scheduler preventif
-            logging.info("Notification scheduler and background jobs started successfully")
+            logging.info("Notification scheduler started successfully")
         except Exception as e:
-            logging.error(f"Failed to start notification scheduler or background jobs: {str(e)}")
+            logging.error(f"Failed to start notification scheduler: {str(e)}")
 
     start_notification_scheduler()
 
@@ -9,4 +9,8 @@ from .blog_category import BlogCategory
 from .milking_sessions import MilkingSession
 from .milk_batches import MilkBatch
 from .daily_milk_summary import DailyMilkSummary
-from .notification import Notification
+from .notification import Notification, NotificationArchive, NotificationDedup, NotificationRateLimit, NotificationUnreadCount
+from .scheduler import SchedulerLease, JobRun
+from .socket_presence import SocketPresence
+from .user_session import UserSession
+from .change_counter import TableChangeCounter
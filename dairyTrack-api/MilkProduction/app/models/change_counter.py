@@ -0,0 +1,14 @@
+from sqlalchemy import Column, String, BigInteger, DateTime
+from app.database.database import db
+from datetime import datetime
+
+class TableChangeCounter(db.Model):
+    """Version of a table, bumped in the transaction of every write through the API"""
+    __tablename__ = 'table_change_counters'
+
+    table_name = Column(String(64), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    changed_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<TableChangeCounter(table_name='{self.table_name}', version={self.version})>"
@@ -1,10 +1,14 @@
-from sqlalchemy import Column, Integer, Date, Float, ForeignKey
+from sqlalchemy import Column, Integer, Date, Float, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime, date
 from app.database.database import db
 
 class DailyMilkSummary(db.Model):
     __tablename__ = 'daily_milk_summary'
+    __table_args__ = (
+        # One summary per cow per day; summary deltas are upserted on this key
+        UniqueConstraint('cow_id', 'date', name='uq_daily_milk_summary_cow_date'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     cow_id = Column(Integer, ForeignKey('cows.id'), nullable=False)
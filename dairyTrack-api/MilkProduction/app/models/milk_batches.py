@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, Enum
+from sqlalchemy import Column, Integer, String, DateTime, Float, Index, Enum
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -11,6 +11,12 @@ class MilkStatus(enum.Enum):
 
 class MilkBatch(db.Model):
     __tablename__ = 'milk_batches'
+    __table_args__ = (
+        # Keyset pagination on (production_date, id)
+        Index('ix_milk_batches_production_date_id', 'production_date', 'id'),
+        # Expiry scans: status = FRESH AND expiry_date <= :horizon
+        Index('ix_milk_batches_status_expiry_date', 'status', 'expiry_date'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     batch_number = Column(String(50), unique=True, nullable=False)
@@ -1,10 +1,14 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Float, Index, ForeignKey
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database.database import db
 
 class MilkingSession(db.Model):
     __tablename__ = 'milking_sessions'
+    __table_args__ = (
+        # Keyset pagination on (milking_time, id)
+        Index('ix_milking_sessions_milking_time_id', 'milking_time', 'id'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     cow_id = Column(Integer, ForeignKey('cows.id'), nullable=False)
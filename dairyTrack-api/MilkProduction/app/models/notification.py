@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, DateTime, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, Date, DateTime, Text, Index, UniqueConstraint, func
 from sqlalchemy.orm import relationship
 from app.database.database import db
 from datetime import datetime
@@ -9,6 +9,12 @@ def wib_now():
 
 class Notification(db.Model):
     __tablename__ = 'notifications'
+    __table_args__ = (
+        # Read path: a user's (unread) notifications, newest first
+        Index('ix_notifications_user_id_is_read_created_at', 'user_id', 'is_read', 'created_at'),
+        # Retention sweep: expired rows by age
+        Index('ix_notifications_created_at', 'created_at'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
@@ -30,4 +36,78 @@ class Notification(db.Model):
         return (f"<Notification(id={self.id}, user_id={self.user_id}, "
                 f"cow_id={self.cow_id}, type='{self.type}', "
                 f"is_read={self.is_read}, created_at={self.created_at}, "
-                f"created_at_wib={self.created_at_wib})>")
\ No newline at end of file
+                f"created_at_wib={self.created_at_wib})>")
+
+
+class NotificationArchive(db.Model):
+    """Notification moved out of the hot table once past retention"""
+    __tablename__ = 'notifications_archive'
+    __table_args__ = (
+        Index('ix_notifications_archive_user_id_created_at', 'user_id', 'created_at'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    notification_id = Column(Integer, nullable=False, index=True)  # id in `notifications`
+    # No foreign keys: archived rows must not block deleting users or cows
+    user_id = Column(Integer, nullable=False)
+    cow_id = Column(Integer, nullable=True)
+    message = Column(Text, nullable=False)
+    type = Column(String(30), nullable=False)
+    is_read = Column(Boolean, default=False)
+    created_at = Column(DateTime, nullable=True)
+    created_at_wib = Column(DateTime(timezone=True), nullable=True)
+    archived_at = Column(DateTime, nullable=False, server_default=func.now())
+
+    def __repr__(self):
+        return (f"<NotificationArchive(notification_id={self.notification_id}, user_id={self.user_id}, "
+                f"cow_id={self.cow_id}, type='{self.type}', created_at={self.created_at}, "
+                f"archived_at={self.archived_at})>")
+
+
+class NotificationDedup(db.Model):
+    """One row per notification that must not be duplicated on later checks"""
+    __tablename__ = 'notification_dedup'
+    __table_args__ = (
+        UniqueConstraint('user_id', 'cow_id', 'type', 'bucket_date', 'batch_number',
+                         name='uq_notification_dedup_key'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    cow_id = Column(Integer, ForeignKey('cows.id', ondelete='CASCADE'), nullable=False)
+    type = Column(String(20), nullable=False)
+    bucket_date = Column(Date, nullable=False)
+    batch_number = Column(String(50), nullable=False, default='')  # '' when not batch-specific
+    notification_id = Column(Integer, nullable=True)  # row refreshed by later checks
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return (f"<NotificationDedup(user_id={self.user_id}, cow_id={self.cow_id}, "
+                f"type='{self.type}', bucket_date={self.bucket_date}, "
+                f"batch_number='{self.batch_number}', notification_id={self.notification_id})>")
+
+
+class NotificationRateLimit(db.Model):
+    """Shared sliding-window notification budget of one user"""
+    __tablename__ = 'notification_rate_limits'
+
+    key = Column(String(64), primary_key=True)
+    window_start = Column(DateTime, nullable=False)  # start of the current fixed window
+    count = Column(Integer, nullable=False, default=0)
+    previous_count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return (f"<NotificationRateLimit(key='{self.key}', window_start={self.window_start}, "
+                f"count={self.count}, previous_count={self.previous_count})>")
+
+
+class NotificationUnreadCount(db.Model):
+    """Maintained number of unread notifications of one user"""
+    __tablename__ = 'notification_unread_counts'
+
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    unread_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<NotificationUnreadCount(user_id={self.user_id}, unread_count={self.unread_count})>"
@@ -0,0 +1,52 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float, Text, Index
+from app.database.database import db
+from datetime import datetime
+
+class SchedulerLease(db.Model):
+    """Leader lease row; only the current holder runs scheduled jobs"""
+    __tablename__ = 'scheduler_leases'
+
+    name = Column(String(64), primary_key=True)
+    holder = Column(String(128), nullable=False)
+    acquired_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return (f"<SchedulerLease(name='{self.name}', holder='{self.holder}', "
+                f"expires_at={self.expires_at})>")
+
+class JobRun(db.Model):
+    """One execution of a scheduled job"""
+    __tablename__ = 'job_runs'
+    __table_args__ = (
+        Index('ix_job_runs_job_id_started_at', 'job_id', 'started_at'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_id = Column(String(64), nullable=False)
+    worker = Column(String(128), nullable=False)
+    status = Column(String(20), nullable=False)  # 'success', 'failed'
+    started_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+    duration_ms = Column(Float, nullable=True)
+    rows_scanned = Column(Integer, default=0, nullable=False)
+    notifications_created = Column(Integer, default=0, nullable=False)
+    error = Column(Text, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_id': self.job_id,
+            'worker': self.worker,
+            'status': self.status,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'duration_ms': self.duration_ms,
+            'rows_scanned': self.rows_scanned,
+            'notifications_created': self.notifications_created,
+            'error': self.error
+        }
+
+    def __repr__(self):
+        return (f"<JobRun(id={self.id}, job_id='{self.job_id}', status='{self.status}', "
+                f"duration_ms={self.duration_ms})>")
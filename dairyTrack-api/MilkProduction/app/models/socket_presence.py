@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from app.database.database import db
+from datetime import datetime
+
+class SocketPresence(db.Model):
+    """One registered Socket.IO connection, visible to every worker"""
+    __tablename__ = 'socket_presence'
+    __table_args__ = (
+        Index('ix_socket_presence_user_id', 'user_id'),
+        Index('ix_socket_presence_worker', 'worker'),
+        Index('ix_socket_presence_last_seen', 'last_seen'),
+    )
+
+    sid = Column(String(64), primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    role_id = Column(Integer, nullable=True)
+    worker = Column(String(128), nullable=False)
+    connected_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_seen = Column(DateTime, default=datetime.utcnow, nullable=False)  # worker heartbeat
+
+    def to_dict(self):
+        return {
+            'sid': self.sid,
+            'user_id': self.user_id,
+            'role_id': self.role_id,
+            'worker': self.worker,
+            'connected_at': self.connected_at.isoformat() if self.connected_at else None,
+            'last_seen': self.last_seen.isoformat() if self.last_seen else None
+        }
+
+    def __repr__(self):
+        return f"<SocketPresence(sid='{self.sid}', user_id={self.user_id}, worker='{self.worker}')>"
@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from app.database.database import db
+from datetime import datetime
+
+class UserSession(db.Model):
+    """One logged-in device of a user, looked up by its token"""
+    __tablename__ = 'user_sessions'
+    __table_args__ = (
+        Index('ix_user_sessions_user_id', 'user_id'),
+        # Purge of expired sessions
+        Index('ix_user_sessions_expires_at', 'expires_at'),
+    )
+
+    token = Column(String(64), primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    device = Column(String(255), nullable=True)  # User-Agent at login
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'device': self.device,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None
+        }
+
+    def __repr__(self):
+        return (f"<UserSession(user_id={self.user_id}, device='{self.device}', "
+                f"expires_at={self.expires_at})>")
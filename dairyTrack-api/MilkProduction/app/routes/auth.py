@@ -1,14 +1,11 @@
-from datetime import datetime, timedelta
 from flask import Blueprint, current_app, request, jsonify
 from app.models.users import User
 from app.database.database import db
-import uuid
-from werkzeug.security import check_password_hash
+from app.services.session_store import session_store, token_from_request
+from app.services.password_hasher import password_hasher
 
 auth_bp = Blueprint('auth', __name__)
 
-TOKEN_EXPIRATION = 7200 # 2 jam
-
 @auth_bp.route('/login', methods=['POST'])
 def login():
     data = request.get_json()
@@ -23,16 +20,18 @@ def login():
     if not user:
         return jsonify({"success": False, "message": "Invalid credentials"}), 401
 
-    if check_password_hash(user.password, password):
-        # Generate token dan update user
-        token = str(uuid.uuid4())
-        token_created_at = datetime.utcnow()
+    if password_hasher.verify_user(user, password):
+        # Buat sesi baru per perangkat (user_sessions)
+        session = session_store.create(user, device=request.headers.get('User-Agent'))
+        token = session.token
+        token_created_at = session.created_at
+        token_expires_at = session.expires_at
+
+        # users.token tetap diisi untuk layanan lain (HealthCheck, Selling)
         user.token = token
         user.token_created_at = token_created_at
         db.session.commit()
-
-        # Hitung expired dari token_created_at + TOKEN_EXPIRATION
-        token_expires_at = token_created_at + timedelta(seconds=TOKEN_EXPIRATION)
+        session_store.remember(session, user)
 
         return jsonify({
             "success": True,
@@ -44,7 +43,7 @@ def login():
             "role": user.role.name,
             "role_id": user.role.id,
             "email": user.email,
-            "expires_in": TOKEN_EXPIRATION,
+            "expires_in": session_store.lifetime_seconds,
             "token_created_at": token_created_at.isoformat() + "Z",
             "token_expires_at": token_expires_at.isoformat() + "Z"
         }), 200
@@ -59,15 +58,25 @@ def logout():
     if not token:
         return jsonify({"success": False, "message": "Token is required"}), 400
 
-    user = User.query.filter_by(token=token).first()
+    user_id = session_store.revoke(token)
+
+    # Jika sesi dengan token ditemukan
+    if user_id is not None:
+        user = db.session.get(User, user_id)
+        if user and user.token == token:
+            user.token = None
+            user.token_created_at = None
+        db.session.commit()
+        return jsonify({"success": True, "message": "Logout successful"}), 200
 
-    # Jika user dengan token ditemukan
+    # Token dari sebelum user_sessions ada hanya tersimpan di users.token
+    user = User.query.filter_by(token=token).first()
     if user:
         user.token = None
         user.token_created_at = None
         db.session.commit()
         return jsonify({"success": True, "message": "Logout successful"}), 200
-    
+
     # Jika token tidak ditemukan, mencoba mencari user berdasarkan token dari request
     # untuk menangani kasus di mana token di database kosong tapi user masih mencoba logout
     # dengan token lama yang tersimpan di client
@@ -89,4 +98,18 @@ def logout():
         pass
     
     # Jika tidak ada cara untuk mengidentifikasi user atau terjadi error
-    return jsonify({"success": True, "message": "No active session found, considered as logged out"}), 200
\ No newline at end of file
+    return jsonify({"success": True, "message": "No active session found, considered as logged out"}), 200
+
+@auth_bp.route('/session', methods=['GET'])
+def session_info():
+    """Validate the token of the request (Authorization: Bearer / X-Auth-Token)"""
+    session = session_store.validate(token_from_request())
+    if session is None:
+        return jsonify({"success": False, "message": "Invalid or expired token"}), 401
+
+    return jsonify({
+        "success": True,
+        "user_id": session.user_id,
+        "role_id": session.role_id,
+        "token_expires_at": session.expires_at.isoformat() + "Z"
+    }), 200
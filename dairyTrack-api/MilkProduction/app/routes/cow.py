@@ -1,11 +1,12 @@
 from flask import Blueprint, request, jsonify
 from app.models.cows import Cow
 from app.database.database import db
-from fpdf import FPDF
 from app.models.daily_milk_summary import DailyMilkSummary  # Add this line
-from flask import send_file
-from io import BytesIO
-import pandas as pd
+from app.services.batch_provenance import batch_provenance
+from app.services.change_counter import change_counter
+from app.services.streaming_export import (
+    ExportColumn, stream_query, new_pdf_report, write_pdf_table, pdf_response, xlsx_response
+)
 
 cow_bp = Blueprint('cow', __name__)
 
@@ -39,6 +40,7 @@ def add_cow():
 
         # Simpan ke database
         db.session.add(new_cow)
+        change_counter.bump('cows')
         db.session.commit()
 
         return jsonify({"message": "Cow added successfully", "cow": {
@@ -123,6 +125,7 @@ def update_cow(cow_id):
         cow.weight = data.get('weight', cow.weight)
         cow.gender = data.get('gender', cow.gender)
 
+        change_counter.bump('cows')
         db.session.commit()
 
         return jsonify({"message": "Cow updated successfully", "cow": {
@@ -167,6 +170,7 @@ def delete_cow(cow_id):
         from app.models.milking_sessions import MilkingSession
         milking_sessions = MilkingSession.query.filter_by(cow_id=cow_id).all()
         print(f"[DEBUG] [DELETE COW] Jumlah milking_sessions terkait sapi ID {cow_id}: {len(milking_sessions)}")
+        batch_ids = {session.milk_batch_id for session in milking_sessions}
         for session in milking_sessions:
             db.session.delete(session)
         if milking_sessions:
@@ -190,7 +194,10 @@ def delete_cow(cow_id):
         # Re-enable foreign key checks
         db.session.execute(text("SET FOREIGN_KEY_CHECKS = 1"))
         
+        change_counter.bump('cows')
         db.session.commit()
+        # The deleted sessions no longer tie this cow to its batches
+        batch_provenance.forget(batch_ids)
         print(f"[DEBUG] [DELETE COW] Sapi ID {cow_id} beserta data terkait berhasil dihapus dari database.")
         print("="*50)
 
@@ -208,57 +215,34 @@ def delete_cow(cow_id):
         print("="*50)
         return jsonify({"error": str(e)}), 500
 
+def _cow_export_query():
+    """Column-level cow query for the exports, streamed in id order"""
+    return db.session.query(
+        Cow.name, Cow.breed, Cow.gender, Cow.lactation_phase, Cow.weight, Cow.birth
+    ).order_by(Cow.id)
+
+
 @cow_bp.route('/export/pdf', methods=['GET'])
 def export_cows_pdf():
     """
     Mengekspor data sapi ke dalam file PDF.
     """
     try:
-        # Ambil semua data sapi dari database
-        cows = Cow.query.all()
-
-        # Buat PDF
-        pdf = FPDF()
-        pdf.set_auto_page_break(auto=True, margin=15)
-        pdf.add_page()
-        pdf.set_font("Arial", size=12)
-
-        # Tambahkan deskripsi di bagian atas
-        pdf.set_font("Arial", style="B", size=16)
-        pdf.cell(200, 10, txt="Laporan Data Sapi", ln=True, align='C')
-        pdf.ln(5)
-        pdf.set_font("Arial", size=10)
-        pdf.cell(200, 10, txt="Berikut adalah daftar sapi yang terdaftar dalam sistem.", ln=True, align='C')
-        pdf.ln(10)
-
-        # Tambahkan header tabel dengan warna latar belakang
-        pdf.set_fill_color(173, 216, 230)  # Warna biru muda (RGB)
-        pdf.set_text_color(0, 0, 0)  # Warna teks hitam
-        pdf.set_font("Arial", style="B", size=10)
-        pdf.cell(20, 10, "NO", border=1, align='C', fill=True)
-        pdf.cell(40, 10, "Name", border=1, align='C', fill=True)
-        pdf.cell(40, 10, "Breed", border=1, align='C', fill=True)
-        pdf.cell(40, 10, "Gender", border=1, align='C', fill=True)
-        pdf.cell(50, 10, "Lactation Phase", border=1, align='C', fill=True)
-        pdf.ln()
-
-        # Isi data
-        pdf.set_font("Arial", size=10)
-        for idx, cow in enumerate(cows, start=1):
-            pdf.cell(20, 10, str(idx), border=1, align='C')
-            pdf.cell(40, 10, cow.name, border=1)
-            pdf.cell(40, 10, cow.breed, border=1)
-            pdf.cell(40, 10, cow.gender, border=1)
-            pdf.cell(50, 10, cow.lactation_phase or "-", border=1)
-            pdf.ln()
-
-       # Simpan PDF ke buffer
-        buffer = BytesIO()
-        pdf_bytes = pdf.output(dest='S').encode('latin1')
-        buffer.write(pdf_bytes)
-        buffer.seek(0)
-
-        return send_file(buffer, as_attachment=True, download_name="cows.pdf", mimetype='application/pdf')
+        pdf = new_pdf_report("Laporan Data Sapi", "Berikut adalah daftar sapi yang terdaftar dalam sistem.")
+        columns = [
+            ExportColumn("NO", pdf_width=20, align='C'),
+            ExportColumn("Name", pdf_width=40),
+            ExportColumn("Breed", pdf_width=40),
+            ExportColumn("Gender", pdf_width=40),
+            ExportColumn("Lactation Phase", pdf_width=50)
+        ]
+        rows = (
+            (idx, cow.name, cow.breed, cow.gender, cow.lactation_phase or "-")
+            for idx, cow in enumerate(stream_query(_cow_export_query()), start=1)
+        )
+        write_pdf_table(pdf, columns, rows)
+
+        return pdf_response(pdf, "cows.pdf")
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -270,50 +254,21 @@ def export_cows_excel():
     Mengekspor data sapi ke dalam file Excel.
     """
     try:
-        # Ambil semua data sapi dari database
-        cows = Cow.query.all()
-
-        # Format data sapi menjadi list of dictionaries
-        cows_list = [{
-            "NO": idx,
-            "Name": cow.name,
-            "Breed": cow.breed,
-            "Gender": cow.gender,
-            "Lactation Phase": cow.lactation_phase or "-",
-            "Weight": cow.weight or "-",
-            "Birth": cow.birth
-        } for idx, cow in enumerate(cows, start=1)]
-
-        # Buat DataFrame
-        df = pd.DataFrame(cows_list)
-
-        # Simpan ke buffer dengan pewarnaan
-        buffer = BytesIO()
-        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Cows')
-
-            # Akses workbook dan worksheet untuk styling
-            workbook = writer.book
-            worksheet = writer.sheets['Cows']
-
-            # Tambahkan pewarnaan header
-            from openpyxl.styles import Font, PatternFill
-            header_fill = PatternFill(start_color="ADD8E6", end_color="ADD8E6", fill_type="solid")
-            header_font = Font(bold=True)
-
-            for cell in worksheet[1]:  # Baris pertama adalah header
-                cell.fill = header_fill
-                cell.font = header_font
-
-            # Atur lebar kolom secara otomatis
-            for column_cells in worksheet.columns:
-                max_length = max(len(str(cell.value)) for cell in column_cells if cell.value)
-                adjusted_width = max_length + 2
-                worksheet.column_dimensions[column_cells[0].column_letter].width = adjusted_width
-
-        buffer.seek(0)
-
-        return send_file(buffer, as_attachment=True, download_name="cows.xlsx", mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        columns = [
+            ExportColumn("NO", width=6),
+            ExportColumn("Name", width=20),
+            ExportColumn("Breed", width=20),
+            ExportColumn("Gender", width=10),
+            ExportColumn("Lactation Phase", width=17),
+            ExportColumn("Weight", width=10),
+            ExportColumn("Birth", width=12)
+        ]
+        rows = (
+            (idx, cow.name, cow.breed, cow.gender, cow.lactation_phase or "-",
+             cow.weight or "-", cow.birth)
+            for idx, cow in enumerate(stream_query(_cow_export_query()), start=1)
+        )
+        return xlsx_response('Cows', columns, rows, "cows.xlsx")
 
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
@@ -1,45 +1,15 @@
 from flask import Blueprint, jsonify, request
-from sqlalchemy import and_, or_
-from datetime import datetime, timedelta
+from datetime import datetime
 from app.models.milk_batches import MilkBatch, MilkStatus
-from app.models.milking_sessions import MilkingSession
-from app.models.users import User
-from app.models.cows import Cow
 from app.database.database import db
 from app.services.notification import check_milk_expiry_and_notify
+from app.services.milk_expiry import (
+    ExpiryBuckets, is_admin_role, managed_batch_filter, scoped_batches,
+    count_managed_batches, bucket_expiring_batches, merge_buckets, batch_expiry_service
+)
 
 milk_expiry_bp = Blueprint('milk_expiry', __name__)
 
-def get_user_managed_batches(user_id):
-    """Get batch IDs that are managed by the specific user"""
-    try:
-        # Get user
-        user = User.query.get(user_id)
-        if not user:
-            return []
-        
-        # Jika user adalah admin, kembalikan semua batch
-        if user.role == 'Admin':  # Pastikan atribut role sesuai dengan model User
-            return [batch.id for batch in MilkBatch.query.all()]
-        
-        # Get cow IDs managed by this user
-        managed_cow_ids = [cow.id for cow in user.managed_cows.all()]
-        
-        if not managed_cow_ids:
-            return []
-        
-        # Get batch IDs from milking sessions where cow_id is in managed_cow_ids
-        batch_ids = db.session.query(MilkingSession.milk_batch_id)\
-            .filter(MilkingSession.cow_id.in_(managed_cow_ids))\
-            .filter(MilkingSession.milk_batch_id.isnot(None))\
-            .distinct().all()
-        
-        return [batch_id[0] for batch_id in batch_ids if batch_id[0] is not None]
-    
-    except Exception as e:
-        print(f"Error getting user managed batches: {str(e)}")
-        return []
-
 def calculate_time_remaining(expiry_date, current_time):
     """Calculate time remaining until expiry"""
     if not expiry_date:
@@ -65,35 +35,19 @@ def calculate_time_remaining(expiry_date, current_time):
 def auto_update_expired_batches(user_id=None, user_role=None):
     """Automatically update expired milk batches and send notifications"""
     try:
-        current_time = datetime.utcnow()
-        
-        # Build query for expired batches
-        query = MilkBatch.query.filter(
-            and_(
-                MilkBatch.status == MilkStatus.FRESH,
-                MilkBatch.expiry_date <= current_time
-            )
-        )
-        
+        batch_filter = None
         # Filter by user if user_id is provided and user is not admin
-        if user_id and user_role and user_role.lower() != 'admin':
-            managed_batch_ids = get_user_managed_batches(user_id)
-            if not managed_batch_ids:
-                return 0, 0
-            query = query.filter(MilkBatch.id.in_(managed_batch_ids))
+        if user_id and user_role and not is_admin_role(user_role):
+            batch_filter = managed_batch_filter(user_id, user_role)
         
-        expired_batches = query.all()
-        
-        # Update expired batches
-        for batch in expired_batches:
-            batch.status = MilkStatus.EXPIRED
-            batch.updated_at = current_time
+        # One set-based UPDATE; only the batches it changed are returned
+        expired_batches = batch_expiry_service.expire_due_batches(datetime.utcnow(), batch_filter)
         
         if expired_batches:
             db.session.commit()
             
-        # Check expiry and send notifications
-        notification_count = check_milk_expiry_and_notify()
+        # Check expiry and send notifications (including the batches expired above)
+        notification_count = check_milk_expiry_and_notify([batch.id for batch in expired_batches])
         
         return len(expired_batches), notification_count
         
@@ -123,14 +77,10 @@ def get_milk_batches_by_status():
                 'message': 'Invalid user ID format'
             }), 400
         
-        # Get managed batch IDs for this user
-        # Jika user_role adalah Admin, dapatkan semua batch
-        if user_role and user_role.lower() == 'admin':
-            managed_batch_ids = [batch.id for batch in MilkBatch.query.all()]
-        else:
-            managed_batch_ids = get_user_managed_batches(user_id)
+        # Count managed batches for this user (Admin: semua batch)
+        managed_batch_count = count_managed_batches(user_id, user_role)
         
-        if not managed_batch_ids:
+        if not managed_batch_count:
             return jsonify({
                 'success': True,
                 'data': {
@@ -163,25 +113,16 @@ def get_milk_batches_by_status():
         current_time = datetime.utcnow()
         
         # Get all batches grouped by status, filtered by user's managed batches
-        fresh_batches = MilkBatch.query.filter(
-            and_(
-                MilkBatch.status == MilkStatus.FRESH,
-                MilkBatch.id.in_(managed_batch_ids)
-            )
+        fresh_batches = scoped_batches(user_id, user_role).filter(
+            MilkBatch.status == MilkStatus.FRESH
         ).all()
         
-        expired_batches = MilkBatch.query.filter(
-            and_(
-                MilkBatch.status == MilkStatus.EXPIRED,
-                MilkBatch.id.in_(managed_batch_ids)
-            )
+        expired_batches = scoped_batches(user_id, user_role).filter(
+            MilkBatch.status == MilkStatus.EXPIRED
         ).all()
         
-        used_batches = MilkBatch.query.filter(
-            and_(
-                MilkBatch.status == MilkStatus.USED,
-                MilkBatch.id.in_(managed_batch_ids)
-            )
+        used_batches = scoped_batches(user_id, user_role).filter(
+            MilkBatch.status == MilkStatus.USED
         ).all()
         
         def serialize_batch(batch):
@@ -218,7 +159,7 @@ def get_milk_batches_by_status():
             'user_info': {
                 'user_id': user_id,
                 'user_role': user_role,
-                'managed_batch_count': len(managed_batch_ids)
+                'managed_batch_count': managed_batch_count
             }
         }
         
@@ -255,14 +196,10 @@ def expiry_analysis():
                 'message': 'Invalid user ID format'
             }), 400
         
-        # Get managed batch IDs for this user
-        # Jika user_role adalah Admin, dapatkan semua batch
-        if user_role and user_role.lower() == 'admin':
-            managed_batch_ids = [batch.id for batch in MilkBatch.query.all()]
-        else:
-            managed_batch_ids = get_user_managed_batches(user_id)
+        # Count managed batches for this user (Admin: semua batch)
+        managed_batch_count = count_managed_batches(user_id, user_role)
         
-        if not managed_batch_ids:
+        if not managed_batch_count:
             return jsonify({
                 'success': True,
                 'data': {
@@ -294,44 +231,17 @@ def expiry_analysis():
         
         current_time = datetime.utcnow()
         
-        # Get batches expiring soon (within next 2 hours), filtered by user's managed batches
-        expiring_soon_2_hours = MilkBatch.query.filter(
-            and_(
-                MilkBatch.status == MilkStatus.FRESH,
-                MilkBatch.expiry_date > current_time,
-                MilkBatch.expiry_date <= current_time + timedelta(hours=2),
-                MilkBatch.id.in_(managed_batch_ids)
-            )
-        ).all()
-        
-        # Get overdue batches (already expired but still marked as fresh)
-        overdue_expired = MilkBatch.query.filter(
-            and_(
-                MilkBatch.status == MilkStatus.FRESH,
-                MilkBatch.expiry_date <= current_time,
-                MilkBatch.id.in_(managed_batch_ids)
-            )
-        ).all()
-        
-        # Get batches expiring within 1 hour
-        expiring_1_hour = MilkBatch.query.filter(
-            and_(
-                MilkBatch.status == MilkStatus.FRESH,
-                MilkBatch.expiry_date > current_time,
-                MilkBatch.expiry_date <= current_time + timedelta(hours=1),
-                MilkBatch.id.in_(managed_batch_ids)
-            )
-        ).all()
-        
-        # Get batches expiring within 4 hours
-        expiring_4_hours = MilkBatch.query.filter(
-            and_(
-                MilkBatch.status == MilkStatus.FRESH,
-                MilkBatch.expiry_date > current_time,
-                MilkBatch.expiry_date <= current_time + timedelta(hours=4),
-                MilkBatch.id.in_(managed_batch_ids)
-            )
-        ).all()
+        # Bucket all fresh batches expiring within 4 hours (or overdue) in one scan
+        buckets = bucket_expiring_batches(user_id, user_role, current_time)
+        overdue_expired = buckets[ExpiryBuckets.OVERDUE]
+        expiring_1_hour = buckets[ExpiryBuckets.WITHIN_1_HOUR]
+        expiring_soon_2_hours = merge_buckets(
+            buckets, ExpiryBuckets.WITHIN_1_HOUR, ExpiryBuckets.WITHIN_2_HOURS
+        )
+        expiring_4_hours = merge_buckets(
+            buckets, ExpiryBuckets.WITHIN_1_HOUR, ExpiryBuckets.WITHIN_2_HOURS,
+            ExpiryBuckets.WITHIN_4_HOURS
+        )
         
         def serialize_batch_with_urgency(batch):
             time_remaining = calculate_time_remaining(batch.expiry_date, current_time)
@@ -346,22 +256,17 @@ def expiry_analysis():
                 'hours_until_expiry': time_remaining['total_hours'] if time_remaining else None
             }
         
-        # Calculate summary statistics
-        volume_expiring_soon = sum(batch.total_volume for batch in expiring_soon_2_hours)
-        volume_overdue = sum(batch.total_volume for batch in overdue_expired)
-        critical_alerts = len(overdue_expired) + len(expiring_1_hour)
-        
         result = {
             'current_time': current_time.isoformat(),
-            'expiring_soon_2_hours': [serialize_batch_with_urgency(batch) for batch in expiring_soon_2_hours],
-            'overdue_expired': [serialize_batch_with_urgency(batch) for batch in overdue_expired],
-            'expiring_1_hour': [serialize_batch_with_urgency(batch) for batch in expiring_1_hour],
-            'expiring_4_hours': [serialize_batch_with_urgency(batch) for batch in expiring_4_hours],
+            'expiring_soon_2_hours': [serialize_batch_with_urgency(batch) for batch in expiring_soon_2_hours.batches],
+            'overdue_expired': [serialize_batch_with_urgency(batch) for batch in overdue_expired.batches],
+            'expiring_1_hour': [serialize_batch_with_urgency(batch) for batch in expiring_1_hour.batches],
+            'expiring_4_hours': [serialize_batch_with_urgency(batch) for batch in expiring_4_hours.batches],
             'summary': {
-                'total_batches': len(managed_batch_ids),
-                'volume_expiring_soon': float(volume_expiring_soon),
-                'volume_overdue': float(volume_overdue),
-                'critical_alerts': critical_alerts
+                'total_batches': managed_batch_count,
+                'volume_expiring_soon': float(expiring_soon_2_hours.volume),
+                'volume_overdue': float(overdue_expired.volume),
+                'critical_alerts': overdue_expired.count + expiring_1_hour.count
             },
             'auto_update_info': {
                 'batches_auto_expired': updated_count,
@@ -370,7 +275,7 @@ def expiry_analysis():
             'user_info': {
                 'user_id': user_id,
                 'user_role': user_role,
-                'managed_batch_count': len(managed_batch_ids)
+                'managed_batch_count': managed_batch_count
             }
         }
         
@@ -417,14 +322,10 @@ def get_milk_batches_by_specific_status(status):
                 'message': f'Invalid status: {status}. Valid statuses are: {", ".join(valid_statuses)}'
             }), 400
         
-        # Get managed batch IDs for this user
-        # Jika user_role adalah Admin, dapatkan semua batch
-        if user_role and user_role.lower() == 'admin':
-            managed_batch_ids = [batch.id for batch in MilkBatch.query.all()]
-        else:
-            managed_batch_ids = get_user_managed_batches(user_id)
+        # Count managed batches for this user (Admin: semua batch)
+        managed_batch_count = count_managed_batches(user_id, user_role)
         
-        if not managed_batch_ids:
+        if not managed_batch_count:
             return jsonify({
                 'success': True,
                 'data': {
@@ -461,11 +362,8 @@ def get_milk_batches_by_specific_status(status):
         
         # Build query with pagination
         current_time = datetime.utcnow()
-        query = MilkBatch.query.filter(
-            and_(
-                MilkBatch.status == status_enum,
-                MilkBatch.id.in_(managed_batch_ids)
-            )
+        query = scoped_batches(user_id, user_role).filter(
+            MilkBatch.status == status_enum
         ).order_by(MilkBatch.created_at.desc())
         
         # Get total count
@@ -505,7 +403,7 @@ def get_milk_batches_by_specific_status(status):
             'user_info': {
                 'user_id': user_id,
                 'user_role': user_role,
-                'managed_batch_count': len(managed_batch_ids)
+                'managed_batch_count': managed_batch_count
             }
         }
         
@@ -542,20 +440,11 @@ def update_expired_milk_batches():
                 'message': 'Invalid user ID format'
             }), 400
         
-        current_time = datetime.utcnow()
-        
-        # Build query for expired batches
-        query = MilkBatch.query.filter(
-            and_(
-                MilkBatch.status == MilkStatus.FRESH,
-                MilkBatch.expiry_date <= current_time
-            )
-        )
-        
+        batch_filter = None
         # Filter by user if user is not admin
-        if user_role and user_role.lower() != 'admin':
-            managed_batch_ids = get_user_managed_batches(user_id)
-            if not managed_batch_ids:
+        if user_role and not is_admin_role(user_role):
+            managed_batch_count = count_managed_batches(user_id, user_role)
+            if not managed_batch_count:
                 return jsonify({
                     'success': True,
                     'data': {
@@ -570,25 +459,20 @@ def update_expired_milk_batches():
                         }
                     }
                 }), 200
-            query = query.filter(MilkBatch.id.in_(managed_batch_ids))
-        
-        expired_batches = query.all()
+            batch_filter = managed_batch_filter(user_id, user_role)
+        else:
+            managed_batch_count = 'all'
         
-        # Update expired batches
-        updated_batches = []
-        total_volume_updated = 0
+        # One set-based UPDATE; only the batches it changed are returned
+        expired_batches = batch_expiry_service.expire_due_batches(datetime.utcnow(), batch_filter)
         
-        for batch in expired_batches:
-            batch.status = MilkStatus.EXPIRED
-            batch.updated_at = current_time
-            total_volume_updated += batch.total_volume if batch.total_volume else 0
-            
-            updated_batches.append({
-                'id': batch.id,
-                'batch_number': batch.batch_number,
-                'total_volume': float(batch.total_volume) if batch.total_volume else 0,
-                'expiry_date': batch.expiry_date.isoformat() if batch.expiry_date else None
-            })
+        updated_batches = [{
+            'id': batch.id,
+            'batch_number': batch.batch_number,
+            'total_volume': float(batch.total_volume) if batch.total_volume else 0,
+            'expiry_date': batch.expiry_date.isoformat() if batch.expiry_date else None
+        } for batch in expired_batches]
+        total_volume_updated = sum(batch.total_volume or 0 for batch in expired_batches)
         
         if expired_batches:
             db.session.commit()
@@ -596,7 +480,7 @@ def update_expired_milk_batches():
         # Send notifications
         notification_count = 0
         try:
-            notification_count = check_milk_expiry_and_notify()
+            notification_count = check_milk_expiry_and_notify([batch.id for batch in expired_batches])
         except Exception as e:
             print(f"Error sending notifications: {str(e)}")
         
@@ -608,7 +492,7 @@ def update_expired_milk_batches():
             'user_info': {
                 'user_id': user_id,
                 'user_role': user_role,
-                'managed_batch_count': len(get_user_managed_batches(user_id)) if user_role and user_role.lower() != 'admin' else 'all'
+                'managed_batch_count': managed_batch_count
             }
         }
         
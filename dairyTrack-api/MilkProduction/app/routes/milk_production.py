@@ -4,12 +4,19 @@ from app.models.milk_batches import MilkBatch, MilkStatus
 from app.models.daily_milk_summary import DailyMilkSummary
 from app.database.database import db
 from datetime import datetime, date, timedelta
-from sqlalchemy import func
-from fpdf import FPDF
-from flask import send_file
-from io import BytesIO
+from sqlalchemy import func, and_, or_, exists
+from sqlalchemy.orm import joinedload
 from app.services.notification import check_milk_expiry_and_notify, check_milk_production_and_notify
-import pandas as pd
+from app.services.daily_summary import daily_summary_service, SummaryDelta, MilkingPeriods, period_for_time
+from app.services.batch_provenance import batch_provenance
+from app.services.streaming_export import (
+    ExportColumn, stream_query, peek, new_pdf_report, write_pdf_table, pdf_response, xlsx_response
+)
+from app.services.notificationQueue import notification_check_queue, NotificationChecks
+from app.models.cows import Cow
+from app.models.users import User
+import json
+import base64
 
 milk_production_bp = Blueprint('milk_production', __name__)
 # ...existing code...
@@ -46,53 +53,16 @@ def add_milking_session():
 
         db.session.add(new_session)
 
-        # Update the daily milk summary
-        session_date = new_session.milking_time.date()
-        summary = DailyMilkSummary.query.filter_by(
-            cow_id=new_session.cow_id,
-            date=session_date
-        ).first()
-
-        if not summary:
-            # Initialize with zero values when creating a new summary
-            summary = DailyMilkSummary(
-                cow_id=new_session.cow_id,
-                date=session_date,
-                morning_volume=0,
-                afternoon_volume=0,
-                evening_volume=0,
-                total_volume=0
-            )
-            db.session.add(summary)
-
-        # Ensure values are initialized if they are None
-        if summary.morning_volume is None:
-            summary.morning_volume = 0
-        if summary.afternoon_volume is None:
-            summary.afternoon_volume = 0
-        if summary.evening_volume is None:
-            summary.evening_volume = 0
-
-        # Determine time of day and update corresponding volume
+        # Update the daily milk summary (atomic upsert on cow_id + date)
+        daily_summary_service.add_session(new_session.cow_id, new_session.milking_time, new_session.volume)
         hour = new_session.milking_time.hour
-        if hour < 12:
-            summary.morning_volume += float(new_session.volume)
-        elif hour < 18:
-            summary.afternoon_volume += float(new_session.volume)
-        else:
-            summary.evening_volume += float(new_session.volume)
-
-        # Ensure total_volume is not None
-        if summary.total_volume is None:
-            summary.total_volume = 0
-        summary.total_volume = summary.morning_volume + summary.afternoon_volume + summary.evening_volume
 
         db.session.commit()
 
         # LOGIKA NOTIFIKASI YANG DIPERBAIKI
-        if hour >= 12:  # Hanya untuk pemerahan siang dan sore
-            check_milk_production_and_notify()
-            check_milk_expiry_and_notify()
+        # Hanya untuk pemerahan siang dan sore; dicek di background (debounced)
+        if hour >= 12:
+            notification_check_queue.enqueue(NotificationChecks.PRODUCTION, NotificationChecks.EXPIRY)
 
         return jsonify({
             "success": True,
@@ -106,44 +76,368 @@ def add_milking_session():
         return jsonify({"success": False, "error": str(e)}), 400
 #
 
+# Upper bound on rows accepted by one bulk upload (a full parlour shift)
+MAX_BULK_SESSIONS = 2000
+MILK_SHELF_LIFE = timedelta(hours=8)
+
+
+def _read_bulk_sessions_payload():
+    """Read bulk sessions from a JSON array or an NDJSON (one object per line) body"""
+    content_type = (request.mimetype or '').lower()
+
+    if content_type in ('application/x-ndjson', 'application/ndjson', 'application/jsonl'):
+        rows = []
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError as e:
+                rows.append(ValueError(f"Invalid JSON line: {e}"))
+        return rows
+
+    data = request.get_json()
+    if isinstance(data, dict):
+        data = data.get('sessions')
+    if not isinstance(data, list):
+        raise ValueError("Body must be a JSON array of sessions or an object with a 'sessions' array")
+    return data
+
+
+def _parse_bulk_session(row, now):
+    """Validate one bulk row and return the normalized session values"""
+    if isinstance(row, Exception):
+        raise row
+    if not isinstance(row, dict):
+        raise ValueError("Each session must be a JSON object")
+
+    missing = [field for field in ('cow_id', 'milker_id', 'volume') if row.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+
+    volume = float(row['volume'])
+    if volume <= 0:
+        raise ValueError("volume must be greater than 0")
+
+    milking_time = row.get('milking_time')
+    return {
+        'cow_id': int(row['cow_id']),
+        'milker_id': int(row['milker_id']),
+        'volume': volume,
+        'milking_time': datetime.fromisoformat(milking_time) if milking_time else now,
+        'notes': row.get('notes')
+    }
+
+
+@milk_production_bp.route('/milking-sessions/bulk', methods=['POST'])
+def add_milking_sessions_bulk():
+    """
+    Record a whole shift of milking sessions in one transaction.
+
+    Accepts a JSON array (or {"sessions": [...]}) or an NDJSON body. Each valid
+    row gets its own milk batch, sessions and batches are written with
+    executemany, daily summaries are updated in one pass, and the production
+    and expiry checks run once for the whole upload. Returns one result per row.
+    """
+    try:
+        rows = _read_bulk_sessions_payload()
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    if not rows:
+        return jsonify({"success": False, "error": "No sessions provided"}), 400
+    if len(rows) > MAX_BULK_SESSIONS:
+        return jsonify({
+            "success": False,
+            "error": f"Too many sessions in one request (max {MAX_BULK_SESSIONS})"
+        }), 400
+
+    now = datetime.utcnow()
+    results = [None] * len(rows)
+    parsed = {}
+
+    for index, row in enumerate(rows):
+        try:
+            parsed[index] = _parse_bulk_session(row, now)
+        except (TypeError, ValueError) as e:
+            results[index] = {"index": index, "success": False, "error": str(e)}
+
+    try:
+        # Reject rows pointing at unknown cows or milkers with two lookups
+        # instead of letting one bad foreign key abort the whole insert
+        if parsed:
+            known_cows = {cow_id for (cow_id,) in db.session.query(Cow.id).filter(
+                Cow.id.in_({row['cow_id'] for row in parsed.values()})
+            )}
+            known_milkers = {user_id for (user_id,) in db.session.query(User.id).filter(
+                User.id.in_({row['milker_id'] for row in parsed.values()})
+            )}
+            for index, row in list(parsed.items()):
+                error = None
+                if row['cow_id'] not in known_cows:
+                    error = f"Cow {row['cow_id']} not found"
+                elif row['milker_id'] not in known_milkers:
+                    error = f"Milker {row['milker_id']} not found"
+                if error:
+                    results[index] = {"index": index, "success": False, "error": error}
+                    del parsed[index]
+
+        if parsed:
+            # Gunakan microsecond + index agar batch_number tetap unik dalam satu upload
+            batch_prefix = f"BATCH-{now.strftime('%Y%m%d%H%M%S')}{now.microsecond:06d}"
+            batch_numbers = {index: f"{batch_prefix}-{index:04d}" for index in parsed}
+
+            db.session.execute(MilkBatch.__table__.insert(), [{
+                'batch_number': batch_numbers[index],
+                'total_volume': row['volume'],
+                'status': MilkStatus.FRESH,
+                'production_date': row['milking_time'],
+                'expiry_date': row['milking_time'] + MILK_SHELF_LIFE,
+                'notes': f"Auto-generated batch from milking session. {row['notes'] or ''}",
+                'created_at': now,
+                'updated_at': now
+            } for index, row in parsed.items()])
+
+            batch_ids = dict(db.session.query(MilkBatch.batch_number, MilkBatch.id).filter(
+                MilkBatch.batch_number.in_(batch_numbers.values())
+            ).all())
+
+            db.session.execute(MilkingSession.__table__.insert(), [{
+                'cow_id': row['cow_id'],
+                'milker_id': row['milker_id'],
+                'milk_batch_id': batch_ids[batch_numbers[index]],
+                'volume': row['volume'],
+                'milking_time': row['milking_time'],
+                'notes': row['notes'],
+                'created_at': now,
+                'updated_at': now
+            } for index, row in parsed.items()])
+
+            session_ids = dict(db.session.query(MilkingSession.milk_batch_id, MilkingSession.id).filter(
+                MilkingSession.milk_batch_id.in_(batch_ids.values())
+            ).all())
+
+            daily_summary_service.apply_deltas(
+                SummaryDelta.for_session(row['cow_id'], row['milking_time'], row['volume'])
+                for row in parsed.values()
+            )
+
+            db.session.commit()
+
+            for index in parsed:
+                batch_id = batch_ids[batch_numbers[index]]
+                results[index] = {
+                    "index": index,
+                    "success": True,
+                    "id": session_ids.get(batch_id),
+                    "batch_id": batch_id
+                }
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    # Notifikasi hanya sekali per upload, dan hanya jika ada pemerahan siang/sore
+    if any(row['milking_time'].hour >= 12 for row in parsed.values()):
+        notification_check_queue.enqueue(NotificationChecks.PRODUCTION, NotificationChecks.EXPIRY)
+
+    created = len(parsed)
+    return jsonify({
+        "success": created > 0,
+        "message": f"{created} of {len(rows)} milking sessions added",
+        "created": created,
+        "failed": len(rows) - created,
+        "results": results
+    }), 201 if created else 400
+
+# Keyset pagination defaults for the session / batch listings
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 500
+
+
+def _encode_cursor(sort_value, row_id):
+    """Opaque cursor for keyset pagination on (timestamp, id)"""
+    raw = f"{sort_value.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor):
+    """Inverse of _encode_cursor; raises ValueError for malformed cursors"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        sort_value, row_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _parse_listing_args():
+    """
+    Parse shared listing parameters.
+
+    Pagination is used when `limit` or `cursor` is given; without them (or
+    with all=true) the legacy full-array response is returned for the
+    existing web and mobile clients.
+    """
+    args = request.args
+    options = {'paginate': False, 'limit': None, 'cursor': None,
+               'cow_id': None, 'milker_id': None, 'start': None, 'end': None}
+
+    show_all = args.get('all', 'false').lower() == 'true'
+    if not show_all and (args.get('limit') or args.get('cursor')):
+        options['paginate'] = True
+        limit = int(args.get('limit', DEFAULT_PAGE_LIMIT))
+        if limit <= 0:
+            raise ValueError("limit must be greater than 0")
+        options['limit'] = min(limit, MAX_PAGE_LIMIT)
+        if args.get('cursor'):
+            options['cursor'] = _decode_cursor(args['cursor'])
+
+    for field in ('cow_id', 'milker_id'):
+        if args.get(field):
+            options[field] = int(args[field])
+
+    # Date range is inclusive; a bare YYYY-MM-DD end date covers the whole day
+    if args.get('start_date'):
+        options['start'] = datetime.fromisoformat(args['start_date'])
+    if args.get('end_date'):
+        end = datetime.fromisoformat(args['end_date'])
+        if len(args['end_date']) == 10:
+            end = end + timedelta(days=1)
+        options['end'] = end
+    if options['start'] and options['end'] and options['start'] >= options['end']:
+        raise ValueError("start_date cannot be later than end_date")
+
+    return options
+
+
+def _apply_keyset(query, sort_column, id_column, options):
+    """Order newest first on (sort_column, id) and apply the cursor / limit"""
+    if options['cursor']:
+        cursor_value, cursor_id = options['cursor']
+        query = query.filter(or_(
+            sort_column < cursor_value,
+            and_(sort_column == cursor_value, id_column < cursor_id)
+        ))
+    query = query.order_by(sort_column.desc(), id_column.desc())
+    if options['paginate']:
+        # Fetch one extra row to know whether another page exists
+        query = query.limit(options['limit'] + 1)
+    return query
+
+
+def _serialize_session(session):
+    return {
+        "id": session.id,
+        "cow_id": session.cow_id,
+        "cow_name": session.cow.name if session.cow else None,
+        "milker_id": session.milker_id,
+        "milker_name": session.milker.name if session.milker else None,
+        "milk_batch_id": session.milk_batch_id,
+        "volume": session.volume,
+        "milking_time": session.milking_time.isoformat(),
+        "notes": session.notes
+    }
+
+
+def _serialize_batch(batch):
+    return {
+        "id": batch.id,
+        "batch_number": batch.batch_number,
+        "total_volume": batch.total_volume,
+        "status": batch.status.value,
+        "production_date": batch.production_date.isoformat(),
+        "expiry_date": batch.expiry_date.isoformat() if batch.expiry_date else None,
+        "notes": batch.notes
+    }
+
+
+def _listing_response(key, rows, serialize, sort_attr, options):
+    """Legacy array when unpaginated, otherwise a page with next_cursor"""
+    if not options['paginate']:
+        return jsonify([serialize(row) for row in rows]), 200
+
+    has_more = len(rows) > options['limit']
+    rows = rows[:options['limit']]
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        next_cursor = _encode_cursor(getattr(last, sort_attr), last.id)
+
+    return jsonify({
+        "success": True,
+        key: [serialize(row) for row in rows],
+        "limit": options['limit'],
+        "has_more": has_more,
+        "next_cursor": next_cursor
+    }), 200
+
+
 @milk_production_bp.route('/milking-sessions', methods=['GET'])
 def get_milking_sessions():
-    sessions = MilkingSession.query.all()
-    result = []
-    
-    for session in sessions:
-        result.append({
-            "id": session.id,
-            "cow_id": session.cow_id,
-            "cow_name": session.cow.name if session.cow else None,
-            "milker_id": session.milker_id,
-            "milker_name": session.milker.name if session.milker else None,
-            "milk_batch_id": session.milk_batch_id,
-            "volume": session.volume,
-            "milking_time": session.milking_time.isoformat(),
-            "notes": session.notes
-        })
-    
-    return jsonify(result), 200
+    """
+    List milking sessions, newest first.
+
+    Query params: cow_id, milker_id, start_date, end_date (ISO date/datetime),
+    limit and cursor for keyset pagination on (milking_time, id).
+    Cow and milker are eager-loaded, so a page costs one query.
+    """
+    try:
+        options = _parse_listing_args()
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    query = MilkingSession.query.options(
+        joinedload(MilkingSession.cow),
+        joinedload(MilkingSession.milker)
+    )
+    if options['cow_id'] is not None:
+        query = query.filter(MilkingSession.cow_id == options['cow_id'])
+    if options['milker_id'] is not None:
+        query = query.filter(MilkingSession.milker_id == options['milker_id'])
+    if options['start']:
+        query = query.filter(MilkingSession.milking_time >= options['start'])
+    if options['end']:
+        query = query.filter(MilkingSession.milking_time < options['end'])
+
+    query = _apply_keyset(query, MilkingSession.milking_time, MilkingSession.id, options)
+    return _listing_response('sessions', query.all(), _serialize_session, 'milking_time', options)
 
 
 @milk_production_bp.route('/milk-batches', methods=['GET'])
 def get_milk_batches():
-    batches = MilkBatch.query.all()
-    result = []
-    
-    for batch in batches:
-        result.append({
-            "id": batch.id,
-            "batch_number": batch.batch_number,
-            "total_volume": batch.total_volume,
-            "status": batch.status.value,
-            "production_date": batch.production_date.isoformat(),
-            "expiry_date": batch.expiry_date.isoformat() if batch.expiry_date else None,
-            "notes": batch.notes
-        })
-    
-    return jsonify(result), 200
+    """
+    List milk batches, newest first.
+
+    Query params: status, cow_id, milker_id (batches fed by that cow/milker),
+    start_date, end_date on production_date, limit and cursor for keyset
+    pagination on (production_date, id).
+    """
+    try:
+        options = _parse_listing_args()
+        status = request.args.get('status')
+        status_enum = MilkStatus(status.upper()) if status else None
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    query = MilkBatch.query
+    if status_enum:
+        query = query.filter(MilkBatch.status == status_enum)
+    if options['cow_id'] is not None or options['milker_id'] is not None:
+        session_filter = MilkingSession.milk_batch_id == MilkBatch.id
+        if options['cow_id'] is not None:
+            session_filter = and_(session_filter, MilkingSession.cow_id == options['cow_id'])
+        if options['milker_id'] is not None:
+            session_filter = and_(session_filter, MilkingSession.milker_id == options['milker_id'])
+        query = query.filter(exists().where(session_filter))
+    if options['start']:
+        query = query.filter(MilkBatch.production_date >= options['start'])
+    if options['end']:
+        query = query.filter(MilkBatch.production_date < options['end'])
+
+    query = _apply_keyset(query, MilkBatch.production_date, MilkBatch.id, options)
+    return _listing_response('batches', query.all(), _serialize_batch, 'production_date', options)
 
 @milk_production_bp.route('/milk-batch/update-status/<int:batch_id>', methods=['PUT'])
 def update_batch_status(batch_id):
@@ -257,109 +551,122 @@ def get_daily_summaries():
         }), 500
 
 
+@milk_production_bp.route('/daily-summaries/rebuild', methods=['POST'])
+def rebuild_daily_summaries():
+    """Recompute daily summaries for a date range from the milking sessions"""
+    try:
+        data = request.get_json() or {}
+        cow_id = data.get('cow_id')
+
+        if not data.get('start_date') or not data.get('end_date'):
+            return jsonify({
+                "success": False,
+                "error": "start_date and end_date are required"
+            }), 400
+
+        try:
+            start_date = datetime.strptime(data['start_date'], '%Y-%m-%d').date()
+            end_date = datetime.strptime(data['end_date'], '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({
+                "success": False,
+                "error": "Invalid date format. Use YYYY-MM-DD"
+            }), 400
+
+        if start_date > end_date:
+            return jsonify({
+                "success": False,
+                "error": "start_date cannot be later than end_date"
+            }), 400
+
+        rebuilt = daily_summary_service.rebuild(
+            start_date, end_date, int(cow_id) if cow_id is not None else None
+        )
+        db.session.commit()
+
+        return jsonify({
+            "success": True,
+            "message": "Daily summaries rebuilt successfully",
+            "summaries_rebuilt": rebuilt
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            "success": False,
+            "error": f"An error occurred while rebuilding daily summaries: {str(e)}"
+        }), 500
+
+
+SESSION_PERIOD_LABELS_EN = {
+    MilkingPeriods.MORNING: "Morning",
+    MilkingPeriods.AFTERNOON: "Afternoon",
+    MilkingPeriods.EVENING: "Evening"
+}
+SESSION_PERIOD_LABELS_ID = {
+    MilkingPeriods.MORNING: "Pagi",
+    MilkingPeriods.AFTERNOON: "Siang",
+    MilkingPeriods.EVENING: "Sore"
+}
+
+
+def _milking_session_export_rows(period_labels):
+    """Stream (no, cow, milker, session, volume, time) rows for the session exports"""
+    query = db.session.query(
+        MilkingSession.cow_id,
+        Cow.name.label('cow_name'),
+        MilkingSession.milker_id,
+        User.name.label('milker_name'),
+        MilkingSession.volume,
+        MilkingSession.milking_time
+    ).outerjoin(Cow, Cow.id == MilkingSession.cow_id
+    ).outerjoin(User, User.id == MilkingSession.milker_id
+    ).order_by(MilkingSession.id)
+
+    for idx, row in enumerate(stream_query(query), start=1):
+        yield (
+            idx,
+            f"{row.cow_id} - {row.cow_name}" if row.cow_name is not None else str(row.cow_id),
+            f"{row.milker_id} - {row.milker_name}" if row.milker_name is not None else str(row.milker_id),
+            period_labels[period_for_time(row.milking_time)],
+            row.volume,
+            row.milking_time.strftime('%Y-%m-%d %H:%M')
+        )
+
+
 @milk_production_bp.route('/export/pdf', methods=['GET'])
 def export_milking_sessions_pdf():
     try:
-        sessions = MilkingSession.query.all()
-
-        pdf = FPDF()
-        pdf.set_auto_page_break(auto=True, margin=15)
-        pdf.add_page()
-        pdf.set_font("Arial", style="B", size=16)
-        pdf.cell(200, 10, txt="Milking Sessions Report", ln=True, align='C')
-        pdf.ln(5)
-        pdf.set_font("Arial", size=10)
-        pdf.cell(200, 10, txt="Cattle milking session list.", ln=True, align='C')
-        pdf.ln(10)
-
-        pdf.set_fill_color(173, 216, 230)
-        pdf.set_text_color(0, 0, 0)
-        pdf.set_font("Arial", style="B", size=10)
-        pdf.cell(10, 10, "NO", border=1, align='C', fill=True)
-        pdf.cell(40, 10, "Cow", border=1, align='C', fill=True)
-        pdf.cell(40, 10, "Milker", border=1, align='C', fill=True)
-        pdf.cell(25, 10, "Session", border=1, align='C', fill=True)
-        pdf.cell(25, 10, "Volume", border=1, align='C', fill=True)
-        pdf.cell(45, 10, "Milking Time", border=1, align='C', fill=True)
-        pdf.ln()
-
-        pdf.set_font("Arial", size=10)
-        for idx, session in enumerate(sessions, start=1):
-            cow_info = f"{session.cow_id} - {session.cow.name}" if session.cow else str(session.cow_id)
-            milker_info = f"{session.milker_id} - {session.milker.name}" if session.milker else str(session.milker_id)
-            # Determine session based on hour
-            hour = session.milking_time.hour
-            if hour < 12:
-                sesi = "Morning"
-            elif hour < 18:
-                sesi = "Afternoon"
-            else:
-                sesi = "Evening"
-            pdf.cell(10, 10, str(idx), border=1, align='C')
-            pdf.cell(40, 10, cow_info, border=1)
-            pdf.cell(40, 10, milker_info, border=1)
-            pdf.cell(25, 10, sesi, border=1, align='C')
-            pdf.cell(25, 10, str(session.volume), border=1)
-            pdf.cell(45, 10, session.milking_time.strftime('%Y-%m-%d %H:%M'), border=1)
-            pdf.ln()
-
-        # Metode yang lebih aman untuk menggunakan BytesIO
-        buffer = BytesIO()
-        
-        # Output PDF sebagai bytes dan tulis ke buffer
-        pdf_bytes = pdf.output(dest='S').encode('latin-1')
-        buffer.write(pdf_bytes)
-        buffer.seek(0)
-        
-        return send_file(
-            buffer, 
-            as_attachment=True, 
-            download_name="milking_sessions.pdf", 
-            mimetype='application/pdf'
-        )
+        columns = [
+            ExportColumn("NO", pdf_width=10, align='C'),
+            ExportColumn("Cow", pdf_width=40),
+            ExportColumn("Milker", pdf_width=40),
+            ExportColumn("Session", pdf_width=25, align='C'),
+            ExportColumn("Volume", pdf_width=25),
+            ExportColumn("Milking Time", pdf_width=45)
+        ]
+        pdf = new_pdf_report("Milking Sessions Report", "Cattle milking session list.")
+        write_pdf_table(pdf, columns, _milking_session_export_rows(SESSION_PERIOD_LABELS_EN))
+        return pdf_response(pdf, "milking_sessions.pdf")
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @milk_production_bp.route('/export/excel', methods=['GET'])
 def export_milking_sessions_excel():
     try:
-        sessions = MilkingSession.query.all()
-        sessions_list = []
-        for idx, session in enumerate(sessions, start=1):
-            hour = session.milking_time.hour
-            if hour < 12:
-                sesi = "Pagi"
-            elif hour < 18:
-                sesi = "Siang"
-            else:
-                sesi = "Sore"
-            sessions_list.append({
-                "NO": idx,
-                "Cow": f"{session.cow_id} - {session.cow.name}" if session.cow else str(session.cow_id),
-                "Milker": f"{session.milker_id} - {session.milker.name}" if session.milker else str(session.milker_id),
-                "Session": sesi,
-                "Volume": session.volume,
-                "Milking Time": session.milking_time.strftime('%Y-%m-%d %H:%M')
-            })
-
-        df = pd.DataFrame(sessions_list)
-        buffer = BytesIO()
-        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='MilkingSessions')
-            workbook = writer.book
-            worksheet = writer.sheets['MilkingSessions']
-            from openpyxl.styles import Font, PatternFill
-            header_fill = PatternFill(start_color="ADD8E6", end_color="ADD8E6", fill_type="solid")
-            header_font = Font(bold=True)
-            for cell in worksheet[1]:
-                cell.fill = header_fill
-                cell.font = header_font
-            for column_cells in worksheet.columns:
-                max_length = max(len(str(cell.value)) for cell in column_cells if cell.value)
-                adjusted_width = max_length + 2
-                worksheet.column_dimensions[column_cells[0].column_letter].width = adjusted_width
-        buffer.seek(0)
-        return send_file(buffer, as_attachment=True, download_name="milking_sessions.xlsx", mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        columns = [
+            ExportColumn("NO", width=6),
+            ExportColumn("Cow", width=30),
+            ExportColumn("Milker", width=30),
+            ExportColumn("Session", width=10),
+            ExportColumn("Volume", width=10),
+            ExportColumn("Milking Time", width=18)
+        ]
+        return xlsx_response(
+            'MilkingSessions', columns,
+            _milking_session_export_rows(SESSION_PERIOD_LABELS_ID),
+            "milking_sessions.xlsx"
+        )
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -372,9 +679,8 @@ def delete_milking_session(session_id):
         
         # Store information before deletion for summary update
         cow_id = session.cow_id
-        session_date = session.milking_time.date()
+        milking_time = session.milking_time
         volume = session.volume
-        hour = session.milking_time.hour
         milk_batch_id = session.milk_batch_id
         
         # Delete the milking session
@@ -392,31 +698,11 @@ def delete_milking_session(session_id):
             if batch.total_volume <= 0 or remaining_sessions == 0:
                 db.session.delete(batch)
         
-        # Update the daily summary
-        summary = DailyMilkSummary.query.filter_by(cow_id=cow_id, date=session_date).first()
-        if summary:
-            # Subtract the volume from the appropriate time period
-            if hour < 12:
-                summary.morning_volume -= volume
-                if summary.morning_volume < 0:  # Safeguard against negative values
-                    summary.morning_volume = 0
-            elif hour < 18:
-                summary.afternoon_volume -= volume
-                if summary.afternoon_volume < 0:
-                    summary.afternoon_volume = 0
-            else:
-                summary.evening_volume -= volume
-                if summary.evening_volume < 0:
-                    summary.evening_volume = 0
-                    
-            # Update total volume
-            summary.total_volume = summary.morning_volume + summary.afternoon_volume + summary.evening_volume
-            
-            # If there's no more milk recorded for this cow on this day, delete the summary
-            if summary.total_volume <= 0:
-                db.session.delete(summary)
+        # Update the daily summary; it is dropped once no milk is left for the day
+        daily_summary_service.remove_session(cow_id, milking_time, volume)
         
         db.session.commit()
+        batch_provenance.forget([milk_batch_id])
         return jsonify({"success": True, "message": "Milking session deleted successfully"}), 200
         
     except Exception as e:
@@ -435,15 +721,12 @@ def update_milking_session(session_id):
         # Store old values for calculations
         old_volume = session.volume
         old_milking_time = session.milking_time
-        old_hour = old_milking_time.hour
-        old_date = old_milking_time.date()
         old_cow_id = session.cow_id
         
         # Store the new values for calculations
         new_volume = float(data.get('volume', old_volume))
         new_milking_time = datetime.fromisoformat(data.get('milking_time', old_milking_time.isoformat()))
         new_hour = new_milking_time.hour
-        new_date = new_milking_time.date()
         new_cow_id = int(data.get('cow_id', old_cow_id))
         
         # Update the session fields
@@ -464,100 +747,15 @@ def update_milking_session(session_id):
                     batch.production_date = new_milking_time
                     batch.expiry_date = new_milking_time + timedelta(hours=8)
                 
-        # Handle daily milk summary updates
-        
-        # 1. If date or cow changed, we need to update two summaries
-        if old_date != new_date or old_cow_id != new_cow_id:
-            # First, update the old summary (subtract volume)
-            old_summary = DailyMilkSummary.query.filter_by(
-                cow_id=old_cow_id,
-                date=old_date
-            ).first()
-            
-            if old_summary:
-                # Subtract the old volume from the appropriate time period
-                if old_hour < 12:
-                    old_summary.morning_volume -= old_volume
-                    if old_summary.morning_volume < 0:
-                        old_summary.morning_volume = 0
-                elif old_hour < 18:
-                    old_summary.afternoon_volume -= old_volume
-                    if old_summary.afternoon_volume < 0:
-                        old_summary.afternoon_volume = 0
-                else:
-                    old_summary.evening_volume -= old_volume
-                    if old_summary.evening_volume < 0:
-                        old_summary.evening_volume = 0
-                        
-                # Update total volume
-                old_summary.total_volume = old_summary.morning_volume + old_summary.afternoon_volume + old_summary.evening_volume
-                
-                # If there's no more milk recorded for this cow on this day, delete the summary
-                if old_summary.total_volume <= 0:
-                    db.session.delete(old_summary)
-            
-            # Then, find or create new summary and add volume
-            new_summary = DailyMilkSummary.query.filter_by(
-                cow_id=new_cow_id,
-                date=new_date
-            ).first()
-            
-            if not new_summary:
-                new_summary = DailyMilkSummary(
-                    cow_id=new_cow_id,
-                    date=new_date,
-                    morning_volume=0,
-                    afternoon_volume=0,
-                    evening_volume=0,
-                    total_volume=0
-                )
-                db.session.add(new_summary)
-            
-            # Add the new volume to the appropriate time period
-            if new_hour < 12:
-                new_summary.morning_volume += new_volume
-            elif new_hour < 18:
-                new_summary.afternoon_volume += new_volume
-            else:
-                new_summary.evening_volume += new_volume
-                
-            # Update total volume
-            new_summary.total_volume = new_summary.morning_volume + new_summary.afternoon_volume + new_summary.evening_volume
-        
-        # 2. If only volume or time of day changed but date and cow are the same
-        elif old_volume != new_volume or (old_hour < 12 and new_hour >= 12) or (old_hour < 18 and new_hour >= 18) or (old_hour >= 18 and new_hour < 18):
-            summary = DailyMilkSummary.query.filter_by(
-                cow_id=new_cow_id,
-                date=new_date
-            ).first()
-            
-            if summary:
-                # Remove old volume from old time period
-                if old_hour < 12:
-                    summary.morning_volume -= old_volume
-                    if summary.morning_volume < 0:
-                        summary.morning_volume = 0
-                elif old_hour < 18:
-                    summary.afternoon_volume -= old_volume
-                    if summary.afternoon_volume < 0:
-                        summary.afternoon_volume = 0
-                else:
-                    summary.evening_volume -= old_volume
-                    if summary.evening_volume < 0:
-                        summary.evening_volume = 0
-                
-                # Add new volume to new time period
-                if new_hour < 12:
-                    summary.morning_volume += new_volume
-                elif new_hour < 18:
-                    summary.afternoon_volume += new_volume
-                else:
-                    summary.evening_volume += new_volume
-                
-                # Update total
-                summary.total_volume = summary.morning_volume + summary.afternoon_volume + summary.evening_volume
+        # Move the session's contribution between daily summaries / periods
+        daily_summary_service.move_session(
+            old_cow_id, old_milking_time, old_volume,
+            new_cow_id, new_milking_time, new_volume
+        )
         
         db.session.commit()
+        if new_cow_id != old_cow_id:
+            batch_provenance.forget([session.milk_batch_id])
         
         # LOGIKA NOTIFIKASI YANG DIPERBAIKI UNTUK UPDATE
         # Notifikasi untuk semua update KECUALI pagi (< 12:00)
@@ -565,9 +763,8 @@ def update_milking_session(session_id):
         # - Update siang (12:00-17:59): SELALU ada notifikasi
         # - Update sore (18:00-23:59): SELALU ada notifikasi
         if new_hour >= 12:  # Siang dan sore selalu ada notifikasi
-            # Selalu trigger notifikasi untuk update di jam 12:00+ tanpa kondisi apapun
-            check_milk_production_and_notify()
-            check_milk_expiry_and_notify()
+            # Selalu trigger notifikasi untuk update di jam 12:00+ (dijalankan di background)
+            notification_check_queue.enqueue(NotificationChecks.PRODUCTION, NotificationChecks.EXPIRY)
         
         return jsonify({
             "success": True,
@@ -580,96 +777,120 @@ def update_milking_session(session_id):
         return jsonify({"success": False, "error": str(e)}), 400
 
 
+def _parse_summary_export_filters():
+    """Parse cow_id / start_date / end_date for the daily summary exports"""
+    cow_id = request.args.get('cow_id')
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+
+    if cow_id:
+        try:
+            cow_id = int(cow_id)
+        except ValueError:
+            raise ValueError("Invalid cow_id format. Must be an integer.")
+
+    try:
+        start_date = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None
+        end_date = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+    except ValueError:
+        raise ValueError("Invalid date format. Use YYYY-MM-DD")
+
+    if start_date and end_date and start_date > end_date:
+        raise ValueError("start_date cannot be later than end_date")
+
+    return cow_id or None, start_date, end_date
+
+
+def _daily_summary_export_rows(cow_id, start_date, end_date, totals):
+    """
+    Stream daily summary rows (newest first) as
+    (no, cow, date, morning, afternoon, evening, total), accumulating
+    per-period totals into `totals` while iterating.
+    """
+    query = db.session.query(
+        DailyMilkSummary.cow_id,
+        Cow.name.label('cow_name'),
+        DailyMilkSummary.date,
+        DailyMilkSummary.morning_volume,
+        DailyMilkSummary.afternoon_volume,
+        DailyMilkSummary.evening_volume,
+        DailyMilkSummary.total_volume
+    ).outerjoin(Cow, Cow.id == DailyMilkSummary.cow_id)
+
+    if cow_id:
+        query = query.filter(DailyMilkSummary.cow_id == cow_id)
+    if start_date:
+        query = query.filter(DailyMilkSummary.date >= start_date)
+    if end_date:
+        query = query.filter(DailyMilkSummary.date <= end_date)
+    query = query.order_by(DailyMilkSummary.date.desc(), DailyMilkSummary.id.desc())
+
+    for idx, row in enumerate(stream_query(query), start=1):
+        volumes = [float(row.morning_volume or 0), float(row.afternoon_volume or 0),
+                   float(row.evening_volume or 0), float(row.total_volume or 0)]
+        for key, volume in zip(('morning', 'afternoon', 'evening', 'total'), volumes):
+            totals[key] += volume
+        yield (
+            idx,
+            f"{row.cow_id} - {row.cow_name}" if row.cow_name is not None else str(row.cow_id),
+            row.date.strftime('%Y-%m-%d'),
+            *volumes
+        )
+
+
+def _cow_age_text(cow):
+    """Age of a cow as 'X tahun Y bulan', or None without a birth date"""
+    if not cow.birth:
+        return None
+    birth_date = cow.birth if isinstance(cow.birth, date) else cow.birth.date()
+    today = date.today()
+    age_years = today.year - birth_date.year
+    age_months = today.month - birth_date.month
+    if age_months < 0:
+        age_years -= 1
+        age_months += 12
+    return f"{age_years} tahun {age_months} bulan"
+
+
+def _summary_export_context():
+    """Resolve filters, the filtered cow and whether it is a bull (no milk data)"""
+    cow_id, start_date, end_date = _parse_summary_export_filters()
+    cow_info = Cow.query.get(cow_id) if cow_id else None
+    is_male_cow = bool(cow_info and cow_info.gender and cow_info.gender.lower() == 'male')
+    return cow_id, start_date, end_date, cow_info, is_male_cow
+
+
+def _summary_export_filename(extension, cow_id, start_date, end_date, cow_info, is_male_cow):
+    if is_male_cow:
+        return f"bull_report_{cow_info.name.replace(' ', '_')}.{extension}"
+    if start_date and end_date:
+        return f"milk_production_{start_date.strftime('%Y%m%d')}_to_{end_date.strftime('%Y%m%d')}.{extension}"
+    if cow_id:
+        return f"milk_production_cow_{cow_id}.{extension}"
+    return f"daily_milk_production.{extension}"
+
+
 @milk_production_bp.route('/export/daily-summaries/pdf', methods=['GET'])
 def export_daily_summaries_pdf():
     try:
-        # Get query parameters
-        cow_id = request.args.get('cow_id')
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        
-        # Initialize query
-        query = DailyMilkSummary.query
-        
-        # Apply filters
-        if cow_id:
-            try:
-                cow_id = int(cow_id)
-                query = query.filter_by(cow_id=cow_id)
-            except ValueError:
-                return jsonify({
-                    "success": False,
-                    "error": "Invalid cow_id format. Must be an integer."
-                }), 400
-        
-        # Validate and apply date filters
         try:
-            if start_date:
-                start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-                query = query.filter(DailyMilkSummary.date >= start_date)
-            
-            if end_date:
-                end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-                query = query.filter(DailyMilkSummary.date <= end_date)
-                
-            if start_date and end_date and start_date > end_date:
-                return jsonify({
-                    "success": False,
-                    "error": "start_date cannot be later than end_date"
-                }), 400
-                
-        except ValueError:
-            return jsonify({
-                "success": False,
-                "error": "Invalid date format. Use YYYY-MM-DD"
-            }), 400
-        
-        # Execute query and get summaries
-        summaries = query.order_by(DailyMilkSummary.date.desc()).all()
-        
-        # Check if cow is male (no milk production data)
-        cow_info = None
-        if cow_id and summaries:
-            cow_info = summaries[0].cow
-        elif cow_id:
-            # Get cow info even if no milk production data
-            from app.models.cows import Cow
-            cow_info = Cow.query.get(cow_id)
-        
-        # Check if this is a male cow
-        is_male_cow = cow_info and cow_info.gender and cow_info.gender.lower() == 'male'
-        
-        # Create PDF
-        pdf = FPDF()
-        pdf.set_auto_page_break(auto=True, margin=15)
-        pdf.add_page()
-        pdf.set_font("Arial", style="B", size=16)
-        
-        # Title based on cow type
-        if is_male_cow:
-            pdf.cell(200, 10, txt="Laporan Sapi Pejantan", ln=True, align='C')
-        else:
-            pdf.cell(200, 10, txt="Laporan Produksi Susu Harian", ln=True, align='C')
-        pdf.ln(5)
-        
+            cow_id, start_date, end_date, cow_info, is_male_cow = _summary_export_context()
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
         # Add filter information
-        pdf.set_font("Arial", size=10)
-        filter_text = "Filter: "
+        filter_parts = []
         if cow_id:
-            cow_name = cow_info.name if cow_info else f"Cow ID: {cow_id}"
-            filter_text += f"Sapi: {cow_name}, "
+            filter_parts.append(f"Sapi: {cow_info.name if cow_info else f'Cow ID: {cow_id}'}")
         if start_date:
-            filter_text += f"Dari: {start_date.strftime('%Y-%m-%d')}, "
+            filter_parts.append(f"Dari: {start_date.strftime('%Y-%m-%d')}")
         if end_date:
-            filter_text += f"Sampai: {end_date.strftime('%Y-%m-%d')}, "
-        
-        if filter_text == "Filter: ":
-            filter_text += "Semua data"
-        else:
-            filter_text = filter_text[:-2]  # Remove last comma and space
-            
-        pdf.cell(200, 10, txt=filter_text, ln=True, align='C')
-        pdf.ln(10)
+            filter_parts.append(f"Sampai: {end_date.strftime('%Y-%m-%d')}")
+        filter_text = "Filter: " + (", ".join(filter_parts) if filter_parts else "Semua data")
+
+        # Title based on cow type
+        title = "Laporan Sapi Pejantan" if is_male_cow else "Laporan Produksi Susu Harian"
+        pdf = new_pdf_report(title, filter_text)
 
         if is_male_cow:
             # Special content for male cows
@@ -683,32 +904,17 @@ def export_daily_summaries_pdf():
             pdf.cell(200, 8, txt=f"ID: {cow_info.id}", ln=True)
             pdf.cell(200, 8, txt=f"Jenis Kelamin: {cow_info.gender}", ln=True)
             pdf.cell(200, 8, txt=f"Ras: {cow_info.breed if cow_info.breed else 'N/A'}", ln=True)
-            
-            # Calculate age
-            if cow_info.birth:
-                from datetime import date
-                birth_date = cow_info.birth if isinstance(cow_info.birth, date) else cow_info.birth.date()
-                today = date.today()
-                age_years = today.year - birth_date.year
-                age_months = today.month - birth_date.month
-                if age_months < 0:
-                    age_years -= 1
-                    age_months += 12
-                age_str = f"{age_years} tahun {age_months} bulan"
-            else:
-                age_str = "N/A"
-            
-            pdf.cell(200, 8, txt=f"Umur: {age_str}", ln=True)
+            pdf.cell(200, 8, txt=f"Umur: {_cow_age_text(cow_info) or 'N/A'}", ln=True)
             pdf.ln(10)
             
             # Status and function
             pdf.set_font("Arial", style="B", size=12)
             pdf.cell(200, 8, txt="STATUS DAN FUNGSI:", ln=True)
             pdf.set_font("Arial", size=11)
-            pdf.cell(200, 8, txt="• Status: Sapi Pejantan - Aktif untuk pembiakan", ln=True)
-            pdf.cell(200, 8, txt="• Fungsi Utama: Pembiakan dan pemuliaan genetik", ln=True)
-            pdf.cell(200, 8, txt="• Peran: Menghasilkan keturunan dengan genetik unggul", ln=True)
-            pdf.cell(200, 8, txt="• Tidak menghasilkan susu karena jenis kelamin jantan", ln=True)
+            pdf.cell(200, 8, txt="- Status: Sapi Pejantan - Aktif untuk pembiakan", ln=True)
+            pdf.cell(200, 8, txt="- Fungsi Utama: Pembiakan dan pemuliaan genetik", ln=True)
+            pdf.cell(200, 8, txt="- Peran: Menghasilkan keturunan dengan genetik unggul", ln=True)
+            pdf.cell(200, 8, txt="- Tidak menghasilkan susu karena jenis kelamin jantan", ln=True)
             pdf.ln(10)
             
             # Add note
@@ -718,67 +924,33 @@ def export_daily_summaries_pdf():
             
         else:
             # Normal milk production table for female cows
-            if len(summaries) == 0:
+            totals = dict.fromkeys(('morning', 'afternoon', 'evening', 'total'), 0.0)
+            has_rows, rows = peek(_daily_summary_export_rows(cow_id, start_date, end_date, totals))
+
+            if not has_rows:
                 pdf.set_font("Arial", size=12)
                 pdf.cell(200, 10, txt="Tidak ada data produksi susu untuk periode yang dipilih", ln=True, align='C')
             else:
-                # Create table headers
-                pdf.set_fill_color(173, 216, 230)
-                pdf.set_text_color(0, 0, 0)
-                pdf.set_font("Arial", style="B", size=10)
-                pdf.cell(10, 10, "NO", border=1, align='C', fill=True)
-                pdf.cell(50, 10, "Sapi", border=1, align='C', fill=True)
-                pdf.cell(30, 10, "Tanggal", border=1, align='C', fill=True)
-                pdf.cell(25, 10, "Pagi", border=1, align='C', fill=True)
-                pdf.cell(25, 10, "Siang", border=1, align='C', fill=True)
-                pdf.cell(25, 10, "Sore", border=1, align='C', fill=True)
-                pdf.cell(25, 10, "Total", border=1, align='C', fill=True)
-                pdf.ln()
-
-                # Add data rows
-                pdf.set_font("Arial", size=10)
-                for idx, summary in enumerate(summaries, start=1):
-                    cow_info = f"{summary.cow_id} - {summary.cow.name}" if summary.cow else str(summary.cow_id)
-                    
-                    pdf.cell(10, 10, str(idx), border=1, align='C')
-                    pdf.cell(50, 10, cow_info, border=1)
-                    pdf.cell(30, 10, summary.date.strftime('%Y-%m-%d'), border=1, align='C')
-                    pdf.cell(25, 10, str(round(float(summary.morning_volume or 0), 2)), border=1, align='R')
-                    pdf.cell(25, 10, str(round(float(summary.afternoon_volume or 0), 2)), border=1, align='R')
-                    pdf.cell(25, 10, str(round(float(summary.evening_volume or 0), 2)), border=1, align='R')
-                    pdf.cell(25, 10, str(round(float(summary.total_volume or 0), 2)), border=1, align='R')
-                    pdf.ln()
-
-                # Add totals row
-                total_morning = sum(float(s.morning_volume or 0) for s in summaries)
-                total_afternoon = sum(float(s.afternoon_volume or 0) for s in summaries)
-                total_evening = sum(float(s.evening_volume or 0) for s in summaries)
-                total_all = sum(float(s.total_volume or 0) for s in summaries)
-                
-                pdf.set_font("Arial", style="B", size=10)
-                pdf.cell(90, 10, "TOTAL", border=1, align='C', fill=True)
-                pdf.cell(25, 10, str(round(total_morning, 2)), border=1, align='R', fill=True)
-                pdf.cell(25, 10, str(round(total_afternoon, 2)), border=1, align='R', fill=True)
-                pdf.cell(25, 10, str(round(total_evening, 2)), border=1, align='R', fill=True)
-                pdf.cell(25, 10, str(round(total_all, 2)), border=1, align='R', fill=True)
-
-        # Output PDF file
-        buffer = BytesIO()
-        pdf_bytes = pdf.output(dest='S').encode('latin-1')
-        buffer.write(pdf_bytes)
-        buffer.seek(0)
-        
-        # Generate filename
-        if is_male_cow:
-            filename = f"bull_report_{cow_info.name.replace(' ', '_')}.pdf"
-        else:
-            filename = "daily_milk_production.pdf"
-            if start_date and end_date:
-                filename = f"milk_production_{start_date.strftime('%Y%m%d')}_to_{end_date.strftime('%Y%m%d')}.pdf"
-            elif cow_id:
-                filename = f"milk_production_cow_{cow_id}.pdf"
-        
-        return send_file(buffer, as_attachment=True, download_name=filename, mimetype='application/pdf')
+                columns = [
+                    ExportColumn("NO", pdf_width=10, align='C'),
+                    ExportColumn("Sapi", pdf_width=50),
+                    ExportColumn("Tanggal", pdf_width=30, align='C'),
+                    ExportColumn("Pagi", pdf_width=25, align='R'),
+                    ExportColumn("Siang", pdf_width=25, align='R'),
+                    ExportColumn("Sore", pdf_width=25, align='R'),
+                    ExportColumn("Total", pdf_width=25, align='R')
+                ]
+                rounded_rows = (row[:3] + tuple(round(v, 2) for v in row[3:]) for row in rows)
+                write_pdf_table(pdf, columns, rounded_rows, footer_rows=lambda: [(
+                    ("TOTAL", 3),
+                    round(totals['morning'], 2),
+                    round(totals['afternoon'], 2),
+                    round(totals['evening'], 2),
+                    round(totals['total'], 2)
+                )])
+
+        filename = _summary_export_filename('pdf', cow_id, start_date, end_date, cow_info, is_male_cow)
+        return pdf_response(pdf, filename)
     
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -786,226 +958,53 @@ def export_daily_summaries_pdf():
 @milk_production_bp.route('/export/daily-summaries/excel', methods=['GET'])
 def export_daily_summaries_excel():
     try:
-        # Get query parameters
-        cow_id = request.args.get('cow_id')
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        
-        # Initialize query
-        query = DailyMilkSummary.query
-        
-        # Apply filters
-        if cow_id:
-            try:
-                cow_id = int(cow_id)
-                query = query.filter_by(cow_id=cow_id)
-            except ValueError:
-                return jsonify({
-                    "success": False,
-                    "error": "Invalid cow_id format. Must be an integer."
-                }), 400
-        
-        # Validate and apply date filters
         try:
-            if start_date:
-                start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-                query = query.filter(DailyMilkSummary.date >= start_date)
-            
-            if end_date:
-                end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-                query = query.filter(DailyMilkSummary.date <= end_date)
-                
-            if start_date and end_date and start_date > end_date:
-                return jsonify({
-                    "success": False,
-                    "error": "start_date cannot be later than end_date"
-                }), 400
-                
-        except ValueError:
-            return jsonify({
-                "success": False,
-                "error": "Invalid date format. Use YYYY-MM-DD"
-            }), 400
-        
-        # Execute query and get summaries
-        summaries = query.order_by(DailyMilkSummary.date.desc()).all()
-        
-        # Check if cow is male (no milk production data)
-        cow_info = None
-        if cow_id and summaries:
-            cow_info = summaries[0].cow
-        elif cow_id:
-            # Get cow info even if no milk production data
-            from app.models.cows import Cow
-            cow_info = Cow.query.get(cow_id)
-        
-        # Check if this is a male cow
-        is_male_cow = cow_info and cow_info.gender and cow_info.gender.lower() == 'male'
-        
-        # Create DataFrame and Excel file
-        buffer = BytesIO()
-        
+            cow_id, start_date, end_date, cow_info, is_male_cow = _summary_export_context()
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+        filename = _summary_export_filename('xlsx', cow_id, start_date, end_date, cow_info, is_male_cow)
+
         if is_male_cow:
             # Create special Excel for male cows
-            data = [{
-                "Informasi": "Nama Sapi",
-                "Detail": cow_info.name
-            }, {
-                "Informasi": "ID Sapi",
-                "Detail": cow_info.id
-            }, {
-                "Informasi": "Jenis Kelamin",
-                "Detail": cow_info.gender
-            }, {
-                "Informasi": "Ras",
-                "Detail": cow_info.breed if cow_info.breed else 'N/A'
-            }, {
-                "Informasi": "Status",
-                "Detail": "Sapi Pejantan - Aktif untuk pembiakan"
-            }, {
-                "Informasi": "Fungsi",
-                "Detail": "Pembiakan dan pemuliaan genetik"
-            }, {
-                "Informasi": "Catatan",
-                "Detail": "Sapi pejantan tidak menghasilkan susu"
-            }]
-            
-            # Add age calculation
-            if cow_info.birth:
-                from datetime import date
-                birth_date = cow_info.birth if isinstance(cow_info.birth, date) else cow_info.birth.date()
-                today = date.today()
-                age_years = today.year - birth_date.year
-                age_months = today.month - birth_date.month
-                if age_months < 0:
-                    age_years -= 1
-                    age_months += 12
-                age_str = f"{age_years} tahun {age_months} bulan"
-                data.insert(4, {
-                    "Informasi": "Umur",
-                    "Detail": age_str
-                })
-            
-            df = pd.DataFrame(data)
-            
-            with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, sheet_name='InformasiPejantan')
-                workbook = writer.book
-                worksheet = writer.sheets['InformasiPejantan']
-                
-                # Apply styling
-                from openpyxl.styles import Font, PatternFill, Alignment
-                header_fill = PatternFill(start_color="ADD8E6", end_color="ADD8E6", fill_type="solid")
-                header_font = Font(bold=True)
-                
-                # Style headers
-                for cell in worksheet[1]:
-                    cell.fill = header_fill
-                    cell.font = header_font
-                    cell.alignment = Alignment(horizontal='center', vertical='center')
-                
-                # Auto-adjust column widths
-                for column_cells in worksheet.columns:
-                    max_length = max(len(str(cell.value) or "") for cell in column_cells)
-                    adjusted_width = max_length + 2
-                    worksheet.column_dimensions[column_cells[0].column_letter].width = adjusted_width
-        else:
-            # Normal Excel for female cows with milk production data
-            summaries_list = []
-            
-            if len(summaries) == 0:
-                # Create empty data message
-                summaries_list.append({
-                    "NO": "",
-                    "Sapi": "Tidak ada data",
-                    "Tanggal": "",
-                    "Produksi Pagi": 0,
-                    "Produksi Siang": 0,
-                    "Produksi Sore": 0,
-                    "Total Produksi": 0
-                })
-            else:
-                for idx, summary in enumerate(summaries, start=1):
-                    cow_info = f"{summary.cow_id} - {summary.cow.name}" if summary.cow else str(summary.cow_id)
-                    
-                    summaries_list.append({
-                        "NO": idx,
-                        "Sapi": cow_info,
-                        "Tanggal": summary.date.strftime('%Y-%m-%d'),
-                        "Produksi Pagi": float(summary.morning_volume or 0),
-                        "Produksi Siang": float(summary.afternoon_volume or 0),
-                        "Produksi Sore": float(summary.evening_volume or 0),
-                        "Total Produksi": float(summary.total_volume or 0)
-                    })
-                
-                # Add total row if there's data
-                if summaries_list and len(summaries) > 0:
-                    total_morning = sum(float(s.morning_volume or 0) for s in summaries)
-                    total_afternoon = sum(float(s.afternoon_volume or 0) for s in summaries)
-                    total_evening = sum(float(s.evening_volume or 0) for s in summaries)
-                    total_all = sum(float(s.total_volume or 0) for s in summaries)
-                    
-                    summaries_list.append({
-                        "NO": "",
-                        "Sapi": "TOTAL",
-                        "Tanggal": "",
-                        "Produksi Pagi": total_morning,
-                        "Produksi Siang": total_afternoon,
-                        "Produksi Sore": total_evening,
-                        "Total Produksi": total_all
-                    })
-
-            df = pd.DataFrame(summaries_list)
-            
-            with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, sheet_name='DailyMilkProduction')
-                workbook = writer.book
-                worksheet = writer.sheets['DailyMilkProduction']
-                
-                # Apply styling
-                from openpyxl.styles import Font, PatternFill, Alignment
-                header_fill = PatternFill(start_color="ADD8E6", end_color="ADD8E6", fill_type="solid")
-                header_font = Font(bold=True)
-                total_fill = PatternFill(start_color="E6E6E6", end_color="E6E6E6", fill_type="solid")
-                total_font = Font(bold=True)
-                
-                # Style headers
-                for cell in worksheet[1]:
-                    cell.fill = header_fill
-                    cell.font = header_font
-                    cell.alignment = Alignment(horizontal='center', vertical='center')
-                
-                # Style totals row if it exists and there's actual data
-                if len(summaries_list) > 1 and len(summaries) > 0:
-                    for cell in worksheet[len(summaries_list) + 1]:  # +1 for header row
-                        cell.fill = total_fill
-                        cell.font = total_font
-                
-                # Auto-adjust column widths
-                for column_cells in worksheet.columns:
-                    max_length = max(len(str(cell.value) or "") for cell in column_cells)
-                    adjusted_width = max_length + 2
-                    worksheet.column_dimensions[column_cells[0].column_letter].width = adjusted_width
-        
-        # Prepare file for download
-        buffer.seek(0)
-        
-        # Generate filename
-        if is_male_cow:
-            filename = f"bull_report_{cow_info.name.replace(' ', '_')}.xlsx"
-        else:
-            filename = "daily_milk_production.xlsx"
-            if start_date and end_date:
-                filename = f"milk_production_{start_date.strftime('%Y%m%d')}_to_{end_date.strftime('%Y%m%d')}.xlsx"
-            elif cow_id:
-                filename = f"milk_production_cow_{cow_id}.xlsx"
-            
-        return send_file(
-            buffer, 
-            as_attachment=True, 
-            download_name=filename, 
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
+            rows = [
+                ("Nama Sapi", cow_info.name),
+                ("ID Sapi", cow_info.id),
+                ("Jenis Kelamin", cow_info.gender),
+                ("Ras", cow_info.breed if cow_info.breed else 'N/A'),
+                ("Status", "Sapi Pejantan - Aktif untuk pembiakan"),
+                ("Fungsi", "Pembiakan dan pemuliaan genetik"),
+                ("Catatan", "Sapi pejantan tidak menghasilkan susu")
+            ]
+            age_str = _cow_age_text(cow_info)
+            if age_str:
+                rows.insert(4, ("Umur", age_str))
+
+            columns = [ExportColumn("Informasi", width=16), ExportColumn("Detail", width=40)]
+            return xlsx_response('InformasiPejantan', columns, rows, filename)
+
+        # Normal Excel for female cows with milk production data
+        totals = dict.fromkeys(('morning', 'afternoon', 'evening', 'total'), 0.0)
+        has_rows, rows = peek(_daily_summary_export_rows(cow_id, start_date, end_date, totals))
+        if not has_rows:
+            # Create empty data message
+            rows = [("", "Tidak ada data", "", 0, 0, 0, 0)]
+
+        columns = [
+            ExportColumn("NO", width=6),
+            ExportColumn("Sapi", width=30),
+            ExportColumn("Tanggal", width=12),
+            ExportColumn("Produksi Pagi", width=15),
+            ExportColumn("Produksi Siang", width=16),
+            ExportColumn("Produksi Sore", width=15),
+            ExportColumn("Total Produksi", width=16)
+        ]
+        footer_rows = (lambda: [(
+            "", "TOTAL", "",
+            totals['morning'], totals['afternoon'], totals['evening'], totals['total']
+        )]) if has_rows else None
+
+        return xlsx_response('DailyMilkProduction', columns, rows, filename, footer_rows)
     
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
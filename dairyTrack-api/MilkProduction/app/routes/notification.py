@@ -1,6 +1,11 @@
 from flask import Blueprint, jsonify, request
 from app.models.notification import Notification
 from app.database.database import db
+from app.services.notification import notification_service
+from app.services.notification_archive import notification_archive
+from app.services.unread_counter import unread_counter
+from datetime import datetime
+import math
 from pytz import timezone
 
 notification_bp = Blueprint('notification', __name__)
@@ -27,8 +32,18 @@ def get_notifications():
     # Order by newest first
     query = query.order_by(Notification.created_at.desc())
 
+    unread_count = unread_counter.get(user_id)
+
     # Paginate results
-    notifications = query.paginate(page=page, per_page=per_page)
+    if is_read is False:
+        # The unread total comes from the counter instead of a COUNT(*)
+        notifications = query.paginate(page=page, per_page=per_page, count=False)
+        total = unread_count
+        pages = math.ceil(total / per_page) if per_page else 0
+    else:
+        notifications = query.paginate(page=page, per_page=per_page)
+        total = notifications.total
+        pages = notifications.pages
 
     # Convert created_at ke Asia/Jakarta timezone
     jakarta = timezone("Asia/Jakarta")
@@ -44,9 +59,10 @@ def get_notifications():
                 'created_at': n.created_at.astimezone(jakarta).isoformat() if n.created_at else None
             } for n in notifications.items
         ],
-        'total': notifications.total,
-        'pages': notifications.pages,
-        'current_page': page
+        'total': total,
+        'pages': pages,
+        'current_page': page,
+        'unread_count': unread_count
     }
 
     return jsonify(result)
@@ -60,6 +76,8 @@ def mark_as_read(notification_id):
         return jsonify({"error": "Missing user_id in request body"}), 400
     
     notification = Notification.query.filter_by(id=notification_id, user_id=user_id).first_or_404()
+    if notification.is_read is False:
+        unread_counter.adjust({notification.user_id: -1})
     notification.is_read = True
     db.session.commit()
     
@@ -73,7 +91,7 @@ def get_unread_count():
     if not user_id:
         return jsonify({"error": "Missing user_id parameter"}), 400
     
-    count = Notification.query.filter_by(user_id=user_id, is_read=False).count()
+    count = unread_counter.get(user_id)
     return jsonify({'unread_count': count})
 
 
@@ -85,6 +103,8 @@ def delete_notification(notification_id):
         return jsonify({"error": "Missing user_id in request body"}), 400
     
     notification = Notification.query.filter_by(id=notification_id, user_id=user_id).first_or_404()
+    if notification.is_read is False:
+        unread_counter.adjust({notification.user_id: -1})
     db.session.delete(notification)
     db.session.commit()
     
@@ -98,10 +118,89 @@ def clear_all_notifications():
     if not user_id:
         return jsonify({"error": "Missing user_id in request body"}), 400
 
-    notifications = Notification.query.filter_by(user_id=user_id).all()
-    for n in notifications:
-        db.session.delete(n)
-    db.session.commit()
-    return jsonify({'message': 'Semua notifikasi dihapus'})
+    deleted = notification_service.clear_all(user_id)
+    return jsonify({'message': 'Semua notifikasi dihapus', 'deleted': deleted})
+
+
+@notification_bp.route('/read', methods=['PUT'])
+def mark_many_as_read():
+    """Mark a list of notifications as read in one statement"""
+    user_id = request.json.get('user_id')
+    notification_ids = request.json.get('ids')
+
+    if not user_id:
+        return jsonify({"error": "Missing user_id in request body"}), 400
+    if not isinstance(notification_ids, list) or not all(isinstance(i, int) for i in notification_ids):
+        return jsonify({"error": "ids must be a list of notification ids"}), 400
+
+    updated = notification_service.mark_read(user_id, notification_ids)
+    return jsonify({'message': 'Notifikasi ditandai sudah dibaca', 'updated': updated})
+
+
+@notification_bp.route('/read-all', methods=['PUT'])
+def mark_all_as_read():
+    """Mark every unread notification of the user as read"""
+    user_id = request.json.get('user_id')
+
+    if not user_id:
+        return jsonify({"error": "Missing user_id in request body"}), 400
+
+    updated = notification_service.mark_all_read(user_id)
+    return jsonify({'message': 'Semua notifikasi ditandai sudah dibaca', 'updated': updated})
+
+
+@notification_bp.route('/before', methods=['DELETE'])
+def delete_notifications_before():
+    """Delete the user's notifications created before a date (YYYY-MM-DD or ISO datetime)"""
+    user_id = request.json.get('user_id')
+    before = request.json.get('before')
+
+    if not user_id:
+        return jsonify({"error": "Missing user_id in request body"}), 400
+    try:
+        before = datetime.fromisoformat(before)
+    except (TypeError, ValueError):
+        return jsonify({"error": "before must be a date (YYYY-MM-DD) or ISO datetime"}), 400
 
-# ...existing code...
\ No newline at end of file
+    deleted = notification_service.delete_before(user_id, before)
+    return jsonify({'message': 'Notifikasi lama dihapus', 'deleted': deleted})
+
+
+@notification_bp.route('/archive', methods=['GET'])
+def get_archived_notifications():
+    """Notifications moved to the archive by the retention job, newest first"""
+    user_id = request.args.get('user_id', type=int)
+
+    if not user_id:
+        return jsonify({"error": "Missing user_id parameter"}), 400
+
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 10, type=int)
+    try:
+        before = datetime.fromisoformat(request.args['before']) if request.args.get('before') else None
+        after = datetime.fromisoformat(request.args['after']) if request.args.get('after') else None
+    except ValueError:
+        return jsonify({"error": "before/after must be a date (YYYY-MM-DD) or ISO datetime"}), 400
+
+    notifications = notification_archive.query_for_user(user_id, before, after).paginate(
+        page=page, per_page=per_page
+    )
+
+    jakarta = timezone("Asia/Jakarta")
+
+    return jsonify({
+        'notifications': [
+            {
+                'id': n.notification_id,
+                'cow_id': n.cow_id,
+                'message': n.message,
+                'type': n.type,
+                'is_read': n.is_read,
+                'created_at': n.created_at.astimezone(jakarta).isoformat() if n.created_at else None,
+                'archived_at': n.archived_at.astimezone(jakarta).isoformat() if n.archived_at else None
+            } for n in notifications.items
+        ],
+        'total': notifications.total,
+        'pages': notifications.pages,
+        'current_page': page
+    })
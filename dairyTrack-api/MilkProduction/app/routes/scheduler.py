@@ -1,6 +1,15 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from app.services.notification import check_milk_production_and_notify, check_milk_expiry_and_notify
 from app.services.notificationScheduler import notification_scheduler
+from app.services.notificationQueue import notification_check_queue
+from app.services.recipient_directory import recipient_directory
+from app.services.notification_dedup import notification_dedup
+from app.services.notification_archive import notification_archive
+from app.services.batch_provenance import batch_provenance
+from app.services.user_cascade import user_cascade
+from app.services.session_store import session_store
+from app.services.password_hasher import password_hasher
+from app.socket import outbox, presence
 import logging
 
 scheduler_bp = Blueprint('scheduler', __name__)
@@ -51,12 +60,42 @@ def scheduler_status():
         return jsonify({
             "success": True,
             "scheduler_running": is_running,
-            "jobs": jobs
+            "jobs": jobs,
+            "leader": notification_scheduler.status(),
+            "recent_runs": notification_scheduler.recent_runs(limit=10),
+            "notification_queue": notification_check_queue.status(),
+            "recipient_directory": recipient_directory.status(),
+            "notification_dedup": notification_dedup.status(),
+            "notification_archive": notification_archive.status(),
+            "batch_provenance": batch_provenance.status(),
+            "user_cascade": user_cascade.status(),
+            "session_store": session_store.status(),
+            "password_hasher": password_hasher.status(),
+            "socket_presence": presence.status(),
+            "notification_outbox": outbox.status()
         }), 200
     except Exception as e:
         logging.error(f"Error getting scheduler status: {str(e)}")
         return jsonify({"success": False, "error": str(e)}), 500
 
+@scheduler_bp.route('/job-runs', methods=['GET'])
+def job_runs():
+    """List recorded job runs, newest first"""
+    try:
+        job_id = request.args.get('job_id')
+        try:
+            limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        except ValueError:
+            return jsonify({"success": False, "error": "limit must be an integer"}), 400
+
+        return jsonify({
+            "success": True,
+            "job_runs": notification_scheduler.recent_runs(job_id, limit)
+        }), 200
+    except Exception as e:
+        logging.error(f"Error listing job runs: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
 @scheduler_bp.route('/restart-scheduler', methods=['POST'])
 def restart_scheduler():
     """Restart the scheduler"""
@@ -1,7 +1,11 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from app.models.users import User
 from app.models.cows import Cow
 from app.database.database import db
+from app.models.user_cow_association import user_cow_association
+from app.services.assignment_sync import UnknownIds, sync_assignments
+from app.services.change_counter import change_counter
+from app.services.recipient_directory import recipient_directory
 
 user_cow_bp = Blueprint('user_cow', __name__)
 
@@ -30,7 +34,9 @@ def assign_cow_to_user():
 
         # Tambahkan relasi
         user.managed_cows.append(cow)
+        change_counter.bump('user_cow_association')
         db.session.commit()
+        recipient_directory.invalidate(roles=False)
 
         return jsonify({"message": "Cow assigned to user successfully"}), 200
 
@@ -39,6 +45,59 @@ def assign_cow_to_user():
         return jsonify({"error": str(e)}), 500      
 
 
+@user_cow_bp.route('/assignments/sync', methods=['POST'])
+def sync_cow_assignments():
+    """
+    Menyamakan relasi User-Cow dengan himpunan yang diinginkan, sekaligus.
+
+    Per user:  {"user_id": 5, "cow_ids": [1, 2, 3]}
+    Per herd:  {"herd": [1, 2, 3], "assignments": [{"user_id": 5, "cow_id": 1}, ...]}
+    "dry_run": true hanya menghitung perubahan.
+    """
+    try:
+        data = request.get_json() or {}
+        dry_run = bool(data.get('dry_run', False))
+
+        if data.get('user_id') is not None:
+            user_id = data['user_id']
+            if not isinstance(data.get('cow_ids'), list):
+                return jsonify({"error": "cow_ids must be a list"}), 400
+            if not User.query.get(user_id):
+                return jsonify({"error": "User not found"}), 404
+            diff = sync_assignments(
+                [(user_id, cow_id) for cow_id in data['cow_ids']], user_id=user_id, dry_run=dry_run
+            )
+        elif isinstance(data.get('herd'), list):
+            assignments = data.get('assignments', [])
+            if not isinstance(assignments, list):
+                return jsonify({"error": "assignments must be a list"}), 400
+            diff = sync_assignments(
+                [(item['user_id'], item['cow_id']) for item in assignments],
+                cow_ids=data['herd'], dry_run=dry_run
+            )
+        else:
+            return jsonify({"error": "Missing required fields: user_id and cow_ids, or herd and assignments"}), 400
+
+        return jsonify({
+            "message": "Assignments checked" if dry_run else "Assignments synchronized successfully",
+            "dry_run": dry_run,
+            "inserted": diff.inserted,
+            "deleted": diff.deleted
+        }), 200
+
+    except UnknownIds as e:
+        return jsonify({
+            "error": "Unknown users or cows",
+            "user_ids": sorted(e.user_ids),
+            "cow_ids": sorted(e.cow_ids)
+        }), 404
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid assignment data: {str(e)}"}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+
 @user_cow_bp.route('/unassign', methods=['POST'])
 def unassign_cow_from_user():
     """
@@ -64,7 +123,9 @@ def unassign_cow_from_user():
 
         # Hapus relasi
         user.managed_cows.remove(cow)
+        change_counter.bump('user_cow_association')
         db.session.commit()
+        recipient_directory.invalidate(roles=False)
 
         return jsonify({"message": "Cow unassigned from user successfully"}), 200
 
@@ -215,3 +276,112 @@ def get_cow_managers(cow_id):
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+
+ASSIGNMENT_TABLES = ('users', 'cows', 'user_cow_association')
+
+
+def _assignment_user(row):
+    return {
+        "id": row.user_id,
+        "username": row.username,
+        "name": row.user_name,
+        "email": row.email,
+        "contact": row.contact,
+        "role_id": row.role_id
+    }
+
+
+def _assignment_cow(row):
+    return {
+        "id": row.cow_id,
+        "name": row.cow_name,
+        "birth": row.birth,
+        "breed": row.breed,
+        "lactation_phase": row.lactation_phase,
+        "weight": row.weight,
+        "gender": row.gender,
+        "is_active": row.is_active
+    }
+
+
+def _assignment_columns():
+    return (
+        User.id.label('user_id'), User.username, User.name.label('user_name'), User.email,
+        User.contact, User.role_id,
+        Cow.id.label('cow_id'), Cow.name.label('cow_name'), Cow.birth, Cow.breed,
+        Cow.lactation_phase, Cow.weight, Cow.gender, Cow.is_active
+    )
+
+
+def _revalidated(etag, build):
+    """304 if the client already has `etag`, else the JSON built by `build`"""
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@user_cow_bp.route('/assignments/by-user', methods=['GET'])
+def get_assignments_by_user():
+    """
+    Semua user (opsional ?role_id=) beserta sapi yang dikelola, dalam satu query.
+    """
+    try:
+        role_id = request.args.get('role_id', type=int)
+
+        def build():
+            query = db.session.query(*_assignment_columns()).select_from(User).outerjoin(
+                user_cow_association, user_cow_association.c.user_id == User.id
+            ).outerjoin(
+                Cow, Cow.id == user_cow_association.c.cow_id
+            )
+            if role_id is not None:
+                query = query.filter(User.role_id == role_id)
+
+            assignments = []
+            for row in query.order_by(User.id, Cow.id):
+                if not assignments or assignments[-1]["user"]["id"] != row.user_id:
+                    assignments.append({"user": _assignment_user(row), "cows": []})
+                if row.cow_id is not None:
+                    assignments[-1]["cows"].append(_assignment_cow(row))
+            return {"assignments": assignments}
+
+        return _revalidated(change_counter.etag(ASSIGNMENT_TABLES, 'by-user', role_id), build)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@user_cow_bp.route('/assignments/by-cow', methods=['GET'])
+def get_assignments_by_cow():
+    """
+    Semua sapi (opsional ?active=true) beserta user yang mengelolanya, dalam satu query.
+    """
+    try:
+        active_only = request.args.get('active', '').lower() == 'true'
+
+        def build():
+            query = db.session.query(*_assignment_columns()).select_from(Cow).outerjoin(
+                user_cow_association, user_cow_association.c.cow_id == Cow.id
+            ).outerjoin(
+                User, User.id == user_cow_association.c.user_id
+            )
+            if active_only:
+                query = query.filter(Cow.is_active.is_(True))
+
+            assignments = []
+            for row in query.order_by(Cow.id, User.id):
+                if not assignments or assignments[-1]["cow"]["id"] != row.cow_id:
+                    assignments.append({"cow": _assignment_cow(row), "managers": []})
+                if row.user_id is not None:
+                    assignments[-1]["managers"].append(_assignment_user(row))
+            return {"assignments": assignments}
+
+        return _revalidated(change_counter.etag(ASSIGNMENT_TABLES, 'by-cow', active_only), build)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
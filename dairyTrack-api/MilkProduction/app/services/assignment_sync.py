@@ -0,0 +1,110 @@
+"""
+Cow Assignment Sync
+
+Replaces the cow-manager pairs of a scope (one user, or a herd of cows)
+in `user_cow_association` with a desired set. The diff runs in SQL: one
+DELETE of the scope's pairs not in the desired set and one INSERT ...
+SELECT of the desired pairs that do not exist yet, in a single
+transaction. The association version is bumped with it and the cached
+cow manager sets of the notification service are dropped afterwards.
+"""
+
+from typing import Iterable, NamedTuple, Optional, Set, Tuple
+import logging
+
+from sqlalchemy import and_, exists, func, not_, select, true, tuple_
+
+from app.models.cows import Cow
+from app.models.users import User
+from app.models.user_cow_association import user_cow_association
+from app.database.database import db
+from app.services.change_counter import change_counter
+from app.services.recipient_directory import recipient_directory
+
+
+logger = logging.getLogger(__name__)
+
+
+class AssignmentDiff(NamedTuple):
+    """Pairs added and removed by a sync"""
+    inserted: int
+    deleted: int
+
+
+class UnknownIds(ValueError):
+    """Desired pairs name users or cows that do not exist"""
+
+    def __init__(self, user_ids: Set[int], cow_ids: Set[int]):
+        super().__init__(f"Unknown user ids {sorted(user_ids)}, cow ids {sorted(cow_ids)}")
+        self.user_ids = user_ids
+        self.cow_ids = cow_ids
+
+
+def _unknown_ids(pairs: Set[Tuple[int, int]]) -> Tuple[Set[int], Set[int]]:
+    user_ids = {user_id for user_id, _ in pairs}
+    cow_ids = {cow_id for _, cow_id in pairs}
+    if user_ids:
+        user_ids -= set(db.session.execute(select(User.id).where(User.id.in_(user_ids))).scalars())
+    if cow_ids:
+        cow_ids -= set(db.session.execute(select(Cow.id).where(Cow.id.in_(cow_ids))).scalars())
+    return user_ids, cow_ids
+
+
+def sync_assignments(desired: Iterable[Tuple[int, int]], user_id: Optional[int] = None,
+                     cow_ids: Optional[Iterable[int]] = None, dry_run: bool = False) -> AssignmentDiff:
+    """
+    Make the (user_id, cow_id) pairs of a scope exactly `desired`. The
+    scope is every pair of `user_id`, or every pair of the herd `cow_ids`;
+    desired pairs outside it are rejected with ValueError, unknown users
+    or cows with UnknownIds. With dry_run nothing is written.
+    """
+    a = user_cow_association.c
+    desired = {(int(u), int(c)) for u, c in desired}
+
+    if user_id is not None:
+        user_id = int(user_id)
+        scope = a.user_id == user_id
+        outside = {pair for pair in desired if pair[0] != user_id}
+    elif cow_ids is not None:
+        cow_ids = {int(c) for c in cow_ids}
+        scope = a.cow_id.in_(cow_ids)
+        outside = {pair for pair in desired if pair[1] not in cow_ids}
+    else:
+        raise ValueError("Either user_id or cow_ids is required")
+    if outside:
+        raise ValueError(f"Pairs outside the scope: {sorted(outside)}")
+
+    unknown_users, unknown_cows = _unknown_ids(desired)
+    if unknown_users or unknown_cows:
+        raise UnknownIds(unknown_users, unknown_cows)
+
+    stale = and_(scope, not_(tuple_(a.user_id, a.cow_id).in_(desired))) if desired else scope
+    missing = select(User.id, Cow.id).select_from(User).join(Cow, true()).where(
+        tuple_(User.id, Cow.id).in_(desired),
+        ~exists().where(a.user_id == User.id, a.cow_id == Cow.id)
+    ) if desired else None
+
+    if dry_run:
+        deleted = db.session.execute(select(func.count()).select_from(user_cow_association).where(stale)).scalar()
+        inserted = db.session.execute(
+            select(func.count()).select_from(missing.subquery())
+        ).scalar() if missing is not None else 0
+        return AssignmentDiff(inserted, deleted)
+
+    try:
+        deleted = db.session.execute(user_cow_association.delete().where(stale)).rowcount
+        inserted = db.session.execute(
+            user_cow_association.insert().from_select(['user_id', 'cow_id'], missing)
+        ).rowcount if missing is not None else 0
+        if inserted or deleted:
+            change_counter.bump('user_cow_association')
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if inserted or deleted:
+        recipient_directory.invalidate(roles=False)
+    logger.info(f"Assignment sync ({'user ' + str(user_id) if user_id is not None else 'herd'}): "
+                f"{inserted} inserted, {deleted} deleted")
+    return AssignmentDiff(inserted, deleted)
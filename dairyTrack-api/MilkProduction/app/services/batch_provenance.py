@@ -0,0 +1,101 @@
+"""
+Milk Batch Provenance
+
+Resolves which cows a milk batch came from (batch -> cows via
+`milking_sessions`) for the expiry notifications. All batches of a sweep
+are resolved with one joined query, and the result serves the whole sweep.
+Provenance no longer changes once a batch is sealed (no longer FRESH), so
+sealed batches are also kept in a bounded LRU across sweeps. Editing or
+deleting a milking session forgets its batch.
+"""
+
+from collections import OrderedDict
+from typing import Dict, Iterable, NamedTuple, Tuple
+import logging
+import threading
+
+from app.models.cows import Cow
+from app.models.milk_batches import MilkBatch, MilkStatus
+from app.models.milking_sessions import MilkingSession
+from app.database.database import db
+
+
+logger = logging.getLogger(__name__)
+
+
+class BatchCow(NamedTuple):
+    """A cow that contributed milk to a batch"""
+    id: int
+    name: str
+
+
+class BatchProvenanceCache:
+    """LRU of sealed batch id -> contributing cows"""
+
+    DEFAULT_MAX_ENTRIES = 5000
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._sealed: "OrderedDict[int, Tuple[BatchCow, ...]]" = OrderedDict()
+        self._metrics = {'hits': 0, 'misses': 0, 'queries': 0}
+
+    def init_app(self, app):
+        self.max_entries = int(app.config.get('BATCH_PROVENANCE_CACHE_SIZE', self.DEFAULT_MAX_ENTRIES))
+
+    def cows_of(self, batches: Iterable[MilkBatch]) -> Dict[int, Tuple[BatchCow, ...]]:
+        """
+        {batch id: cows} for every batch; sealed batches come from the LRU,
+        the rest from one query joining milking_sessions to cows.
+        """
+        batches = {batch.id: batch for batch in batches}
+        result: Dict[int, Tuple[BatchCow, ...]] = {}
+        with self._lock:
+            for batch_id in batches:
+                if batch_id in self._sealed:
+                    self._sealed.move_to_end(batch_id)
+                    result[batch_id] = self._sealed[batch_id]
+            self._metrics['hits'] += len(result)
+            self._metrics['misses'] += len(batches) - len(result)
+
+        missing = [batch_id for batch_id in batches if batch_id not in result]
+        if not missing:
+            return result
+
+        loaded: Dict[int, list] = {batch_id: [] for batch_id in missing}
+        for batch_id, cow_id, cow_name in db.session.query(
+            MilkingSession.milk_batch_id, Cow.id, Cow.name
+        ).join(
+            Cow, Cow.id == MilkingSession.cow_id
+        ).filter(
+            MilkingSession.milk_batch_id.in_(missing)
+        ).distinct().order_by(MilkingSession.milk_batch_id, Cow.id):
+            loaded[batch_id].append(BatchCow(cow_id, cow_name))
+
+        with self._lock:
+            self._metrics['queries'] += 1
+            for batch_id, cows in loaded.items():
+                result[batch_id] = tuple(cows)
+                if batches[batch_id].status != MilkStatus.FRESH:
+                    self._sealed[batch_id] = result[batch_id]
+            while len(self._sealed) > self.max_entries:
+                self._sealed.popitem(last=False)
+        return result
+
+    def forget(self, batch_ids: Iterable[int]) -> None:
+        """Drop batches whose sessions were edited or deleted"""
+        with self._lock:
+            for batch_id in batch_ids:
+                self._sealed.pop(batch_id, None)
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                'max_entries': self.max_entries,
+                'cached_batches': len(self._sealed),
+                **self._metrics
+            }
+
+
+# Global provenance cache instance
+batch_provenance = BatchProvenanceCache()
@@ -0,0 +1,248 @@
+"""
+Daily Milk Summary Maintenance Service
+
+This module keeps `daily_milk_summary` in step with `milking_sessions`.
+Writes are applied as atomic volume deltas (upserts keyed on cow_id + date)
+so concurrent milker requests never overwrite each other, and a rebuild mode
+recomputes whole date ranges from the raw sessions with a single GROUP BY.
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+from sqlalchemy import and_, bindparam, case, delete, extract, func, insert, select, tuple_, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from app.models.daily_milk_summary import DailyMilkSummary
+from app.models.milking_sessions import MilkingSession
+from app.database.database import db
+
+
+logger = logging.getLogger(__name__)
+
+
+class MilkingPeriods:
+    """Milking periods and their column in daily_milk_summary"""
+    MORNING = "morning_volume"
+    AFTERNOON = "afternoon_volume"
+    EVENING = "evening_volume"
+
+    ALL = (MORNING, AFTERNOON, EVENING)
+
+    # Hour boundaries (exclusive upper bound) for morning and afternoon
+    MORNING_END_HOUR = 12
+    AFTERNOON_END_HOUR = 18
+
+
+def period_for_time(milking_time: datetime) -> str:
+    """Return the summary column a milking at this time belongs to"""
+    hour = milking_time.hour
+    if hour < MilkingPeriods.MORNING_END_HOUR:
+        return MilkingPeriods.MORNING
+    elif hour < MilkingPeriods.AFTERNOON_END_HOUR:
+        return MilkingPeriods.AFTERNOON
+    return MilkingPeriods.EVENING
+
+
+@dataclass(frozen=True)
+class SummaryDelta:
+    """A signed volume change for one cow, day and milking period"""
+    cow_id: int
+    date: date
+    period: str
+    volume: float
+
+    @classmethod
+    def for_session(cls, cow_id: int, milking_time: datetime,
+                    volume: float, sign: int = 1) -> "SummaryDelta":
+        """Build the delta a session contributes (sign=-1 to remove it)"""
+        return cls(int(cow_id), milking_time.date(), period_for_time(milking_time),
+                   sign * float(volume or 0))
+
+
+class DailySummaryService:
+    """Applies session deltas to daily summaries and rebuilds them on demand"""
+
+    # Totals at or below this are treated as empty (float drift from +/- deltas)
+    EMPTY_VOLUME_EPSILON = 1e-6
+
+    def __init__(self):
+        self.table = DailyMilkSummary.__table__
+
+    # ------------------------------------------------------------------
+    # Incremental maintenance
+    # ------------------------------------------------------------------
+    def add_session(self, cow_id: int, milking_time: datetime, volume: float) -> None:
+        """Add a session's volume to its daily summary"""
+        self.apply_deltas([SummaryDelta.for_session(cow_id, milking_time, volume)])
+
+    def remove_session(self, cow_id: int, milking_time: datetime, volume: float) -> None:
+        """Subtract a session's volume from its daily summary"""
+        self.apply_deltas([SummaryDelta.for_session(cow_id, milking_time, volume, sign=-1)])
+
+    def move_session(self, old_cow_id: int, old_milking_time: datetime, old_volume: float,
+                     new_cow_id: int, new_milking_time: datetime, new_volume: float) -> None:
+        """Move a session's contribution after its cow, time or volume changed"""
+        old = SummaryDelta.for_session(old_cow_id, old_milking_time, old_volume, sign=-1)
+        new = SummaryDelta.for_session(new_cow_id, new_milking_time, new_volume)
+        if (old.cow_id, old.date, old.period, -old.volume) == (new.cow_id, new.date, new.period, new.volume):
+            return
+        self.apply_deltas([old, new])
+
+    def apply_deltas(self, deltas: Iterable[SummaryDelta]) -> None:
+        """
+        Apply volume deltas inside the caller's transaction.
+
+        Deltas are aggregated per (cow_id, date) first, so a whole shift is
+        applied with one multi-row upsert for additions and one executemany
+        UPDATE for removals. The caller is responsible for committing.
+        """
+        grouped: Dict[Tuple[int, date], Dict[str, float]] = defaultdict(
+            lambda: dict.fromkeys(MilkingPeriods.ALL, 0.0)
+        )
+        for delta in deltas:
+            if delta.period not in MilkingPeriods.ALL:
+                raise ValueError(f"Unknown milking period: {delta.period}")
+            grouped[(delta.cow_id, delta.date)][delta.period] += delta.volume
+
+        # Split each key by sign: additions may need to create the row,
+        # removals must be clamped at zero and can leave the row empty.
+        additions, removals = [], []
+        for (cow_id, summary_date), periods in grouped.items():
+            added = {p: max(v, 0.0) for p, v in periods.items()}
+            removed = {p: min(v, 0.0) for p, v in periods.items()}
+            if any(added.values()):
+                additions.append({'cow_id': cow_id, 'date': summary_date, **added})
+            if any(removed.values()):
+                removals.append({'cow_id': cow_id, 'date': summary_date, **removed})
+
+        if additions:
+            self._upsert_additions(additions)
+        if removals:
+            self._apply_removals(removals)
+
+    def _upsert_additions(self, rows: List[Dict]) -> None:
+        """Insert-or-increment summaries with `col = col + :delta` semantics"""
+        values = [{
+            'cow_id': row['cow_id'],
+            'date': row['date'],
+            'morning_volume': row[MilkingPeriods.MORNING],
+            'afternoon_volume': row[MilkingPeriods.AFTERNOON],
+            'evening_volume': row[MilkingPeriods.EVENING],
+            'total_volume': sum(row[p] for p in MilkingPeriods.ALL),
+        } for row in rows]
+        columns = MilkingPeriods.ALL + ('total_volume',)
+        dialect = db.session.get_bind().dialect.name
+
+        if dialect == 'mysql':
+            stmt = mysql.insert(self.table).values(values)
+            stmt = stmt.on_duplicate_key_update(
+                {col: self.table.c[col] + stmt.inserted[col] for col in columns}
+            )
+        elif dialect in ('postgresql', 'sqlite'):
+            dialect_insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+            stmt = dialect_insert(self.table).values(values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['cow_id', 'date'],
+                set_={col: self.table.c[col] + stmt.excluded[col] for col in columns}
+            )
+        else:
+            raise NotImplementedError(f"Summary upsert is not supported on {dialect}")
+
+        db.session.execute(stmt)
+
+    def _apply_removals(self, rows: List[Dict]) -> None:
+        """Subtract volumes (clamped at zero) and drop summaries left empty"""
+        c = self.table.c
+
+        def clamped(period: str):
+            new_value = c[period] + bindparam(f"d_{period}")
+            return case((new_value < 0, 0), else_=new_value)
+
+        # total_volume is assigned first and only reads pre-update values, so
+        # the statement is correct on MySQL (left-to-right SET) and on
+        # standard SQL engines alike.
+        stmt = update(self.table).where(
+            and_(c.cow_id == bindparam('b_cow_id'), c.date == bindparam('b_date'))
+        ).ordered_values(
+            (c.total_volume, clamped(MilkingPeriods.MORNING) + clamped(MilkingPeriods.AFTERNOON)
+                             + clamped(MilkingPeriods.EVENING)),
+            *[(c[p], clamped(p)) for p in MilkingPeriods.ALL]
+        )
+        db.session.execute(stmt, [{
+            'b_cow_id': row['cow_id'],
+            'b_date': row['date'],
+            **{f"d_{p}": row[p] for p in MilkingPeriods.ALL}
+        } for row in rows])
+
+        keys = [(row['cow_id'], row['date']) for row in rows]
+        db.session.execute(
+            delete(self.table).where(and_(
+                tuple_(c.cow_id, c.date).in_(keys),
+                c.total_volume <= self.EMPTY_VOLUME_EPSILON
+            ))
+        )
+
+    # ------------------------------------------------------------------
+    # Rebuild
+    # ------------------------------------------------------------------
+    def rebuild(self, start_date: date, end_date: date, cow_id: Optional[int] = None) -> int:
+        """
+        Recompute summaries for [start_date, end_date] from milking_sessions.
+
+        Existing summaries in the range are replaced by a single
+        INSERT ... SELECT ... GROUP BY cow_id, DATE(milking_time).
+        Returns the number of summaries written. The caller commits.
+        """
+        if start_date > end_date:
+            raise ValueError("start_date cannot be later than end_date")
+
+        c = self.table.c
+        range_start = datetime.combine(start_date, datetime.min.time())
+        range_end = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+
+        clear_stmt = delete(self.table).where(and_(c.date >= start_date, c.date <= end_date))
+        if cow_id is not None:
+            clear_stmt = clear_stmt.where(c.cow_id == cow_id)
+        db.session.execute(clear_stmt)
+
+        hour = extract('hour', MilkingSession.milking_time)
+        session_date = func.date(MilkingSession.milking_time)
+        volume = func.coalesce(MilkingSession.volume, 0)
+
+        def period_sum(condition):
+            return func.coalesce(func.sum(case((condition, volume), else_=0)), 0)
+
+        source = select(
+            MilkingSession.cow_id,
+            session_date,
+            period_sum(hour < MilkingPeriods.MORNING_END_HOUR),
+            period_sum(and_(hour >= MilkingPeriods.MORNING_END_HOUR,
+                            hour < MilkingPeriods.AFTERNOON_END_HOUR)),
+            period_sum(hour >= MilkingPeriods.AFTERNOON_END_HOUR),
+            func.coalesce(func.sum(volume), 0),
+        ).where(and_(
+            MilkingSession.milking_time >= range_start,
+            MilkingSession.milking_time < range_end
+        ))
+        if cow_id is not None:
+            source = source.where(MilkingSession.cow_id == cow_id)
+        source = source.group_by(MilkingSession.cow_id, session_date)
+
+        result = db.session.execute(
+            insert(self.table).from_select(
+                ['cow_id', 'date', 'morning_volume', 'afternoon_volume',
+                 'evening_volume', 'total_volume'],
+                source
+            )
+        )
+        rebuilt = result.rowcount if result.rowcount is not None else 0
+        logger.info(f"Rebuilt {rebuilt} daily summaries from {start_date} to {end_date}")
+        return rebuilt
+
+
+# Global service instance
+daily_summary_service = DailySummaryService()
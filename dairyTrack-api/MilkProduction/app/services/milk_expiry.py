@@ -0,0 +1,213 @@
+"""
+Milk Batch Expiry Service
+
+Query helpers for the milk-expiry endpoints. Batches are scoped to a user
+with a semi-join through `user_cow_association` and `milking_sessions`
+(never a materialized id list), and expiry analysis buckets every FRESH
+batch that expires within the widest window in one range scan over the
+(status, expiry_date) index.
+
+FRESH -> EXPIRED transitions are a single set-based UPDATE whose affected
+rows are handed back to the caller, so notification work is proportional
+to the batches that actually expired rather than to every fresh batch.
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional
+import logging
+
+from sqlalchemy import and_, case, exists, func, select, update
+
+from app.models.milk_batches import MilkBatch, MilkStatus
+from app.models.milking_sessions import MilkingSession
+from app.models.user_cow_association import user_cow_association
+from app.database.database import db
+
+
+logger = logging.getLogger(__name__)
+
+
+class ExpiryBuckets:
+    """Expiry buckets; every fresh batch falls into at most one of them"""
+    OVERDUE = "overdue"
+    WITHIN_1_HOUR = "within_1_hour"
+    WITHIN_2_HOURS = "within_2_hours"
+    WITHIN_4_HOURS = "within_4_hours"
+
+    # Upper bound (hours from now) of each non-overdue bucket, narrowest first
+    WINDOWS = (
+        (WITHIN_1_HOUR, 1),
+        (WITHIN_2_HOURS, 2),
+        (WITHIN_4_HOURS, 4),
+    )
+    ALL = (OVERDUE,) + tuple(name for name, _ in WINDOWS)
+
+
+@dataclass
+class BucketStats:
+    """Rows, count and volume of one expiry bucket"""
+    batches: List[MilkBatch] = field(default_factory=list)
+    volume: float = 0.0
+
+    @property
+    def count(self) -> int:
+        return len(self.batches)
+
+
+def is_admin_role(user_role: Optional[str]) -> bool:
+    """Admins see every batch"""
+    return bool(user_role and user_role.lower() == 'admin')
+
+
+def managed_batch_filter(user_id: int, user_role: Optional[str] = None):
+    """
+    Filter clause restricting MilkBatch to batches with at least one session
+    from a cow managed by the user, or None for admins (no restriction).
+    """
+    if is_admin_role(user_role):
+        return None
+
+    managed_session = select(MilkingSession.id).select_from(
+        MilkingSession.__table__.join(
+            user_cow_association,
+            user_cow_association.c.cow_id == MilkingSession.cow_id
+        )
+    ).where(and_(
+        user_cow_association.c.user_id == user_id,
+        MilkingSession.milk_batch_id == MilkBatch.id
+    ))
+    return exists(managed_session)
+
+
+def scoped_batches(user_id: int, user_role: Optional[str] = None):
+    """MilkBatch query limited to the batches the user manages"""
+    query = MilkBatch.query
+    scope = managed_batch_filter(user_id, user_role)
+    if scope is not None:
+        query = query.filter(scope)
+    return query
+
+
+def count_managed_batches(user_id: int, user_role: Optional[str] = None) -> int:
+    """Number of batches the user manages, counted in the database"""
+    query = db.session.query(func.count(MilkBatch.id))
+    scope = managed_batch_filter(user_id, user_role)
+    if scope is not None:
+        query = query.filter(scope)
+    return query.scalar() or 0
+
+
+def bucket_expiring_batches(user_id: int, user_role: Optional[str] = None,
+                            now: Optional[datetime] = None) -> Dict[str, BucketStats]:
+    """
+    Assign every FRESH batch that is overdue or expires within the widest
+    window to its narrowest bucket with a single CASE query.
+
+    Buckets are disjoint; callers that want cumulative windows (e.g.
+    "within 2 hours" including the 1-hour bucket) merge them.
+    """
+    now = now or datetime.utcnow()
+    widest_hours = ExpiryBuckets.WINDOWS[-1][1]
+
+    bucket = case(
+        (MilkBatch.expiry_date <= now, ExpiryBuckets.OVERDUE),
+        *[
+            (MilkBatch.expiry_date <= now + timedelta(hours=hours), name)
+            for name, hours in ExpiryBuckets.WINDOWS
+        ],
+    ).label('bucket')
+
+    query = db.session.query(MilkBatch, bucket).filter(and_(
+        MilkBatch.status == MilkStatus.FRESH,
+        MilkBatch.expiry_date <= now + timedelta(hours=widest_hours)
+    ))
+    scope = managed_batch_filter(user_id, user_role)
+    if scope is not None:
+        query = query.filter(scope)
+
+    buckets = {name: BucketStats() for name in ExpiryBuckets.ALL}
+    for batch, name in query.order_by(MilkBatch.expiry_date, MilkBatch.id):
+        stats = buckets[name]
+        stats.batches.append(batch)
+        stats.volume += float(batch.total_volume or 0)
+    return buckets
+
+
+def merge_buckets(buckets: Dict[str, BucketStats], *names: str) -> BucketStats:
+    """Combine disjoint buckets into one cumulative window (expiry order kept)"""
+    merged = BucketStats()
+    for name in names:
+        merged.batches.extend(buckets[name].batches)
+        merged.volume += buckets[name].volume
+    merged.batches.sort(key=lambda batch: (batch.expiry_date, batch.id))
+    return merged
+
+
+class ExpiredBatch(NamedTuple):
+    """A batch moved from FRESH to EXPIRED by `expire_due_batches`"""
+    id: int
+    batch_number: str
+    total_volume: float
+    expiry_date: datetime
+
+
+class BatchExpiryService:
+    """Set-based FRESH -> EXPIRED transition for overdue milk batches"""
+
+    def __init__(self):
+        self.table = MilkBatch.__table__
+
+    def _due_condition(self, now: datetime, batch_filter=None):
+        c = self.table.c
+        condition = and_(
+            c.status == MilkStatus.FRESH,
+            c.expiry_date <= now
+        )
+        if batch_filter is not None:
+            condition = and_(condition, batch_filter)
+        return condition
+
+    def expire_due_batches(self, now: Optional[datetime] = None,
+                           batch_filter=None) -> List[ExpiredBatch]:
+        """
+        Mark every FRESH batch with expiry_date <= now as EXPIRED in one
+        UPDATE and return the rows it changed. `batch_filter` is an optional
+        extra clause (e.g. `managed_batch_filter`). The caller commits.
+
+        PostgreSQL uses UPDATE ... RETURNING. Other engines (MySQL) first
+        lock the due ids with SELECT ... FOR UPDATE in the same transaction
+        and then update exactly those ids, so concurrent ticks never report
+        the same batch twice.
+        """
+        now = now or datetime.utcnow()
+        c = self.table.c
+        returned = (c.id, c.batch_number, c.total_volume, c.expiry_date)
+        values = {'status': MilkStatus.EXPIRED, 'updated_at': now}
+        dialect = db.session.get_bind().dialect.name
+
+        if dialect == 'postgresql':
+            stmt = update(self.table).where(
+                self._due_condition(now, batch_filter)
+            ).values(**values).returning(*returned)
+            expired = [ExpiredBatch(*row) for row in db.session.execute(stmt)]
+        else:
+            due = select(*returned).where(self._due_condition(now, batch_filter))
+            if dialect == 'mysql':
+                due = due.with_for_update()
+            expired = [ExpiredBatch(*row) for row in db.session.execute(due)]
+            if expired:
+                db.session.execute(
+                    update(self.table).where(and_(
+                        c.id.in_([batch.id for batch in expired]),
+                        c.status == MilkStatus.FRESH
+                    )).values(**values)
+                )
+
+        if expired:
+            logger.info(f"Expired {len(expired)} milk batches")
+        return expired
+
+
+# Global service instance
+batch_expiry_service = BatchExpiryService()
@@ -5,9 +5,10 @@ This module handles all notification logic for the Dairy Track system,
 including milk production alerts, expiry warnings, and real-time notifications.
 """
 
+from collections import Counter
 from dataclasses import dataclass
 from datetime import date, datetime, timedelta
-from typing import List, Optional, Dict, Set, Tuple
+from typing import Iterable, List, Optional, Dict, Set, Tuple
 import logging
 import time
 import html
@@ -16,17 +17,27 @@ from functools import wraps
 
 import pytz
 from flask import current_app
-from sqlalchemy import and_, func
+from sqlalchemy import and_, bindparam, case, func, insert, not_, null, or_, select, text, update
+from sqlalchemy.orm import aliased
 
 from app.models.notification import Notification
 from app.models.daily_milk_summary import DailyMilkSummary
 from app.models.cows import Cow
 from app.models.milk_batches import MilkBatch, MilkStatus
 from app.models.users import User
-from app.models.roles import Role
 from app.models.user_cow_association import user_cow_association
 from app.database.database import db
-from app.socket import emit_notification
+from app.services.batch_provenance import BatchCow, batch_provenance
+from app.services.daily_summary import MilkingPeriods
+from app.services.milk_expiry import batch_expiry_service
+from app.services.notification_archive import notification_archive
+from app.services.notification_dedup import DedupKey, notification_dedup
+from app.services.rate_limit import (
+    InMemoryRateLimitBackend, RateLimitBackend, SqlRateLimitBackend, create_rate_limit_backend
+)
+from app.services.recipient_directory import recipient_directory
+from app.services.unread_counter import unread_counter
+from app.socket import emit_notification, presence, socketio
 
 
 # Configure logging
@@ -81,10 +92,11 @@ class NotificationMessages:
                 f"Please ensure milk production is recorded promptly.")
                 
     @staticmethod
-    def missing_milking_for_cows(cow_ids: List[str]) -> str:
+    def missing_milking_for_cows(cow_ids: List[str], period: Optional[str] = None) -> str:
         cow_list = ", ".join(cow_ids[:5])
         extra = f" and {len(cow_ids) - 5} more" if len(cow_ids) > 5 else ""
-        return (f"Missing milking data: No records for cows {cow_list}{extra} today. "
+        session = f"{period} " if period else ""
+        return (f"Missing milking data: No {session}records for cows {cow_list}{extra} today. "
                 f"Please record milk production.")
     
     @staticmethod
@@ -124,52 +136,285 @@ class NotificationMessages:
                 f"Please process or utilize promptly.")
 
 
+@dataclass(frozen=True)
+class ProductionBreach:
+    """A cow whose production today crossed a level or day-over-day threshold"""
+    cow_id: int
+    cow_name: str
+    current_volume: float
+    previous_volume: float
+    percentage_change: Optional[float]
+
+
+@dataclass(frozen=True)
+class MissingMilking:
+    """Active cows of one manager without milking recorded (manager_id None: unmanaged cows)"""
+    manager_id: Optional[int]
+    cow_ids: Tuple[int, ...]
+
+
 class RateLimiter:
-    """Rate limiting functionality for notifications"""
+    """Per-user notification budget (sliding window) on a pluggable backend"""
     
-    def __init__(self):
-        self._user_limits: Dict[int, Dict[str, any]] = {}
+    def __init__(self, backend: Optional[RateLimitBackend] = None):
+        self.backend = backend or InMemoryRateLimitBackend()
+    
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"user:{user_id}"
+    
+    def consume(self, user_counts: Dict[int, int],
+                limit: Optional[int] = None,
+                window_minutes: Optional[int] = None) -> Dict[int, int]:
+        """Take budget for {user_id: notifications}; returns how many each may send"""
+        if not user_counts:
+            return {}
+        limit = limit or NotificationConfig.RATE_LIMIT_PER_USER
+        window_minutes = window_minutes or NotificationConfig.RATE_LIMIT_WINDOW_MINUTES
+        
+        granted = self.backend.consume(
+            {self._key(user_id): count for user_id, count in user_counts.items()},
+            limit, window_minutes * 60, datetime.utcnow()
+        )
+        return {user_id: granted[self._key(user_id)] for user_id in user_counts}
     
     def is_rate_limited(self, user_id: int, 
                        limit: Optional[int] = None, 
                        window_minutes: Optional[int] = None) -> bool:
         """Check if user has exceeded notification rate limit"""
-        limit = limit or NotificationConfig.RATE_LIMIT_PER_USER
-        window_minutes = window_minutes or NotificationConfig.RATE_LIMIT_WINDOW_MINUTES
-        
-        current_time = datetime.now()
-        
-        if user_id not in self._user_limits:
-            self._user_limits[user_id] = {
-                'count': 0,
-                'reset_time': current_time + timedelta(minutes=window_minutes)
-            }
-        
-        user_data = self._user_limits[user_id]
-        
-        # Reset counter if window expired
-        if current_time > user_data['reset_time']:
-            user_data['count'] = 0
-            user_data['reset_time'] = current_time + timedelta(minutes=window_minutes)
-        
-        if user_data['count'] >= limit:
-            return True
-        
-        user_data['count'] += 1
-        return False
+        return self.consume({user_id: 1}, limit, window_minutes)[user_id] == 0
     
-    def cleanup_expired_limits(self) -> int:
+    def cleanup_expired_limits(self, window_minutes: Optional[int] = None) -> int:
         """Remove expired rate limit entries and return count"""
-        current_time = datetime.now()
-        expired_users = [
-            user_id for user_id, data in self._user_limits.items()
-            if current_time > data['reset_time']
+        window_minutes = window_minutes or NotificationConfig.RATE_LIMIT_WINDOW_MINUTES
+        return self.backend.cleanup(window_minutes * 60, datetime.utcnow())
+
+
+class NotificationFanOut:
+    """
+    Collects (message, type, cow_id, recipients) groups and writes them in
+    bulk: duplicates are resolved against the dedup store in one lookup,
+    then one multi-row INSERT per NotificationConfig.BATCH_SIZE rows, one
+    commit, and a single emit pass on a background greenlet.
+    """
+
+    # MySQL @@auto_increment_increment, read on first insert
+    _increment: Optional[int] = None
+
+    def __init__(self, service: "NotificationService"):
+        self.service = service
+        self._rows: List[Dict] = []
+
+    def add(self, recipient_ids: Iterable[int], message: str, notification_type: str,
+            cow_id: Optional[int] = None, additional_data: Optional[Dict] = None,
+            replace_on: Optional[date] = None, once_for_batch: Optional[str] = None) -> int:
+        """
+        Queue one notification per recipient and return how many were
+        queued. With `replace_on`, a recipient keeps a single notification of
+        this cow and type for that day, refreshed by later checks. With
+        `once_for_batch`, recipients already notified of this type for the
+        batch today are skipped. Rate limits are applied on flush().
+        """
+        if cow_id is None and not Notification.__table__.c.cow_id.nullable:
+            # notifications.cow_id is NOT NULL; such rows could never be stored
+            # and would fail the whole multi-row INSERT
+            logger.warning(f"Skipping '{notification_type}' notification without cow_id")
+            return 0
+
+        queued = 0
+        for user_id in dict.fromkeys(recipient_ids):
+            row = {
+                'user_id': user_id,
+                'cow_id': cow_id,
+                'message': self.service.sanitize_message(message),
+                'type': notification_type,
+                'is_read': False,
+                # Not a column - only carried in the emitted payload
+                'additional_data': additional_data
+            }
+            if replace_on or once_for_batch:
+                row['_dedup'] = DedupKey(
+                    user_id, cow_id, notification_type,
+                    replace_on or date.today(), '' if replace_on else once_for_batch
+                )
+                row['_replace'] = bool(replace_on)
+            self._rows.append(row)
+            queued += 1
+        return queued
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def flush(self) -> int:
+        """Write everything queued, commit, and emit in the background"""
+        if not self._rows:
+            return 0
+
+        rows, self._rows = self._rows, []
+        created_at = datetime.utcnow()
+        try:
+            inserts, refreshes = self._resolve_duplicates(rows)
+            gone, unread_deltas = self._refresh_existing(refreshes, created_at)
+            inserts.extend(gone)
+            refreshes = [row for row in refreshes if 'id' in row]
+
+            for row in inserts:
+                row['created_at'] = created_at
+            batch_size = self.service.config.BATCH_SIZE
+            for start in range(0, len(inserts), batch_size):
+                self._insert_chunk(inserts[start:start + batch_size])
+
+            unidentified = [row for row in inserts if '_dedup' in row and row.get('id') is None]
+            if unidentified:
+                # A key without its notification id could never be refreshed
+                logger.error(f"{len(unidentified)} deduplicated notifications have no id; "
+                             f"their dedup keys are not recorded")
+            replaced = {
+                row['_dedup']: row['id'] for row in inserts
+                if row.get('_replace') and row.get('id') is not None
+            }
+            sent_once = {
+                row['_dedup']: row['id'] for row in inserts
+                if row.get('_replace') is False and row.get('id') is not None
+            }
+            notification_dedup.record(replaced, overwrite=True)
+            notification_dedup.record(sent_once)
+
+            unread_deltas.update(row['user_id'] for row in inserts)
+            unread_counter.adjust(unread_deltas)
+
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Failed to write notification fan-out: {e}")
+            db.session.rollback()
+            return 0
+
+        notification_dedup.remember({**replaced, **sent_once})
+        payloads = [self._payload(row) for row in inserts + refreshes]
+        self.service.emit_in_background(payloads)
+        return len(payloads)
+
+    def _resolve_duplicates(self, rows: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """Split rows into (inserts, refreshes) and drop duplicates and rate-limited rows"""
+        existing = notification_dedup.lookup(row['_dedup'] for row in rows if '_dedup' in row)
+
+        candidates, seen = [], set()
+        for row in rows:
+            key = row.get('_dedup')
+            refresh = False
+            if key is not None:
+                if key in seen:
+                    continue
+                seen.add(key)
+                if key in existing:
+                    if not row['_replace']:
+                        continue
+                    if existing[key] is not None:
+                        row['id'] = existing[key]
+                        refresh = True
+            candidates.append((row, refresh))
+
+        # One budget lookup for every recipient of this flush
+        budget = self.service.rate_limiter.consume(Counter(row['user_id'] for row, _ in candidates))
+        inserts, refreshes, limited = [], [], 0
+        for row, refresh in candidates:
+            if budget[row['user_id']] <= 0:
+                limited += 1
+                continue
+            budget[row['user_id']] -= 1
+            (refreshes if refresh else inserts).append(row)
+        if limited:
+            logger.warning(f"Rate limit exceeded - dropped {limited} notifications")
+        return inserts, refreshes
+
+    def _refresh_existing(self, rows: List[Dict], created_at: datetime) -> Tuple[List[Dict], Counter]:
+        """
+        Update recorded same-day notifications in place with one executemany
+        UPDATE. Returns the rows whose notification was deleted meanwhile (the
+        caller inserts them again) and, per user, how many read notifications
+        the refresh turned unread again.
+        """
+        if not rows:
+            return [], Counter()
+
+        table = Notification.__table__
+        current = {
+            notification_id: (user_id, is_read)
+            for notification_id, user_id, is_read in db.session.execute(
+                select(table.c.id, table.c.user_id, table.c.is_read).where(
+                    table.c.id.in_([row['id'] for row in rows])
+                )
+            )
+        }
+        gone = [row for row in rows if row['id'] not in current]
+        refreshed = [row for row in rows if row['id'] in current]
+        reopened = Counter(user_id for user_id, is_read in current.values() if is_read)
+
+        if refreshed:
+            db.session.execute(
+                update(table).where(table.c.id == bindparam('b_id')).values(
+                    message=bindparam('message'), created_at=bindparam('created_at'), is_read=False
+                ),
+                [{'b_id': row['id'], 'message': row['message'], 'created_at': created_at} for row in refreshed]
+            )
+        for row in refreshed:
+            row['created_at'] = created_at
+
+        notification_dedup.forget(row['_dedup'] for row in gone)
+        for row in gone:
+            del row['id']
+        return gone, reopened
+
+    def _insert_chunk(self, rows: List[Dict]) -> None:
+        """Multi-row INSERT of one chunk; fills in each row's id"""
+        table = Notification.__table__
+        values = [
+            {key: value for key, value in row.items() if key in table.c}
+            for row in rows
         ]
-        
-        for user_id in expired_users:
-            del self._user_limits[user_id]
-        
-        return len(expired_users)
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'postgresql':
+            result = db.session.execute(insert(table).values(values).returning(table.c.id))
+            for row, (notification_id,) in zip(rows, result):
+                row['id'] = notification_id
+            return
+
+        if dialect in ('mysql', 'mariadb', 'sqlite'):
+            # One statement gets consecutive auto-increment ids (InnoDB
+            # allocates a simple insert's ids at once). MySQL reports the
+            # first row's id, SQLite the last one's.
+            result = db.session.execute(insert(table).values(values))
+            if dialect == 'sqlite':
+                first_id, step = result.lastrowid - len(rows) + 1, 1
+            else:
+                first_id, step = result.lastrowid, self._auto_increment_step()
+            for index, row in enumerate(rows):
+                row['id'] = first_id + index * step
+            return
+
+        # Other databases: one INSERT per row
+        for row, row_values in zip(rows, values):
+            row['id'] = db.session.execute(insert(table).values(row_values)).inserted_primary_key[0]
+
+    @classmethod
+    def _auto_increment_step(cls) -> int:
+        """@@auto_increment_increment of the server (read once)"""
+        if cls._increment is None:
+            cls._increment = int(db.session.execute(select(text('@@auto_increment_increment'))).scalar() or 1)
+        return cls._increment
+
+    @staticmethod
+    def _payload(row: Dict) -> Dict:
+        return {
+            'id': row.get('id'),
+            'user_id': row['user_id'],
+            'cow_id': row['cow_id'],
+            'message': row['message'],
+            'type': row['type'],
+            'is_read': False,
+            'created_at': row['created_at'].isoformat(),
+            'additional_data': row.get('additional_data')
+        }
 
 
 class NotificationService:
@@ -179,6 +424,15 @@ class NotificationService:
         self.rate_limiter = RateLimiter()
         self.config = NotificationConfig()
     
+    def init_app(self, app):
+        """Pick the rate limit backend; 'sql' shares one budget across workers"""
+        self.rate_limiter = RateLimiter(create_rate_limit_backend(
+            app.config.get('NOTIFICATION_RATE_LIMIT_BACKEND', SqlRateLimitBackend.name),
+            max_keys=int(app.config.get(
+                'NOTIFICATION_RATE_LIMIT_MAX_KEYS', InMemoryRateLimitBackend.DEFAULT_MAX_KEYS
+            ))
+        ))
+    
     def get_timezone_aware_time(self) -> datetime:
         """Get current time in configured timezone"""
         timezone = pytz.timezone(self.config.TIMEZONE)
@@ -188,39 +442,39 @@ class NotificationService:
         """Sanitize notification message content"""
         return html.escape(str(message))
     
-    def get_admin_users(self) -> List[User]:
-        """Retrieve all admin users from database"""
+    def get_admin_ids(self) -> Set[int]:
+        """Ids of all admin users (cached by the recipient directory)"""
         try:
-            admin_roles = Role.query.filter(
-                Role.name.in_(self.config.ADMIN_ROLE_NAMES)
-            ).all()
-            
-            if not admin_roles:
-                return []
-            
-            admin_role_ids = [role.id for role in admin_roles]
-            return User.query.filter(User.role_id.in_(admin_role_ids)).all()
-            
+            return set(recipient_directory.users_with_roles(self.config.ADMIN_ROLE_NAMES))
         except Exception as e:
             logger.error(f"Failed to retrieve admin users: {e}")
-            return []
+            return set()
     
-    def get_supervisor_users(self) -> List[User]:
-        """Retrieve all supervisor users from database"""
+    def get_supervisor_ids(self) -> Set[int]:
+        """Ids of all supervisor users (cached by the recipient directory)"""
         try:
-            supervisor_roles = Role.query.filter(
-                Role.name.in_(self.config.SUPERVISOR_ROLE_NAMES)
-            ).all()
-            
-            if not supervisor_roles:
-                return []
-            
-            supervisor_role_ids = [role.id for role in supervisor_roles]
-            return User.query.filter(User.role_id.in_(supervisor_role_ids)).all()
-            
+            return set(recipient_directory.users_with_roles(self.config.SUPERVISOR_ROLE_NAMES))
         except Exception as e:
             logger.error(f"Failed to retrieve supervisor users: {e}")
-            return []
+            return set()
+    
+    def get_cow_manager_ids(self, cow_id: int) -> Set[int]:
+        """Ids of the users managing a cow (cached by the recipient directory)"""
+        try:
+            return set(recipient_directory.managers_of(cow_id))
+        except Exception as e:
+            logger.error(f"Error getting cow managers: {e}")
+            return set()
+    
+    def get_admin_users(self) -> List[User]:
+        """Retrieve all admin users from database"""
+        admin_ids = self.get_admin_ids()
+        return User.query.filter(User.id.in_(admin_ids)).all() if admin_ids else []
+    
+    def get_supervisor_users(self) -> List[User]:
+        """Retrieve all supervisor users from database"""
+        supervisor_ids = self.get_supervisor_ids()
+        return User.query.filter(User.id.in_(supervisor_ids)).all() if supervisor_ids else []
     
     def emit_notification_safely(self, user_id: int, notification_data: Dict) -> bool:
         """Emit notification with retry mechanism"""
@@ -235,6 +489,48 @@ class NotificationService:
                 time.sleep(0.5 * (attempt + 1))  # Exponential backoff
         return False
     
+    def emit_in_background(self, payloads: List[Dict]) -> None:
+        """Emit a list of notification payloads in one pass off the request path"""
+        if not payloads:
+            return
+        # Only users registered on some worker can receive an emit; skipping the
+        # rest keeps them off the message queue
+        try:
+            online_ids = presence.online_user_ids({payload['user_id'] for payload in payloads})
+            payloads = [payload for payload in payloads if payload['user_id'] in online_ids]
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Presence lookup failed, emitting to every recipient: {e}")
+        if not payloads:
+            return
+        try:
+            socketio.start_background_task(self._emit_all, payloads)
+        except Exception as e:
+            # Socket.IO not bound to a server (e.g. scripts) - emit inline
+            logger.debug(f"Background emit unavailable, emitting inline: {e}")
+            self._emit_all(payloads)
+
+    def _emit_all(self, payloads: List[Dict]) -> None:
+        batch_size = self.config.BATCH_SIZE
+        for start in range(0, len(payloads), batch_size):
+            for payload in payloads[start:start + batch_size]:
+                self.emit_notification_safely(payload['user_id'], payload)
+            # Let other greenlets run between chunks
+            socketio.sleep(0)
+
+    def new_fan_out(self) -> NotificationFanOut:
+        """Start a bulk fan-out; call flush() once everything is added"""
+        return NotificationFanOut(self)
+
+    def fan_out(self, recipient_ids: Iterable[int], message: str, notification_type: str,
+                cow_id: Optional[int] = None, additional_data: Optional[Dict] = None,
+                replace_on: Optional[date] = None, once_for_batch: Optional[str] = None) -> int:
+        """Send one message to a set of users with a single bulk write"""
+        fan_out = self.new_fan_out()
+        fan_out.add(recipient_ids, message, notification_type, cow_id, additional_data,
+                    replace_on, once_for_batch)
+        return fan_out.flush()
+    
     def create_notification_record(self, user_id: int, cow_id: Optional[int], 
                                  message: str, notification_type: str,
                                  additional_data: Optional[Dict] = None) -> Optional[Notification]:
@@ -253,6 +549,7 @@ class NotificationService:
                 notification.additional_data = json.dumps(additional_data)
             
             db.session.add(notification)
+            unread_counter.adjust({user_id: 1})
             return notification
             
         except Exception as e:
@@ -262,9 +559,17 @@ class NotificationService:
     def send_notification_to_user(self, user_id: int, cow_id: Optional[int], 
                                 message: str, notification_type: str,
                                 check_date: Optional[date] = None) -> bool:
-        """Send notification to specific user"""
+        """
+        Send notification to specific user. The rate limit check may lock
+        the user's `notification_rate_limits` row (sql backend) until the
+        transaction ends: once a record is written the caller must commit
+        or roll back; when the user is rate limited or no record could be
+        written the transaction is ended here.
+        """
         try:
             if self.rate_limiter.is_rate_limited(user_id):
+                # Nothing to write, but release the limiter row
+                db.session.commit()
                 logger.warning(f"Rate limit exceeded for user {user_id}")
                 return False
             
@@ -285,9 +590,12 @@ class NotificationService:
                 if notification:
                     return self._emit_real_time_notification(user_id, cow_id, message, notification_type)
             
+            # No record was written
+            db.session.rollback()
             return False
             
         except Exception as e:
+            db.session.rollback()
             logger.error(f"Failed to send notification to user {user_id}: {e}")
             return False
     
@@ -296,15 +604,13 @@ class NotificationService:
                                                 check_date: date) -> bool:
         """Update existing or create new production notification"""
         try:
-            day_start = datetime.combine(check_date, datetime.min.time())
-            
-            existing_notification = Notification.query.filter_by(
-                user_id=user_id,
-                cow_id=cow_id,
-                type=notification_type
-            ).filter(Notification.created_at >= day_start).first()
+            key = DedupKey(user_id, cow_id, notification_type, check_date)
+            notification_id = notification_dedup.lookup([key]).get(key)
+            existing_notification = Notification.query.get(notification_id) if notification_id else None
             
             if existing_notification:
+                if existing_notification.is_read:
+                    unread_counter.adjust({user_id: 1})
                 existing_notification.message = self.sanitize_message(message)
                 existing_notification.is_read = False
                 existing_notification.created_at = datetime.utcnow()
@@ -314,6 +620,9 @@ class NotificationService:
                 )
                 if not notification:
                     return False
+                db.session.flush()
+                notification_dedup.forget([key])
+                notification_dedup.record({key: notification.id}, overwrite=True)
             
             return True
             
@@ -344,28 +653,27 @@ class NotificationService:
                 today = date.today()
                 yesterday = today - timedelta(days=1)
                 
-                daily_summaries = DailyMilkSummary.query.filter_by(date=today).all()
+                breaches = self.find_production_breaches(today, yesterday)
                 
-                if not daily_summaries:
-                    logger.info("No daily summaries found for today")
+                if not breaches:
+                    logger.info("No production breaches found for today")
                     return 0
                 
-                notification_count = 0
+                fan_out = self.new_fan_out()
                 
-                for summary in daily_summaries:
+                for breach in breaches:
                     # Check standard production thresholds
-                    message, notification_type = self._analyze_production_level(summary)
+                    message, notification_type = self._analyze_production_level(breach)
                     
                     if message and notification_type:
-                        count = self._create_production_notifications(
-                            summary.cow_id, message, notification_type, today
+                        self._create_production_notifications(
+                            breach.cow_id, message, notification_type, today, fan_out
                         )
-                        notification_count += count
                     
                     # Check production changes for supervisors
-                    change_count = self._check_production_changes_and_notify(summary, yesterday, today)
-                    notification_count += change_count
+                    self._check_production_changes_and_notify(breach, today, fan_out)
                 
+                notification_count = fan_out.flush()
                 logger.info(f"Sent {notification_count} production notifications")
                 return notification_count
                 
@@ -374,243 +682,256 @@ class NotificationService:
                 db.session.rollback()
                 return 0
     
-    def _check_production_changes_and_notify(self, current_summary: DailyMilkSummary, 
-                                           yesterday: date, today: date) -> int:
-        """Check for significant production changes and notify supervisors"""
+    def find_production_breaches(self, today: date, yesterday: date) -> List[ProductionBreach]:
+        """
+        Compare today's and yesterday's summaries for the whole herd with one
+        self-join and return only cows that breach a level or change threshold.
+        """
+        config = self.config
+        current_summary = aliased(DailyMilkSummary)
+        previous_summary = aliased(DailyMilkSummary)
+        
+        current = func.coalesce(current_summary.total_volume, 0)
+        previous = func.coalesce(previous_summary.total_volume, 0)
+        
+        # Change is only meaningful with a previous day, at least one volume
+        # above the minimum, and (for a zero previous day) real new production
+        change_eligible = and_(
+            previous_summary.id.isnot(None),
+            or_(current >= config.MIN_VOLUME_FOR_CHANGE_NOTIFICATION,
+                previous >= config.MIN_VOLUME_FOR_CHANGE_NOTIFICATION),
+            or_(previous != 0, current > config.MIN_VOLUME_FOR_CHANGE_NOTIFICATION)
+        )
+        percentage_change = case(
+            (not_(change_eligible), null()),
+            (previous == 0, 100.0),
+            else_=(current - previous) * 100.0 / previous
+        )
+        
+        rows = db.session.query(
+            current_summary.cow_id,
+            Cow.name,
+            current,
+            previous_summary.total_volume,
+            percentage_change
+        ).join(
+            Cow, Cow.id == current_summary.cow_id
+        ).outerjoin(
+            previous_summary, and_(
+                previous_summary.cow_id == current_summary.cow_id,
+                previous_summary.date == yesterday
+            )
+        ).filter(
+            current_summary.date == today,
+            or_(
+                current < config.LOW_PRODUCTION_THRESHOLD,
+                current > config.HIGH_PRODUCTION_THRESHOLD,
+                and_(change_eligible, or_(
+                    percentage_change >= config.PRODUCTION_INCREASE_THRESHOLD,
+                    percentage_change <= -config.PRODUCTION_DECREASE_THRESHOLD
+                ))
+            )
+        ).all()
+        
+        return [
+            ProductionBreach(
+                cow_id=cow_id,
+                cow_name=cow_name,
+                current_volume=float(current_volume),
+                previous_volume=float(previous_volume or 0),
+                percentage_change=float(change) if change is not None else None
+            )
+            for cow_id, cow_name, current_volume, previous_volume, change in rows
+        ]
+    
+    def _check_production_changes_and_notify(self, breach: ProductionBreach, today: date,
+                                           fan_out: NotificationFanOut) -> int:
+        """Notify supervisors when the day-over-day change crosses a threshold"""
         try:
-            # Get yesterday's summary for the same cow
-            yesterday_summary = DailyMilkSummary.query.filter_by(
-                cow_id=current_summary.cow_id,
-                date=yesterday
-            ).first()
-            
-            if not yesterday_summary:
-                # No previous data to compare
-                return 0
-            
-            current_volume = current_summary.total_volume or 0
-            previous_volume = yesterday_summary.total_volume or 0
-            
-            # Skip if volumes are too low to be meaningful
-            if (current_volume < self.config.MIN_VOLUME_FOR_CHANGE_NOTIFICATION and 
-                previous_volume < self.config.MIN_VOLUME_FOR_CHANGE_NOTIFICATION):
+            percentage_change = breach.percentage_change
+            if percentage_change is None:
+                # No previous data to compare, or volumes too low to be meaningful
                 return 0
             
-            # Calculate percentage change (avoid division by zero)
-            if previous_volume == 0:
-                if current_volume > self.config.MIN_VOLUME_FOR_CHANGE_NOTIFICATION:
-                    # New production started
-                    percentage_change = 100.0
-                else:
-                    return 0
-            else:
-                percentage_change = ((current_volume - previous_volume) / previous_volume) * 100
-            
-            notification_count = 0
             message = None
             notification_type = None
             
             # Check for significant increase
             if percentage_change >= self.config.PRODUCTION_INCREASE_THRESHOLD:
                 message = NotificationMessages.production_increase(
-                    current_summary.cow.id, current_summary.cow.name,
-                    current_volume, previous_volume, percentage_change
+                    breach.cow_id, breach.cow_name,
+                    breach.current_volume, breach.previous_volume, percentage_change
                 )
                 notification_type = NotificationTypes.PRODUCTION_INCREASE
                 
             # Check for significant decrease
             elif percentage_change <= -self.config.PRODUCTION_DECREASE_THRESHOLD:
                 message = NotificationMessages.production_decrease(
-                    current_summary.cow.id, current_summary.cow.name,
-                    current_volume, previous_volume, abs(percentage_change)
+                    breach.cow_id, breach.cow_name,
+                    breach.current_volume, breach.previous_volume, abs(percentage_change)
                 )
                 notification_type = NotificationTypes.PRODUCTION_DECREASE
             
-            if message and notification_type:
-                # Notify supervisors about production changes
-                notification_count = self._notify_supervisors_about_production_change(
-                    current_summary.cow_id, message, notification_type, today
-                )
+            if not (message and notification_type):
+                return 0
             
-            return notification_count
+            # Notify supervisors about production changes
+            return self._notify_supervisors_about_production_change(
+                breach.cow_id, message, notification_type, today, fan_out
+            )
             
         except Exception as e:
-            logger.error(f"Error checking production changes for cow {current_summary.cow_id}: {e}")
+            logger.error(f"Error checking production changes for cow {breach.cow_id}: {e}")
             return 0
     
     def _notify_supervisors_about_production_change(self, cow_id: int, message: str, 
-                                                  notification_type: str, check_date: date) -> int:
-        """Notify supervisors about significant production changes"""
+                                                  notification_type: str, check_date: date,
+                                                  fan_out: NotificationFanOut) -> int:
+        """Queue notifications to supervisors (and admins) about significant production changes"""
         try:
-            notification_count = 0
-            
-            # Get all supervisors
-            supervisor_users = self.get_supervisor_users()
-            
-            # Send notifications to supervisors
-            for supervisor in supervisor_users:
-                supervisor_message = f"Supervisor Alert: {message}"
-                if self.send_notification_to_user(
-                    supervisor.id, cow_id, supervisor_message, notification_type, check_date
-                ):
-                    notification_count += 1
+            supervisor_ids = self.get_supervisor_ids()
+            admin_ids = self.get_admin_ids() - supervisor_ids
             
+            notification_count = fan_out.add(
+                supervisor_ids, f"Supervisor Alert: {message}", notification_type,
+                cow_id, replace_on=check_date
+            )
             # Also notify admins about significant changes
-            admin_users = self.get_admin_users()
-            for admin_user in admin_users:
-                admin_message = f"Admin Alert: {message}"
-                if self.send_notification_to_user(
-                    admin_user.id, cow_id, admin_message, notification_type, check_date
-                ):
-                    notification_count += 1
-            
-            if notification_count > 0:
-                db.session.commit()
-                
+            notification_count += fan_out.add(
+                admin_ids, f"Admin Alert: {message}", notification_type,
+                cow_id, replace_on=check_date
+            )
             return notification_count
             
         except Exception as e:
             logger.error(f"Failed to notify supervisors about production change: {e}")
-            db.session.rollback()
             return 0
     
-    def _analyze_production_level(self, summary: DailyMilkSummary) -> Tuple[Optional[str], Optional[str]]:
+    def _analyze_production_level(self, breach: ProductionBreach) -> Tuple[Optional[str], Optional[str]]:
         """Analyze production level and return appropriate message"""
-        if summary.total_volume < self.config.LOW_PRODUCTION_THRESHOLD:
+        if breach.current_volume < self.config.LOW_PRODUCTION_THRESHOLD:
             message = NotificationMessages.low_production(
-                summary.cow.id, summary.cow.name, summary.total_volume
+                breach.cow_id, breach.cow_name, breach.current_volume
             )
             return message, NotificationTypes.LOW_PRODUCTION
-        elif summary.total_volume > self.config.HIGH_PRODUCTION_THRESHOLD:
+        elif breach.current_volume > self.config.HIGH_PRODUCTION_THRESHOLD:
             message = NotificationMessages.high_production(
-                summary.cow.id, summary.cow.name, summary.total_volume
+                breach.cow_id, breach.cow_name, breach.current_volume
             )
             return message, NotificationTypes.HIGH_PRODUCTION
         
         return None, None
     
     def _create_production_notifications(self, cow_id: int, message: str, 
-                                       notification_type: str, check_date: date) -> int:
-        """Create production notifications for managers and admins"""
+                                       notification_type: str, check_date: date,
+                                       fan_out: NotificationFanOut) -> int:
+        """Queue production notifications for managers and admins"""
         try:
-            notification_count = 0
-            
             # Get cow managers
-            cow_managers = db.session.query(user_cow_association).filter_by(cow_id=cow_id).all()
-            manager_user_ids = {manager.user_id for manager in cow_managers}
+            manager_user_ids = self.get_cow_manager_ids(cow_id)
             
             # Send to cow managers
-            for manager_relation in cow_managers:
-                if self.send_notification_to_user(
-                    manager_relation.user_id, cow_id, message, notification_type, check_date
-                ):
-                    notification_count += 1
+            notification_count = fan_out.add(
+                manager_user_ids, message, notification_type, cow_id, replace_on=check_date
+            )
             
             # Send to admin users (excluding those who are already managers)
-            admin_users = self.get_admin_users()
-            for admin_user in admin_users:
-                if admin_user.id not in manager_user_ids:
-                    admin_message = f"Admin Alert: {message}"
-                    if self.send_notification_to_user(
-                        admin_user.id, cow_id, admin_message, notification_type, check_date
-                    ):
-                        notification_count += 1
-            
-            if notification_count > 0:
-                db.session.commit()
+            admin_ids = self.get_admin_ids() - manager_user_ids
+            notification_count += fan_out.add(
+                admin_ids, f"Admin Alert: {message}", notification_type, cow_id, replace_on=check_date
+            )
             
             return notification_count
             
         except Exception as e:
             logger.error(f"Failed to create production notifications: {e}")
-            db.session.rollback()
             return 0
     
-    def check_missing_milking_and_notify(self) -> int:
-        """Check for missing milking data today and send notifications"""
+    def find_missing_milkings(self, day: date, period: Optional[str] = None) -> List[MissingMilking]:
+        """
+        Active cows without milking recorded on `day` (for a period: with
+        nothing in that period's column), grouped per manager, from one
+        anti-join: cows LEFT JOIN the day's summary WHERE no summary, LEFT
+        JOIN user_cow_association for the managers.
+        """
+        summary = DailyMilkSummary.__table__.c
+        missing = summary.id.is_(None)
+        if period:
+            missing = or_(missing, summary[period] <= 0)
+        
+        rows = db.session.query(
+            user_cow_association.c.user_id, Cow.id
+        ).outerjoin(
+            DailyMilkSummary.__table__, and_(summary.cow_id == Cow.id, summary.date == day)
+        ).outerjoin(
+            user_cow_association, user_cow_association.c.cow_id == Cow.id
+        ).filter(
+            Cow.is_active == True,
+            missing
+        ).order_by(Cow.id).all()
+        
+        groups: Dict[Optional[int], List[int]] = {}
+        for manager_id, cow_id in rows:
+            groups.setdefault(manager_id, []).append(cow_id)
+        return [MissingMilking(manager_id, tuple(cow_ids)) for manager_id, cow_ids in groups.items()]
+    
+    def check_missing_milking_and_notify(self, period: Optional[str] = None,
+                                         day: Optional[date] = None) -> int:
+        """
+        Check for missing milking data and send notifications: each manager
+        gets the list of their own cows, supervisors and admins the whole
+        herd's. With a period (a MilkingPeriods column), only that milking
+        window is checked and each recipient is notified once per window.
+        """
         if not current_app:
             logger.warning("No application context available")
             return 0
         
         with current_app.app_context():
             try:
-                today = date.today()
-                current_time = self.get_timezone_aware_time()
+                day = day or date.today()
+                period_name = period.replace('_volume', '') if period else None
+                logger.info(f"Checking for missing {period_name or 'daily'} milking data for {day}")
                 
-                # DIPERBAIKI: Tidak ada batasan waktu untuk pengecekan missing milking
-                # Sistem akan selalu mengecek jika ada data yang hilang tanpa membatasi jam
-                logger.info(f"Checking for missing milking data at {current_time.strftime('%H:%M')}")
-                    
-                # Get all active cows
-                all_cows = Cow.query.filter_by(is_active=True).all()
-                if not all_cows:
-                    logger.info("No active cows found in the system")
+                groups = self.find_missing_milkings(day, period)
+                if not groups:
+                    logger.info("All active cows have milking data recorded")
                     return 0
                 
-                # Get cows with recorded milking data today
-                cows_with_data = DailyMilkSummary.query.filter_by(date=today).with_entities(
-                    DailyMilkSummary.cow_id
-                ).all()
-                cows_with_data_ids = {cow.cow_id for cow in cows_with_data}
-                
-                # Find cows without milking data
-                cows_without_data = [cow for cow in all_cows if cow.id not in cows_with_data_ids]
-                
-                if not cows_without_data:
-                    logger.info("All cows have milking data recorded today")
-                    return 0
-                    
-                notification_count = 0
+                # One notification per manager per day (or per window)
+                once_for_batch = f"missing:{day.isoformat()}:{period_name}" if period else None
+                fan_out = self.new_fan_out()
                 
-                # If we have specific cows without data
-                if cows_without_data:
-                    cow_ids = [str(cow.id) for cow in cows_without_data]
-                    message = NotificationMessages.missing_milking_for_cows(cow_ids)
-                else:
-                    # Generic message if we can't determine specific cows
-                    message = NotificationMessages.missing_milking()
-                    
-                # Notify farm managers, supervisors, and admins
-                user_notified = set()
+                missing_cow_ids = sorted({cow_id for group in groups for cow_id in group.cow_ids})
+                managers_notified = set()
+                for group in groups:
+                    if group.manager_id is None:
+                        continue
+                    fan_out.add(
+                        [group.manager_id],
+                        NotificationMessages.missing_milking_for_cows(
+                            [str(cow_id) for cow_id in group.cow_ids], period_name
+                        ),
+                        NotificationTypes.MISSING_MILKING, group.cow_ids[0],
+                        once_for_batch=once_for_batch
+                    )
+                    managers_notified.add(group.manager_id)
                 
-                # Notify cow managers
-                for cow in cows_without_data:
-                    managers = self._get_cow_managers(cow)
-                    for manager in managers:
-                        if manager.id in user_notified or self.rate_limiter.is_rate_limited(manager.id):
-                            continue
-                            
-                        if self.create_notification(
-                            manager.id, message, NotificationTypes.MISSING_MILKING, cow.id
-                        ):
-                            notification_count += 1
-                            user_notified.add(manager.id)
+                # Supervisors and admins get the herd-wide list, tied to its first cow
+                message = NotificationMessages.missing_milking_for_cows(
+                    [str(cow_id) for cow_id in missing_cow_ids], period_name
+                )
+                supervisor_ids = self.get_supervisor_ids() - managers_notified
+                fan_out.add(supervisor_ids, f"Supervisor Alert: {message}",
+                            NotificationTypes.MISSING_MILKING, missing_cow_ids[0],
+                            once_for_batch=once_for_batch)
                 
-                # Notify supervisors not already notified
-                supervisor_users = self.get_supervisor_users()
-                for supervisor in supervisor_users:
-                    if supervisor.id in user_notified or self.rate_limiter.is_rate_limited(supervisor.id):
-                        continue
-                        
-                    supervisor_message = f"Supervisor Alert: {message}"
-                    if self.create_notification(
-                        supervisor.id, supervisor_message, NotificationTypes.MISSING_MILKING
-                    ):
-                        notification_count += 1
-                        user_notified.add(supervisor.id)
+                admin_ids = self.get_admin_ids() - managers_notified - supervisor_ids
+                fan_out.add(admin_ids, f"Admin Alert: {message}",
+                            NotificationTypes.MISSING_MILKING, missing_cow_ids[0],
+                            once_for_batch=once_for_batch)
                 
-                # Notify admins not already notified
-                admin_users = self.get_admin_users()
-                for admin in admin_users:
-                    if admin.id in user_notified or self.rate_limiter.is_rate_limited(admin.id):
-                        continue
-                        
-                    admin_message = f"Admin Alert: {message}"
-                    if self.create_notification(
-                        admin.id, admin_message, NotificationTypes.MISSING_MILKING
-                    ):
-                        notification_count += 1
-                        user_notified.add(admin.id)
+                notification_count = fan_out.flush()
                 
                 if notification_count > 0:
                     logger.info(f"Sent {notification_count} missing milking notifications")
@@ -622,8 +943,30 @@ class NotificationService:
                 db.session.rollback()
                 return 0
     
-    def check_milk_expiry_and_notify(self) -> int:
-        """Check milk expiry and send notifications"""
+    def check_missing_milking_window_and_notify(self) -> int:
+        """
+        Check the most recently closed milking window: this morning once
+        it is past MORNING_END_HOUR, this afternoon past AFTERNOON_END_HOUR,
+        otherwise yesterday evening. Cheap enough to run hourly; repeats
+        within a window are deduplicated.
+        """
+        now = self.get_timezone_aware_time()
+        if now.hour >= MilkingPeriods.AFTERNOON_END_HOUR:
+            return self.check_missing_milking_and_notify(MilkingPeriods.AFTERNOON, now.date())
+        if now.hour >= MilkingPeriods.MORNING_END_HOUR:
+            return self.check_missing_milking_and_notify(MilkingPeriods.MORNING, now.date())
+        return self.check_missing_milking_and_notify(
+            MilkingPeriods.EVENING, now.date() - timedelta(days=1)
+        )
+    
+    def check_milk_expiry_and_notify(self, expired_batch_ids: Optional[Iterable[int]] = None) -> int:
+        """
+        Expire overdue batches and send expiry/warning notifications.
+
+        Overdue batches are flipped with one set-based UPDATE and only the
+        batches it changed are notified. `expired_batch_ids` adds batches a
+        caller already expired in the current transaction.
+        """
         if not current_app:
             logger.warning("No application context available")
             return 0
@@ -633,27 +976,32 @@ class NotificationService:
                 current_time = self.get_timezone_aware_time()
                 warning_time = current_time + timedelta(hours=self.config.EXPIRY_WARNING_HOURS)
                 
-                fresh_batches = MilkBatch.query.filter(MilkBatch.status == 'FRESH').all()
+                expired_ids = set(expired_batch_ids or ())
+                expired_ids.update(
+                    batch.id for batch in batch_expiry_service.expire_due_batches(current_time)
+                )
                 
-                if not fresh_batches:
-                    return 0
+                expired_batches = self._load_batches(expired_ids)
+                warning_batches = MilkBatch.query.filter(
+                    MilkBatch.status == MilkStatus.FRESH,
+                    MilkBatch.expiry_date >= current_time,
+                    MilkBatch.expiry_date <= warning_time
+                ).all()
                 
-                expired_batches = [b for b in fresh_batches if b.expiry_date < current_time]
-                warning_batches = [
-                    b for b in fresh_batches 
-                    if current_time <= b.expiry_date <= warning_time
-                ]
+                # Cows of every batch in this sweep, resolved once
+                provenance = batch_provenance.cows_of(expired_batches + warning_batches)
                 
-                notification_count = 0
-                notification_count += self._process_batch_notifications(
-                    expired_batches, current_time, "expired"
+                fan_out = self.new_fan_out()
+                self._process_batch_notifications(
+                    expired_batches, current_time, "expired", fan_out, provenance
                 )
-                notification_count += self._process_batch_notifications(
-                    warning_batches, current_time, "warning"
+                self._process_batch_notifications(
+                    warning_batches, current_time, "warning", fan_out, provenance
                 )
                 
-                if notification_count > 0:
+                if expired_ids:
                     db.session.commit()
+                notification_count = fan_out.flush()
                 
                 logger.info(f"Sent {notification_count} expiry notifications")
                 return notification_count
@@ -663,21 +1011,29 @@ class NotificationService:
                 db.session.rollback()
                 return 0
     
+    def _load_batches(self, batch_ids: Iterable[int]) -> List[MilkBatch]:
+        """Load batches by id in one query"""
+        batch_ids = list(batch_ids)
+        if not batch_ids:
+            return []
+        return MilkBatch.query.filter(MilkBatch.id.in_(batch_ids)).all()
+    
     def _process_batch_notifications(self, batches: List[MilkBatch], 
-                                   current_time: datetime, batch_type: str) -> int:
+                                   current_time: datetime, batch_type: str,
+                                   fan_out: NotificationFanOut,
+                                   provenance: Optional[Dict[int, Tuple[BatchCow, ...]]] = None) -> int:
         """Process batch notifications for managers and admins"""
         if not batches:
             return 0
         
         notification_count = 0
-        admin_users = self.get_admin_users()
+        admin_ids = self.get_admin_ids()
+        if provenance is None:
+            provenance = batch_provenance.cows_of(batches)
         
         for batch in batches:
             try:
-                if batch_type == "expired":
-                    batch.status = 'EXPIRED'
-                
-                affected_cows = self._get_affected_cows_from_batch(batch)
+                affected_cows = provenance.get(batch.id, ())
                 
                 for cow in affected_cows:
                     message = self._create_batch_message(batch, cow, current_time, batch_type)
@@ -687,16 +1043,16 @@ class NotificationService:
                     notified_users = set()
                     
                     # Notify cow managers
-                    managers = self._get_cow_managers(cow)
+                    manager_ids = self.get_cow_manager_ids(cow.id)
                     notification_count += self._notify_managers(
-                        managers, cow.id, message, notification_type, 
-                        batch_type, batch.batch_number, notified_users
+                        manager_ids, cow.id, message, notification_type, 
+                        batch_type, batch.batch_number, notified_users, fan_out
                     )
                     
                     # Notify admin users
                     notification_count += self._notify_admins(
-                        admin_users, cow.id, message, notification_type,
-                        batch_type, batch.batch_number, notified_users
+                        admin_ids, cow.id, message, notification_type,
+                        batch_type, batch.batch_number, notified_users, fan_out
                     )
                     
             except Exception as e:
@@ -705,28 +1061,20 @@ class NotificationService:
         
         return notification_count
     
-    def _get_affected_cows_from_batch(self, batch: MilkBatch) -> List[Cow]:
+    def _get_affected_cows_from_batch(self, batch: MilkBatch) -> List[BatchCow]:
         """Get cows affected by batch expiry"""
         try:
-            sessions = batch.milking_sessions
-            if not sessions:
-                return []
-            
-            cow_ids = set(session.cow_id for session in sessions)
-            return [Cow.query.get(cow_id) for cow_id in cow_ids if Cow.query.get(cow_id)]
+            return list(batch_provenance.cows_of([batch]).get(batch.id, ()))
         except Exception as e:
             logger.error(f"Error getting affected cows: {e}")
             return []
     
     def _get_cow_managers(self, cow: Cow) -> List[User]:
         """Get managers for specific cow"""
-        try:
-            return cow.managers.all()
-        except Exception as e:
-            logger.error(f"Error getting cow managers: {e}")
-            return []
+        manager_ids = self.get_cow_manager_ids(cow.id)
+        return User.query.filter(User.id.in_(manager_ids)).all() if manager_ids else []
     
-    def _create_batch_message(self, batch: MilkBatch, cow: Cow, 
+    def _create_batch_message(self, batch: MilkBatch, cow: BatchCow, 
                             current_time: datetime, batch_type: str) -> str:
         """Create appropriate message for batch notification"""
         expiry_time = batch.expiry_date.strftime("%H:%M on %d/%m/%Y")
@@ -743,63 +1091,32 @@ class NotificationService:
                 hours_remaining, expiry_time
             )
     
-    def _notify_managers(self, managers: List[User], cow_id: int, message: str,
+    def _notify_managers(self, manager_ids: Set[int], cow_id: int, message: str,
                         notification_type: str, batch_type: str, batch_number: str,
-                        notified_users: Set[int]) -> int:
-        """Send notifications to cow managers"""
-        count = 0
-        for manager in managers:
-            if (self.rate_limiter.is_rate_limited(manager.id) or
-                (batch_type == "warning" and self._has_recent_warning(
-                    manager.id, cow_id, batch_number))):
-                continue
-            
-            notification = self.create_notification_record(
-                manager.id, cow_id, message, notification_type
-            )
-            if notification and self._emit_real_time_notification(
-                manager.id, cow_id, message, notification_type
-            ):
-                notified_users.add(manager.id)
-                count += 1
-        
+                        notified_users: Set[int], fan_out: NotificationFanOut) -> int:
+        """Queue notifications to cow managers"""
+        # Warnings go out once per batch per day; the fan-out drops repeats
+        once_for_batch = batch_number if batch_type == "warning" else None
+        count = fan_out.add(
+            manager_ids, message, notification_type, cow_id, once_for_batch=once_for_batch
+        )
+        notified_users.update(manager_ids)
         return count
     
-    def _notify_admins(self, admin_users: List[User], cow_id: int, message: str,
+    def _notify_admins(self, admin_ids: Set[int], cow_id: int, message: str,
                       notification_type: str, batch_type: str, batch_number: str,
-                      notified_users: Set[int]) -> int:
-        """Send notifications to admin users"""
-        count = 0
-        for admin_user in admin_users:
-            if (admin_user.id in notified_users or
-                self.rate_limiter.is_rate_limited(admin_user.id) or
-                (batch_type == "warning" and self._has_recent_warning(
-                    admin_user.id, cow_id, batch_number))):
-                continue
-            
-            admin_message = f"Admin Alert: {message}"
-            notification = self.create_notification_record(
-                admin_user.id, cow_id, admin_message, notification_type
-            )
-            if notification and self._emit_real_time_notification(
-                admin_user.id, cow_id, admin_message, notification_type
-            ):
-                count += 1
-        
-        return count
+                      notified_users: Set[int], fan_out: NotificationFanOut) -> int:
+        """Queue notifications to admin users not already notified as managers"""
+        once_for_batch = batch_number if batch_type == "warning" else None
+        return fan_out.add(
+            set(admin_ids) - notified_users, f"Admin Alert: {message}", notification_type,
+            cow_id, once_for_batch=once_for_batch
+        )
     
     def _has_recent_warning(self, user_id: int, cow_id: int, batch_number: str) -> bool:
         """Check if user already received warning for this batch today"""
-        today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        return Notification.query.filter_by(
-            user_id=user_id,
-            cow_id=cow_id,
-            type=NotificationTypes.MILK_WARNING
-        ).filter(
-            Notification.message.contains(f"Batch {batch_number}"),
-            Notification.created_at >= today_start
-        ).first() is not None
+        key = DedupKey(user_id, cow_id, NotificationTypes.MILK_WARNING, date.today(), batch_number)
+        return key in notification_dedup.lookup([key])
     
     def create_notification(self, user_id: int, message: str, notification_type: str,
                           cow_id: Optional[int] = None, 
@@ -839,22 +1156,10 @@ class NotificationService:
                                 additional_data: Optional[Dict] = None) -> int:
         """Create notification for all admin users"""
         try:
-            admin_users = self.get_admin_users()
-            notifications_created = 0
-            
-            for admin_user in admin_users:
-                if self.rate_limiter.is_rate_limited(admin_user.id):
-                    continue
-                
-                admin_message = f"System Alert: {message}"
-                notification = self.create_notification(
-                    admin_user.id, admin_message, notification_type, cow_id, additional_data
-                )
-                
-                if notification:
-                    notifications_created += 1
-            
-            return notifications_created
+            admin_ids = self.get_admin_ids()
+            return self.fan_out(
+                admin_ids, f"System Alert: {message}", notification_type, cow_id, additional_data
+            )
             
         except Exception as e:
             logger.error(f"Failed to create admin notifications: {e}")
@@ -865,48 +1170,101 @@ class NotificationService:
                                      additional_data: Optional[Dict] = None) -> int:
         """Create notification for all supervisor users"""
         try:
-            supervisor_users = self.get_supervisor_users()
-            notifications_created = 0
-            
-            for supervisor in supervisor_users:
-                if self.rate_limiter.is_rate_limited(supervisor.id):
-                    continue
-                
-                supervisor_message = f"Supervisor Alert: {message}"
-                notification = self.create_notification(
-                    supervisor.id, supervisor_message, notification_type, cow_id, additional_data
-                )
-                
-                if notification:
-                    notifications_created += 1
-            
-            return notifications_created
+            supervisor_ids = self.get_supervisor_ids()
+            return self.fan_out(
+                supervisor_ids, f"Supervisor Alert: {message}", notification_type, cow_id, additional_data
+            )
             
         except Exception as e:
             logger.error(f"Failed to create supervisor notifications: {e}")
             return 0
     
+    def mark_read(self, user_id: int, notification_ids: Iterable[int]) -> int:
+        """Mark the user's notifications in the id list as read with one UPDATE"""
+        notification_ids = list(notification_ids)
+        if not notification_ids:
+            return 0
+        updated = Notification.query.filter(
+            Notification.user_id == user_id,
+            Notification.id.in_(notification_ids),
+            Notification.is_read == False
+        ).update({Notification.is_read: True}, synchronize_session=False)
+        unread_counter.adjust({user_id: -updated})
+        db.session.commit()
+        return updated
+    
+    def mark_all_read(self, user_id: int) -> int:
+        """Mark every unread notification of the user as read with one UPDATE"""
+        updated = Notification.query.filter(
+            Notification.user_id == user_id,
+            Notification.is_read == False
+        ).update({Notification.is_read: True}, synchronize_session=False)
+        unread_counter.reset([user_id])
+        db.session.commit()
+        return updated
+    
+    def delete_before(self, user_id: int, before: datetime) -> int:
+        """Delete the user's notifications created before a moment"""
+        scope = Notification.query.filter(
+            Notification.user_id == user_id,
+            Notification.created_at < before
+        )
+        # Unread rows first so the counter moves by exactly what was removed
+        unread_deleted = scope.filter(Notification.is_read == False).delete(synchronize_session=False)
+        deleted = unread_deleted + scope.delete(synchronize_session=False)
+        unread_counter.adjust({user_id: -unread_deleted})
+        db.session.commit()
+        return deleted
+    
+    def clear_all(self, user_id: int) -> int:
+        """Delete every notification of the user with one DELETE"""
+        deleted = Notification.query.filter(
+            Notification.user_id == user_id
+        ).delete(synchronize_session=False)
+        unread_counter.reset([user_id])
+        db.session.commit()
+        return deleted
+    
     def cleanup_old_notifications(self) -> int:
-        """Clean up old notifications and rate limits"""
+        """
+        Move notifications past the retention period into
+        notifications_archive in chunks of BATCH_SIZE rows, committing
+        after each chunk so a large backlog never holds long locks on the
+        table. Also purges expired archive rows, stale dedup keys and
+        rate limits.
+        """
+        cutoff_date = datetime.utcnow() - timedelta(days=self.config.CLEANUP_RETENTION_DAYS)
+        # Let other greenlets (and lock waiters) in between chunks
+        pause = lambda: socketio.sleep(0)
+        archived_count = 0
+        
         try:
-            cutoff_date = datetime.utcnow() - timedelta(days=self.config.CLEANUP_RETENTION_DAYS)
+            archived_count = notification_archive.archive_before(
+                cutoff_date, self.config.BATCH_SIZE, pause
+            )
             
-            deleted_count = Notification.query.filter(
-                Notification.created_at < cutoff_date
-            ).delete()
+            purged_count = 0
+            if notification_archive.retention_days:
+                purged_count = notification_archive.purge_before(
+                    datetime.utcnow() - timedelta(days=notification_archive.retention_days),
+                    self.config.BATCH_SIZE, pause
+                )
             
+            # Dedup keys only matter for today's checks
+            notification_dedup.purge_before(date.today() - timedelta(days=1))
             db.session.commit()
             
             # Clean up rate limiter
             expired_limits = self.rate_limiter.cleanup_expired_limits()
             
-            logger.info(f"Cleaned up {deleted_count} old notifications and {expired_limits} expired rate limits")
-            return deleted_count
+            logger.info(f"Archived {archived_count} old notifications, purged {purged_count} "
+                        f"archived notifications and {expired_limits} expired rate limits")
+            return archived_count
             
         except Exception as e:
             logger.error(f"Failed to cleanup notifications: {e}")
             db.session.rollback()
-            return 0
+            return archived_count
 
 
 # Global service instance
@@ -917,13 +1275,17 @@ def check_missing_milking_and_notify() -> int:
     """Check for missing milking data and send notifications"""
     return notification_service.check_missing_milking_and_notify()
 
+def check_missing_milking_window_and_notify() -> int:
+    """Check the last closed milking window for missing milking data"""
+    return notification_service.check_missing_milking_window_and_notify()
+
 def check_milk_production_and_notify() -> int:
     """Check milk production and send notifications"""
     return notification_service.check_milk_production_and_notify()
 
-def check_milk_expiry_and_notify() -> int:
+def check_milk_expiry_and_notify(expired_batch_ids: Optional[Iterable[int]] = None) -> int:
     """Check milk expiry and send notifications"""
-    return notification_service.check_milk_expiry_and_notify()
+    return notification_service.check_milk_expiry_and_notify(expired_batch_ids)
 
 def create_notification(user_id: int, message: str, notification_type: str,
                        cow_id: Optional[int] = None, 
@@ -949,6 +1311,14 @@ def create_notification_for_supervisors(message: str, notification_type: str,
         message, notification_type, cow_id, additional_data
     )
 
+def cleanup_expired_rate_limits() -> int:
+    """Drop rate limit counters that no longer affect any decision"""
+    return notification_service.rate_limiter.cleanup_expired_limits()
+
+def reconcile_unread_counts() -> int:
+    """Repair unread counters that drifted from the notifications table"""
+    return unread_counter.reconcile()
+
 def cleanup_old_notifications() -> int:
     """Clean up old notifications"""
     return notification_service.cleanup_old_notifications()
@@ -0,0 +1,191 @@
+"""
+Notification Check Queue
+
+Milking-session writes only enqueue the production/expiry checks here; a
+single background worker coalesces pending triggers and runs each check once
+per debounce window, so a burst of 200 sessions costs one evaluation instead
+of 200 synchronous scans on the request path.
+"""
+
+from datetime import datetime
+from typing import Callable, Dict, Optional
+import atexit
+import logging
+import threading
+import time
+
+from app.database.database import db
+from app.services.notification import check_milk_expiry_and_notify, check_milk_production_and_notify
+
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationChecks:
+    """Names of the checks that can be enqueued"""
+    PRODUCTION = "production"
+    EXPIRY = "expiry"
+
+
+class NotificationCheckQueue:
+    """Debounced, coalescing work queue for notification checks"""
+
+    # Wait this long after the last trigger before evaluating
+    DEFAULT_DEBOUNCE_SECONDS = 2.0
+    # ...but never hold a trigger longer than this during a continuous burst
+    DEFAULT_MAX_DELAY_SECONDS = 10.0
+
+    def __init__(self, app=None):
+        self.app = app
+        self.checks: Dict[str, Callable[[], int]] = {
+            NotificationChecks.PRODUCTION: check_milk_production_and_notify,
+            NotificationChecks.EXPIRY: check_milk_expiry_and_notify,
+        }
+        self.debounce_seconds = self.DEFAULT_DEBOUNCE_SECONDS
+        self.max_delay_seconds = self.DEFAULT_MAX_DELAY_SECONDS
+
+        self._condition = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self._stopping = False
+
+        # Pending state (guarded by _condition)
+        self._pending: Dict[str, int] = {}
+        self._first_enqueued_at: Optional[float] = None
+        self._last_enqueued_at: Optional[float] = None
+
+        # Metrics
+        self._metrics = {
+            'triggers_enqueued': 0,
+            'triggers_coalesced': 0,
+            'evaluations': 0,
+            'failures': 0,
+            'notifications_created': 0,
+            'last_run_at': None,
+            'last_run_lag_seconds': None,
+            'last_run_duration_seconds': None,
+            'last_error': None,
+        }
+
+    def init_app(self, app):
+        """Bind the queue to the Flask app and read its settings"""
+        self.app = app
+        self.debounce_seconds = float(app.config.get(
+            'NOTIFICATION_CHECK_DEBOUNCE_SECONDS', self.DEFAULT_DEBOUNCE_SECONDS
+        ))
+        self.max_delay_seconds = float(app.config.get(
+            'NOTIFICATION_CHECK_MAX_DELAY_SECONDS', self.DEFAULT_MAX_DELAY_SECONDS
+        ))
+        atexit.register(self.shutdown)
+
+    def enqueue(self, *check_names: str) -> None:
+        """Request the given checks; repeated requests are coalesced"""
+        if not self.app:
+            # No app bound (e.g. a script) - fall back to running inline
+            for name in check_names:
+                self.checks[name]()
+            return
+
+        with self._condition:
+            now = time.monotonic()
+            for name in check_names:
+                if name not in self.checks:
+                    raise ValueError(f"Unknown notification check: {name}")
+                if name in self._pending:
+                    self._metrics['triggers_coalesced'] += 1
+                self._pending[name] = self._pending.get(name, 0) + 1
+                self._metrics['triggers_enqueued'] += 1
+
+            if self._first_enqueued_at is None:
+                self._first_enqueued_at = now
+            self._last_enqueued_at = now
+
+            self._ensure_worker()
+            self._condition.notify()
+
+    def _ensure_worker(self) -> None:
+        """Start the worker lazily (also covers forked worker processes)"""
+        if self._worker and self._worker.is_alive():
+            return
+        self._stopping = False
+        self._worker = threading.Thread(
+            target=self._run, name='notification-check-queue', daemon=True
+        )
+        self._worker.start()
+
+    def _due_in(self, now: float) -> float:
+        """Seconds until the pending batch should be evaluated"""
+        debounce_due = self._last_enqueued_at + self.debounce_seconds
+        max_delay_due = self._first_enqueued_at + self.max_delay_seconds
+        return min(debounce_due, max_delay_due) - now
+
+    def _run(self) -> None:
+        """Worker loop: wait for triggers, debounce, then evaluate once"""
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopping:
+                    self._condition.wait()
+                if self._stopping:
+                    return
+
+                wait_for = self._due_in(time.monotonic())
+                while wait_for > 0 and not self._stopping:
+                    self._condition.wait(timeout=wait_for)
+                    wait_for = self._due_in(time.monotonic())
+
+                pending = list(self._pending)
+                first_enqueued_at = self._first_enqueued_at
+                self._pending = {}
+                self._first_enqueued_at = None
+                self._last_enqueued_at = None
+
+            self._evaluate(pending, first_enqueued_at)
+
+    def _evaluate(self, check_names, first_enqueued_at: float) -> None:
+        """Run each pending check once inside an app context"""
+        started = time.monotonic()
+        created = 0
+        errors = []
+        try:
+            with self.app.app_context():
+                # A failing check must not skip the ones queued after it
+                for name in check_names:
+                    try:
+                        created += self.checks[name]() or 0
+                    except Exception as e:
+                        db.session.rollback()
+                        self._metrics['failures'] += 1
+                        errors.append(f"{name}: {e}")
+                        logger.error(f"Queued notification check {name} failed: {e}")
+            self._metrics['last_error'] = '; '.join(errors) or None
+        finally:
+            self._metrics['evaluations'] += 1
+            self._metrics['notifications_created'] += created
+            self._metrics['last_run_at'] = datetime.utcnow().isoformat()
+            self._metrics['last_run_lag_seconds'] = round(started - first_enqueued_at, 3)
+            self._metrics['last_run_duration_seconds'] = round(time.monotonic() - started, 3)
+
+    def shutdown(self) -> None:
+        """Stop the worker; pending triggers are dropped"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+
+    def status(self) -> Dict:
+        """Queue depth, lag and run metrics for the status endpoint"""
+        with self._condition:
+            now = time.monotonic()
+            return {
+                'worker_running': bool(self._worker and self._worker.is_alive()),
+                'debounce_seconds': self.debounce_seconds,
+                'max_delay_seconds': self.max_delay_seconds,
+                'queue_depth': sum(self._pending.values()),
+                'pending_checks': sorted(self._pending),
+                'oldest_pending_age_seconds': (
+                    round(now - self._first_enqueued_at, 3) if self._first_enqueued_at else None
+                ),
+                **self._metrics,
+            }
+
+
+# Global queue instance
+notification_check_queue = NotificationCheckQueue()
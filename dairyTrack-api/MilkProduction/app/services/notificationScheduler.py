@@ -1,23 +1,203 @@
+"""
+Notification Scheduler
+
+The single registry for every background job. Each worker process runs the
+same APScheduler triggers, but a job only executes on the worker holding the
+`scheduler` leader lease (a row in `scheduler_leases`), so with N gunicorn /
+eventlet workers each job still runs exactly once per tick. Every execution
+is recorded in `job_runs` with its duration, rows scanned and notifications
+created.
+"""
+
+from dataclasses import dataclass
 from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Union
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
-from apscheduler.triggers.cron import CronTrigger  # Move this import to the top
-import logging
-import atexit
-from flask import current_app
-from app.services.notification import check_milk_expiry_and_notify, check_missing_milking_and_notify
+from apscheduler.triggers.cron import CronTrigger
+from sqlalchemy import and_, case, event, or_, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+
+from app.database.database import db
+from app.models.scheduler import SchedulerLease, JobRun
+from app.services.notification import (
+    check_milk_expiry_and_notify, check_milk_production_and_notify, check_missing_milking_and_notify,
+    check_missing_milking_window_and_notify, cleanup_expired_rate_limits, cleanup_old_notifications,
+    reconcile_unread_counts
+)
+from app.services.session_store import purge_expired_sessions
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class JobResult:
+    """Optional richer return value for job functions"""
+    notifications_created: int = 0
+    rows_scanned: Optional[int] = None
+
+
+@dataclass
+class ScheduledJob:
+    """A registered job: jobs return a notification count or a JobResult"""
+    id: str
+    name: str
+    func: Callable[[], Union[int, JobResult, None]]
+    trigger: object
+
+
+class RowCounter:
+    """
+    Counts rows returned/affected by statements on the current thread while
+    active, used as the `rows_scanned` figure of a job run.
+    """
+    _local = threading.local()
+    _installed = False
+    _install_lock = threading.Lock()
+
+    @classmethod
+    def install(cls) -> None:
+        with cls._install_lock:
+            if not cls._installed:
+                event.listen(Engine, 'after_cursor_execute', cls._after_cursor_execute)
+                cls._installed = True
+
+    @classmethod
+    def _after_cursor_execute(cls, conn, cursor, statement, parameters, context, executemany):
+        counter = getattr(cls._local, 'counter', None)
+        if counter is not None and cursor.rowcount and cursor.rowcount > 0:
+            counter.rows += cursor.rowcount
+
+    def __init__(self):
+        self.rows = 0
+
+    def __enter__(self) -> "RowCounter":
+        self.install()
+        self._local.counter = self
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._local.counter = None
+
+
+class LeaderLease:
+    """Time-bounded leader lease stored as one row in scheduler_leases"""
+
+    def __init__(self, name: str = 'scheduler', ttl_seconds: int = 90):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.holder = self._new_holder_id()
+        self.is_leader = False
+
+    @staticmethod
+    def _new_holder_id() -> str:
+        return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def reset_holder(self) -> None:
+        """Take a fresh holder id (after fork the pid changes)"""
+        self.holder = self._new_holder_id()
+        self.is_leader = False
+
+    def try_acquire(self) -> bool:
+        """Acquire or renew the lease; must run inside an app context"""
+        table = SchedulerLease.__table__
+        c = table.c
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl_seconds)
+
+        try:
+            # acquired_at is assigned before holder so it still sees the old holder
+            result = db.session.execute(
+                update(table).where(and_(
+                    c.name == self.name,
+                    or_(c.holder == self.holder, c.expires_at < now)
+                )).ordered_values(
+                    (c.acquired_at, case((c.holder == self.holder, c.acquired_at), else_=now)),
+                    (c.holder, self.holder),
+                    (c.expires_at, expires_at)
+                )
+            )
+            acquired = result.rowcount == 1
+            if not acquired:
+                # No row yet - the first worker to insert it becomes leader
+                try:
+                    db.session.execute(table.insert().values(
+                        name=self.name, holder=self.holder,
+                        acquired_at=now, expires_at=expires_at
+                    ))
+                    acquired = True
+                except IntegrityError:
+                    db.session.rollback()
+                    acquired = False
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Failed to acquire scheduler lease: {e}")
+            acquired = False
+
+        if acquired != self.is_leader:
+            logger.info(f"Scheduler lease '{self.name}' {'acquired' if acquired else 'lost'} by {self.holder}")
+        self.is_leader = acquired
+        return acquired
+
+    def release(self) -> None:
+        """Give up the lease so another worker can take over immediately"""
+        if not self.is_leader:
+            return
+        try:
+            db.session.execute(
+                SchedulerLease.__table__.delete().where(and_(
+                    SchedulerLease.name == self.name,
+                    SchedulerLease.holder == self.holder
+                ))
+            )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Failed to release scheduler lease: {e}")
+        self.is_leader = False
+
+    def current(self) -> Optional[Dict]:
+        lease = SchedulerLease.query.get(self.name)
+        if not lease:
+            return None
+        return {
+            'holder': lease.holder,
+            'acquired_at': lease.acquired_at.isoformat() if lease.acquired_at else None,
+            'expires_at': lease.expires_at.isoformat() if lease.expires_at else None
+        }
+
 
 class NotificationScheduler:
+    """Job registry with leader-elected execution and run recording"""
+
+    DEFAULT_LEASE_TTL_SECONDS = 90
+
     def __init__(self, app=None):
         self.app = app
         self.scheduler = None
-        
+        self.lease = LeaderLease(ttl_seconds=self.DEFAULT_LEASE_TTL_SECONDS)
+        self.jobs: Dict[str, ScheduledJob] = {}
+        self._atexit_registered = False
+        self._register_default_jobs()
+
     def init_app(self, app):
         """Initialize scheduler with Flask app"""
         self.app = app
+        self.lease.ttl_seconds = int(app.config.get(
+            'SCHEDULER_LEASE_TTL_SECONDS', self.DEFAULT_LEASE_TTL_SECONDS
+        ))
         self.scheduler = BackgroundScheduler(
             timezone='Asia/Jakarta',  # Set your timezone
             job_defaults={
@@ -26,68 +206,181 @@ class NotificationScheduler:
                 'misfire_grace_time': 30
             }
         )
-        
+
+    def _register_default_jobs(self):
+        self.register_job(
+            'milk_production_check', 'Milk Production Check',
+            check_milk_production_and_notify, IntervalTrigger(minutes=5)
+        )
+        self.register_job(
+            'milk_expiry_check', 'Milk Expiry Check',
+            check_milk_expiry_and_notify, IntervalTrigger(minutes=5)
+        )
+        # Runs once daily at 1:00 PM
+        self.register_job(
+            'missing_milking_check', 'Missing Milking Check',
+            check_missing_milking_and_notify, CronTrigger(hour=13, minute=0)
+        )
+        # Hourly check of the last closed milking window (deduplicated per window)
+        self.register_job(
+            'missing_milking_window_check', 'Missing Milking Window Check',
+            check_missing_milking_window_and_notify, CronTrigger(minute=5)
+        )
+        self.register_job(
+            'rate_limit_cleanup', 'Notification Rate Limit Cleanup',
+            lambda: JobResult(rows_scanned=cleanup_expired_rate_limits()), IntervalTrigger(minutes=30)
+        )
+        self.register_job(
+            'unread_count_reconcile', 'Unread Count Reconciliation',
+            lambda: JobResult(rows_scanned=reconcile_unread_counts()), IntervalTrigger(hours=1)
+        )
+        # Nightly retention sweep, archived in BATCH_SIZE chunks
+        self.register_job(
+            'notification_retention', 'Notification Retention',
+            lambda: JobResult(rows_scanned=cleanup_old_notifications()), CronTrigger(hour=2, minute=0)
+        )
+        self.register_job(
+            'user_session_purge', 'Expired User Session Purge',
+            lambda: JobResult(rows_scanned=purge_expired_sessions()), IntervalTrigger(hours=1)
+        )
+
+    def register_job(self, job_id: str, name: str, func: Callable, trigger) -> None:
+        """Add (or replace) a job; takes effect on the next start()"""
+        self.jobs[job_id] = ScheduledJob(job_id, name, func, trigger)
+        if self.scheduler and self.scheduler.running:
+            self._schedule(self.jobs[job_id])
+
+    def _schedule(self, job: ScheduledJob) -> None:
+        self.scheduler.add_job(
+            func=self._run_job,
+            args=[job.id],
+            trigger=job.trigger,
+            id=job.id,
+            name=job.name,
+            replace_existing=True
+        )
+
     def start(self):
         """Start the scheduler"""
         if not self.scheduler:
             logging.error("Scheduler not initialized")
             return
-            
+
         if self.scheduler.running:
             logging.warning("Scheduler is already running")
             return
-        
-        # Add milk expiry check job
-        self.scheduler.add_job(
-            func=self._run_milk_expiry_check,
-            trigger=IntervalTrigger(minutes=5),
-            id='milk_expiry_check',
-            name='Milk Expiry Check',
-            replace_existing=True
-        )
 
-        # Add missing milking check job - runs once daily at 1:00 PM
+        self.lease.reset_holder()
+
+        # Keep (or take over) the leader lease between job ticks
         self.scheduler.add_job(
-            func=self._run_missing_milking_check,
-            trigger=CronTrigger(hour=13, minute=0),  # Run daily at 1:00 PM
-            id='missing_milking_check',
-            name='Missing Milking Check',
+            func=self._heartbeat,
+            trigger=IntervalTrigger(seconds=max(self.lease.ttl_seconds // 3, 1)),
+            id='scheduler_lease_heartbeat',
+            name='Scheduler Lease Heartbeat',
             replace_existing=True
         )
-        
+        for job in self.jobs.values():
+            self._schedule(job)
+
         self.scheduler.start()
-        logging.info("Notification scheduler started - checks configured")
-    
+        logging.info(f"Notification scheduler started - {len(self.jobs)} jobs registered")
+
         # Shut down the scheduler when exiting the app
-        atexit.register(lambda: self.shutdown())
-        
+        if not self._atexit_registered:
+            atexit.register(lambda: self.shutdown())
+            self._atexit_registered = True
+
     def shutdown(self):
         """Stop the scheduler"""
         if self.scheduler and self.scheduler.running:
             self.scheduler.shutdown()
+            if self.app:
+                with self.app.app_context():
+                    self.lease.release()
             logging.info("Notification scheduler stopped")
-            
-            
-    def _run_milk_expiry_check(self):
-        """Run milk expiry check with app context"""
+
+    def _heartbeat(self):
         try:
             with self.app.app_context():
-                logging.info("Running scheduled milk expiry check")
-                notification_count = check_milk_expiry_and_notify()
-                logging.info(f"Milk expiry check completed - {notification_count} notifications created")
+                self.lease.try_acquire()
         except Exception as e:
-            logging.error(f"Error in scheduled milk expiry check: {str(e)}")
+            logging.error(f"Scheduler lease heartbeat failed: {str(e)}")
 
-    def _run_missing_milking_check(self):
-        """Run missing milking check with app context"""
+    def run_job(self, job_id: str) -> Optional[JobRun]:
+        """Run a registered job now on this worker, bypassing the lease"""
+        with self.app.app_context():
+            return self._execute(self.jobs[job_id])
+
+    def _run_job(self, job_id: str):
+        """APScheduler entry point: run the job only on the lease holder"""
         try:
             with self.app.app_context():
-                logging.info("Running scheduled missing milking check")
-                notification_count = check_missing_milking_and_notify()
-                logging.info(f"Missing milking check completed - {notification_count} notifications created")
+                if not self.lease.try_acquire():
+                    return
+                logging.info(f"Running scheduled job {job_id}")
+                run = self._execute(self.jobs[job_id])
+                logging.info(
+                    f"Job {job_id} {run.status} in {run.duration_ms:.0f} ms - "
+                    f"{run.rows_scanned} rows scanned, {run.notifications_created} notifications created"
+                )
         except Exception as e:
-            logging.error(f"Error in scheduled missing milking check: {str(e)}")
+            logging.error(f"Error in scheduled job {job_id}: {str(e)}")
+
+    def _execute(self, job: ScheduledJob) -> JobRun:
+        """Execute a job and persist its JobRun record"""
+        started_at = datetime.utcnow()
+        started = time.perf_counter()
+        status, error, notifications, rows_scanned = 'success', None, 0, None
+
+        with RowCounter() as counter:
+            try:
+                result = job.func()
+                if isinstance(result, JobResult):
+                    notifications = result.notifications_created or 0
+                    rows_scanned = result.rows_scanned
+                else:
+                    notifications = result or 0
+            except Exception as e:
+                db.session.rollback()
+                status, error = 'failed', str(e)
+                logging.error(f"Job {job.id} failed: {error}")
+
+        run = JobRun(
+            job_id=job.id,
+            worker=self.lease.holder,
+            status=status,
+            started_at=started_at,
+            finished_at=datetime.utcnow(),
+            duration_ms=round((time.perf_counter() - started) * 1000, 2),
+            rows_scanned=rows_scanned if rows_scanned is not None else counter.rows,
+            notifications_created=notifications,
+            error=error
+        )
+        try:
+            db.session.add(run)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Failed to record run of job {job.id}: {str(e)}")
+        return run
+
+    def recent_runs(self, job_id: Optional[str] = None, limit: int = 20) -> List[Dict]:
+        query = JobRun.query
+        if job_id:
+            query = query.filter(JobRun.job_id == job_id)
+        runs = query.order_by(JobRun.started_at.desc(), JobRun.id.desc()).limit(limit).all()
+        return [run.to_dict() for run in runs]
+
+    def status(self) -> Dict:
+        """Leader and per-job state for the status endpoint"""
+        return {
+            'worker': self.lease.holder,
+            'is_leader': self.lease.is_leader,
+            'lease': self.lease.current(),
+            'registered_jobs': sorted(self.jobs)
+        }
 
 
 # Global scheduler instance
-notification_scheduler = NotificationScheduler()
\ No newline at end of file
+notification_scheduler = NotificationScheduler()
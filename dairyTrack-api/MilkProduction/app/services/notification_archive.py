@@ -0,0 +1,134 @@
+"""
+Notification Archive
+
+Keeps `notifications` small by moving rows past retention into
+`notifications_archive`. The table is shared with HealthCheck and Selling
+and carries foreign keys, which MySQL does not allow on partitioned
+tables, so instead of RANGE partitions the retention sweep moves expired
+rows in bounded chunks: INSERT ... SELECT into the archive and DELETE from
+the hot table in one short transaction per chunk. Archived rows stay
+readable per user (GET /notification/archive) and are purged only when
+NOTIFICATION_ARCHIVE_RETENTION_DAYS is set.
+"""
+
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Dict, Optional
+import logging
+
+from sqlalchemy import select
+
+from app.models.notification import Notification, NotificationArchive
+from app.database.database import db
+from app.services.unread_counter import unread_counter
+
+
+logger = logging.getLogger(__name__)
+
+# Columns copied from notifications; archive `notification_id` takes `id`
+ARCHIVED_COLUMNS = ('user_id', 'cow_id', 'message', 'type', 'is_read', 'created_at', 'created_at_wib')
+
+
+class NotificationArchiver:
+    """Chunked move of expired notifications into notifications_archive"""
+
+    DEFAULT_BATCH_SIZE = 500
+
+    def __init__(self):
+        self.table = Notification.__table__
+        self.archive = NotificationArchive.__table__
+        self.batch_size = self.DEFAULT_BATCH_SIZE
+        self.retention_days: Optional[int] = None
+        self._metrics = {'archived': 0, 'purged': 0, 'last_run': None}
+
+    def init_app(self, app):
+        retention_days = app.config.get('NOTIFICATION_ARCHIVE_RETENTION_DAYS')
+        self.retention_days = int(retention_days) if retention_days else None
+
+    def archive_before(self, cutoff: datetime, batch_size: Optional[int] = None,
+                       pause: Optional[Callable[[], None]] = None) -> int:
+        """
+        Move notifications created before cutoff into the archive, one
+        committed chunk at a time; `pause` runs between chunks. Returns
+        how many rows were moved.
+        """
+        batch_size = batch_size or self.batch_size
+        t = self.table.c
+        moved = 0
+
+        while True:
+            chunk = db.session.execute(
+                select(t.id, t.user_id, t.is_read).where(
+                    t.created_at < cutoff
+                ).order_by(t.id).limit(batch_size)
+            ).all()
+            if not chunk:
+                break
+
+            ids = [row.id for row in chunk]
+            db.session.execute(self.archive.insert().from_select(
+                ['notification_id', *ARCHIVED_COLUMNS],
+                select(t.id, *(t[name] for name in ARCHIVED_COLUMNS)).where(t.id.in_(ids))
+            ))
+            db.session.execute(self.table.delete().where(t.id.in_(ids)))
+            unread_counter.adjust({
+                user_id: -count for user_id, count in
+                Counter(row.user_id for row in chunk if not row.is_read).items()
+            })
+            db.session.commit()
+            moved += len(chunk)
+
+            if len(chunk) < batch_size:
+                break
+            if pause:
+                pause()
+
+        self._metrics['archived'] += moved
+        self._metrics['last_run'] = datetime.utcnow().isoformat()
+        return moved
+
+    def purge_before(self, cutoff: datetime, batch_size: Optional[int] = None,
+                     pause: Optional[Callable[[], None]] = None) -> int:
+        """Delete archived rows created before cutoff in committed chunks"""
+        batch_size = batch_size or self.batch_size
+        a = self.archive.c
+        purged = 0
+
+        while True:
+            ids = db.session.execute(
+                select(a.id).where(a.created_at < cutoff).order_by(a.id).limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                break
+            db.session.execute(self.archive.delete().where(a.id.in_(ids)))
+            db.session.commit()
+            purged += len(ids)
+
+            if len(ids) < batch_size:
+                break
+            if pause:
+                pause()
+
+        self._metrics['purged'] += purged
+        return purged
+
+    def query_for_user(self, user_id: int, before: Optional[datetime] = None,
+                       after: Optional[datetime] = None):
+        """Archived notifications of a user, newest first"""
+        query = NotificationArchive.query.filter_by(user_id=user_id)
+        if before is not None:
+            query = query.filter(NotificationArchive.created_at < before)
+        if after is not None:
+            query = query.filter(NotificationArchive.created_at >= after)
+        return query.order_by(NotificationArchive.created_at.desc())
+
+    def status(self) -> Dict:
+        return {
+            'batch_size': self.batch_size,
+            'retention_days': self.retention_days,
+            **self._metrics
+        }
+
+
+# Global archiver instance
+notification_archive = NotificationArchiver()
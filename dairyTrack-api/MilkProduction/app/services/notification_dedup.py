@@ -0,0 +1,171 @@
+"""
+Notification Dedup Store
+
+Remembers which notifications were already sent so periodic checks do not
+query `notifications` before every insert. Each key is
+(user_id, cow_id, type, bucket_date, batch_number) and is stored once in
+`notification_dedup` under a unique constraint, written with
+INSERT IGNORE / ON DUPLICATE KEY UPDATE (ON CONFLICT on PostgreSQL and
+SQLite). A bounded in-memory LRU sits in front of the table, so keys seen
+on an earlier tick are resolved without touching the database; misses are
+resolved with one query per lookup.
+"""
+
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Iterable, NamedTuple, Optional
+import logging
+import threading
+
+from sqlalchemy import and_, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from app.models.notification import NotificationDedup
+from app.database.database import db
+
+
+logger = logging.getLogger(__name__)
+
+
+class DedupKey(NamedTuple):
+    """Identity of a notification that must be sent (or kept) only once"""
+    user_id: int
+    cow_id: int
+    type: str
+    bucket_date: date
+    batch_number: str = ''
+
+
+class NotificationDedupStore:
+    """LRU-fronted access to the notification_dedup key table"""
+
+    DEFAULT_CACHE_SIZE = 10000
+
+    def __init__(self, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.cache_size = cache_size
+        self.table = NotificationDedup.__table__
+        self._lock = threading.Lock()
+        # key -> notification_id (None when the notification row is unknown)
+        self._cache: "OrderedDict[DedupKey, Optional[int]]" = OrderedDict()
+        self._metrics = {'hits': 0, 'misses': 0, 'queries': 0}
+
+    def init_app(self, app):
+        """Read the LRU size from the app config"""
+        self.cache_size = int(app.config.get(
+            'NOTIFICATION_DEDUP_CACHE_SIZE', self.DEFAULT_CACHE_SIZE
+        ))
+
+    def lookup(self, keys: Iterable[DedupKey]) -> Dict[DedupKey, Optional[int]]:
+        """
+        Return {key: notification_id} for the keys that are already recorded.
+        Cached keys cost nothing; the rest are resolved with one query.
+        """
+        found, missing = {}, set()
+        with self._lock:
+            for key in set(keys):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    found[key] = self._cache[key]
+                    self._metrics['hits'] += 1
+                else:
+                    missing.add(key)
+            self._metrics['misses'] += len(missing)
+
+        if not missing:
+            return found
+
+        c = self.table.c
+        rows = db.session.execute(
+            select(c.user_id, c.cow_id, c.type, c.bucket_date, c.batch_number, c.notification_id).where(and_(
+                c.user_id.in_({key.user_id for key in missing}),
+                c.cow_id.in_({key.cow_id for key in missing}),
+                c.type.in_({key.type for key in missing}),
+                c.bucket_date.in_({key.bucket_date for key in missing})
+            ))
+        )
+        with self._lock:
+            self._metrics['queries'] += 1
+        loaded = {}
+        for user_id, cow_id, notification_type, bucket_date, batch_number, notification_id in rows:
+            key = DedupKey(user_id, cow_id, notification_type, bucket_date, batch_number)
+            if key in missing:
+                loaded[key] = notification_id
+
+        self.remember(loaded)
+        found.update(loaded)
+        return found
+
+    def record(self, entries: Dict[DedupKey, Optional[int]], overwrite: bool = False) -> None:
+        """
+        Write keys in one statement; the caller commits and then calls
+        remember(). Existing keys are left alone (INSERT IGNORE) unless
+        overwrite is set, which repoints them at the new notification id.
+        """
+        if not entries:
+            return
+
+        values = [
+            dict(key._asdict(), notification_id=notification_id)
+            for key, notification_id in entries.items()
+        ]
+        dialect = db.session.get_bind().dialect.name
+
+        if dialect == 'mysql':
+            stmt = mysql.insert(self.table).values(values)
+            if overwrite:
+                stmt = stmt.on_duplicate_key_update(notification_id=stmt.inserted.notification_id)
+            else:
+                stmt = stmt.prefix_with('IGNORE')
+        elif dialect in ('postgresql', 'sqlite'):
+            dialect_insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+            stmt = dialect_insert(self.table).values(values)
+            if overwrite:
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=list(DedupKey._fields),
+                    set_={'notification_id': stmt.excluded.notification_id}
+                )
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=list(DedupKey._fields))
+        else:
+            raise NotImplementedError(f"Notification dedup upsert is not supported on {dialect}")
+
+        db.session.execute(stmt)
+
+    def remember(self, entries: Dict[DedupKey, Optional[int]]) -> None:
+        """Put committed keys into the LRU, evicting the least recently used"""
+        if not entries:
+            return
+        with self._lock:
+            for key, notification_id in entries.items():
+                self._cache[key] = notification_id
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def forget(self, keys: Iterable[DedupKey]) -> None:
+        """Drop keys from the LRU (e.g. their notification row is gone)"""
+        with self._lock:
+            for key in keys:
+                self._cache.pop(key, None)
+
+    def purge_before(self, bucket_date: date) -> int:
+        """Delete keys of days before bucket_date; the caller commits"""
+        result = db.session.execute(
+            self.table.delete().where(self.table.c.bucket_date < bucket_date)
+        )
+        with self._lock:
+            for key in [key for key in self._cache if key.bucket_date < bucket_date]:
+                del self._cache[key]
+        return result.rowcount
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                'cache_size': self.cache_size,
+                'cached_keys': len(self._cache),
+                **self._metrics
+            }
+
+
+# Global store instance
+notification_dedup = NotificationDedupStore()
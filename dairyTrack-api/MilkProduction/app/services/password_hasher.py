@@ -0,0 +1,149 @@
+"""
+Password Hashing Policy
+
+One place decides how passwords are hashed: PASSWORD_HASH_METHOD (a
+werkzeug method string, e.g. `pbkdf2:sha256:260000`, the cost being the
+iteration count) and PASSWORD_HASH_SALT_LENGTH. Hashes written under an
+older policy keep verifying; after a successful login they are upgraded to
+the current policy by a background task, so raising the cost needs no
+password reset.
+
+Hashing and verification are CPU bound. Under eventlet they run on
+eventlet's native thread pool (`tpool`) so a login does not stall the hub
+and every other request of the worker; otherwise a ThreadPoolExecutor of
+PASSWORD_HASH_WORKERS threads is used. hashlib releases the GIL while
+deriving keys, so logins scale over the cores.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import update
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from app.models.users import User
+from app.database.database import db
+from app.socket import socketio
+
+
+logger = logging.getLogger(__name__)
+
+
+def _eventlet_patched() -> bool:
+    try:
+        from eventlet import patcher
+    except ImportError:
+        return False
+    return patcher.is_monkey_patched('thread')
+
+
+class PasswordHasher:
+    """Configurable hash policy with off-loop verification and rehash on login"""
+
+    DEFAULT_METHOD = 'pbkdf2:sha256:260000'
+    DEFAULT_SALT_LENGTH = 16
+
+    def __init__(self):
+        self.app = None
+        self.method = self.DEFAULT_METHOD
+        self.salt_length = self.DEFAULT_SALT_LENGTH
+        self.workers = os.cpu_count() or 1
+        self._signature: Optional[str] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._metrics = {'hashed': 0, 'verified': 0, 'rehashed': 0, 'verify_ms_total': 0.0}
+
+    def init_app(self, app):
+        self.app = app
+        self.method = app.config.get('PASSWORD_HASH_METHOD', self.DEFAULT_METHOD)
+        self.salt_length = int(app.config.get('PASSWORD_HASH_SALT_LENGTH', self.DEFAULT_SALT_LENGTH))
+        self.workers = int(app.config.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+        self._signature = None
+
+    @property
+    def signature(self) -> str:
+        """Method prefix of hashes written under the current policy (e.g. pbkdf2:sha256:260000)"""
+        if self._signature is None:
+            # werkzeug fills in defaults (iterations), so read them back from a real hash
+            self._signature = generate_password_hash('', self.method, self.salt_length).split('$', 1)[0]
+        return self._signature
+
+    def _run(self, func: Callable, *args):
+        """Run CPU-bound work off the event loop"""
+        if _eventlet_patched():
+            from eventlet import tpool
+            return tpool.execute(func, *args)
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+        return self._executor.submit(func, *args).result()
+
+    def hash(self, password: str) -> str:
+        """Hash a password under the current policy"""
+        hashed = self._run(generate_password_hash, password, self.method, self.salt_length)
+        self._metrics['hashed'] += 1
+        return hashed
+
+    def verify(self, pwhash: Optional[str], password: str) -> bool:
+        """Check a password against a stored hash of any supported policy"""
+        if not pwhash or not password:
+            return False
+        started = time.perf_counter()
+        valid = self._run(check_password_hash, pwhash, password)
+        self._metrics['verified'] += 1
+        self._metrics['verify_ms_total'] += (time.perf_counter() - started) * 1000
+        return valid
+
+    def needs_rehash(self, pwhash: str) -> bool:
+        """Whether a stored hash was written under another method, cost or salt length"""
+        if pwhash.count('$') < 2:
+            return True
+        method, salt, _ = pwhash.split('$', 2)
+        return method != self.signature or len(salt) != self.salt_length
+
+    def verify_user(self, user: User, password: str) -> bool:
+        """
+        Verify a login; a valid password stored under an older policy is
+        rehashed in the background.
+        """
+        if not self.verify(user.password, password):
+            return False
+        if self.needs_rehash(user.password) and self.app is not None:
+            socketio.start_background_task(self._rehash, user.id, user.password, password)
+        return True
+
+    def _rehash(self, user_id: int, old_hash: str, password: str) -> None:
+        with self.app.app_context():
+            try:
+                new_hash = self.hash(password)
+                # Only if the password did not change meanwhile
+                result = db.session.execute(
+                    update(User).where(User.id == user_id, User.password == old_hash).values(password=new_hash)
+                )
+                db.session.commit()
+                if result.rowcount:
+                    self._metrics['rehashed'] += 1
+                    logger.info(f"Password hash of user {user_id} upgraded to {self.signature}")
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Password rehash of user {user_id} failed: {str(e)}")
+
+    def status(self) -> Dict:
+        verified = self._metrics['verified']
+        return {
+            'method': self.signature,
+            'salt_length': self.salt_length,
+            'pool': 'eventlet.tpool' if _eventlet_patched() else f"threads:{self.workers}",
+            'hashed': self._metrics['hashed'],
+            'verified': verified,
+            'rehashed': self._metrics['rehashed'],
+            'avg_verify_ms': round(self._metrics['verify_ms_total'] / verified, 2) if verified else None
+        }
+
+
+# Global password hasher instance
+password_hasher = PasswordHasher()
@@ -0,0 +1,223 @@
+"""
+Notification Rate Limit Backends
+
+Sliding-window counters behind the notification RateLimiter. Each key keeps
+the count of the current fixed window and of the previous one; the
+previous count is weighted by how much of it still overlaps the sliding
+window, which approximates a true sliding log at two integers per key.
+
+- InMemoryRateLimitBackend: per-process, bounded LRU (oldest keys evicted).
+- SqlRateLimitBackend: one row per key in `notification_rate_limits`,
+  updated under SELECT ... FOR UPDATE, so every worker shares one budget.
+"""
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+import logging
+import math
+import threading
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from app.models.notification import NotificationRateLimit
+from app.database.database import db
+
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1)
+
+
+@dataclass
+class WindowState:
+    """Counters of one key: current fixed window and the one before it"""
+    window_start: datetime
+    count: int = 0
+    previous_count: int = 0
+
+
+def window_start_of(now: datetime, window_seconds: int) -> datetime:
+    """Start of the fixed window containing now (aligned to the epoch)"""
+    seconds = int((now - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=seconds - seconds % window_seconds)
+
+
+def consume_window(state: Optional[WindowState], requested: int, limit: int,
+                   window_seconds: int, now: datetime) -> Tuple[int, WindowState]:
+    """
+    Take up to `requested` units from a key's budget.
+    Returns (granted, new_state).
+    """
+    start = window_start_of(now, window_seconds)
+    window = timedelta(seconds=window_seconds)
+
+    if state is None or state.window_start < start - window:
+        current, previous = 0, 0
+    elif state.window_start < start:
+        current, previous = 0, state.count
+    else:
+        current, previous = state.count, state.previous_count
+
+    overlap = 1 - (now - start).total_seconds() / window_seconds
+    estimate = previous * overlap + current
+    granted = max(0, min(requested, math.ceil(limit - estimate)))
+    return granted, WindowState(start, current + granted, previous)
+
+
+class RateLimitBackend(ABC):
+    """Storage for sliding-window counters"""
+
+    name = 'base'
+
+    @abstractmethod
+    def consume(self, requests: Dict[str, int], limit: int, window_seconds: int,
+                now: datetime) -> Dict[str, int]:
+        """Take budget for {key: units}; returns {key: units granted}"""
+
+    @abstractmethod
+    def cleanup(self, window_seconds: int, now: datetime) -> int:
+        """Drop keys whose counters no longer affect any decision"""
+
+    def status(self) -> Dict:
+        return {'backend': self.name}
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """Per-process counters in a bounded LRU"""
+
+    name = 'memory'
+    DEFAULT_MAX_KEYS = 10000
+
+    def __init__(self, max_keys: int = DEFAULT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._states: "OrderedDict[str, WindowState]" = OrderedDict()
+        self._evictions = 0
+
+    def consume(self, requests: Dict[str, int], limit: int, window_seconds: int,
+                now: datetime) -> Dict[str, int]:
+        granted = {}
+        with self._lock:
+            for key, requested in requests.items():
+                granted[key], self._states[key] = consume_window(
+                    self._states.get(key), requested, limit, window_seconds, now
+                )
+                self._states.move_to_end(key)
+            while len(self._states) > self.max_keys:
+                self._states.popitem(last=False)
+                self._evictions += 1
+        return granted
+
+    def cleanup(self, window_seconds: int, now: datetime) -> int:
+        horizon = window_start_of(now, window_seconds) - timedelta(seconds=window_seconds)
+        with self._lock:
+            expired = [key for key, state in self._states.items() if state.window_start < horizon]
+            for key in expired:
+                del self._states[key]
+        return len(expired)
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                'backend': self.name,
+                'max_keys': self.max_keys,
+                'keys': len(self._states),
+                'evictions': self._evictions
+            }
+
+
+class SqlRateLimitBackend(RateLimitBackend):
+    """
+    Counters shared by all workers in `notification_rate_limits`. Runs in
+    the caller's transaction: rows stay locked until the caller commits.
+    """
+
+    name = 'sql'
+
+    def __init__(self):
+        self.table = NotificationRateLimit.__table__
+
+    def _load(self, keys, dialect: str) -> Dict[str, WindowState]:
+        c = self.table.c
+        stmt = select(c.key, c.window_start, c.count, c.previous_count).where(c.key.in_(keys))
+        if dialect in ('mysql', 'postgresql'):
+            stmt = stmt.with_for_update()
+        return {
+            key: WindowState(window_start, count, previous_count)
+            for key, window_start, count, previous_count in db.session.execute(stmt)
+        }
+
+    def _create_missing(self, keys, start: datetime, dialect: str) -> None:
+        """Insert zeroed rows, ignoring keys another worker created meanwhile"""
+        values = [{'key': key, 'window_start': start, 'count': 0, 'previous_count': 0} for key in keys]
+        if dialect == 'mysql':
+            stmt = mysql.insert(self.table).values(values).prefix_with('IGNORE')
+        elif dialect in ('postgresql', 'sqlite'):
+            dialect_insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+            stmt = dialect_insert(self.table).values(values).on_conflict_do_nothing(index_elements=['key'])
+        else:
+            raise NotImplementedError(f"Shared rate limits are not supported on {dialect}")
+        db.session.execute(stmt)
+
+    def consume(self, requests: Dict[str, int], limit: int, window_seconds: int,
+                now: datetime) -> Dict[str, int]:
+        if not requests:
+            return {}
+
+        dialect = db.session.get_bind().dialect.name
+        states = self._load(list(requests), dialect)
+        missing = [key for key in requests if key not in states]
+        if missing:
+            self._create_missing(missing, window_start_of(now, window_seconds), dialect)
+            states.update(self._load(missing, dialect))
+
+        granted, updates = {}, []
+        for key, requested in requests.items():
+            granted[key], state = consume_window(states.get(key), requested, limit, window_seconds, now)
+            updates.append({
+                'b_key': key,
+                'window_start': state.window_start,
+                'count': state.count,
+                'previous_count': state.previous_count
+            })
+
+        c = self.table.c
+        db.session.execute(
+            update(self.table).where(c.key == bindparam('b_key')).values(
+                window_start=bindparam('window_start'),
+                count=bindparam('count'),
+                previous_count=bindparam('previous_count')
+            ),
+            updates
+        )
+        return granted
+
+    def cleanup(self, window_seconds: int, now: datetime) -> int:
+        horizon = window_start_of(now, window_seconds) - timedelta(seconds=window_seconds)
+        result = db.session.execute(
+            self.table.delete().where(self.table.c.window_start < horizon)
+        )
+        db.session.commit()
+        return result.rowcount
+
+
+RATE_LIMIT_BACKENDS = {
+    InMemoryRateLimitBackend.name: InMemoryRateLimitBackend,
+    SqlRateLimitBackend.name: SqlRateLimitBackend,
+}
+
+
+def create_rate_limit_backend(name: str, **options) -> RateLimitBackend:
+    """Build a backend by config name ('memory' or 'sql')"""
+    try:
+        backend_class = RATE_LIMIT_BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown rate limit backend '{name}'. "
+                         f"Available: {', '.join(sorted(RATE_LIMIT_BACKENDS))}")
+    if backend_class is InMemoryRateLimitBackend:
+        return backend_class(**options)
+    return backend_class()
@@ -0,0 +1,105 @@
+"""
+Notification Recipient Directory
+
+Caches who receives notifications: user ids per set of role names (admins,
+supervisors) and the manager set of every cow from `user_cow_association`.
+A whole check cycle resolves its recipients from memory after at most one
+query per role set plus one for the association table. Entries expire after
+a TTL and are dropped explicitly when users, roles or cow assignments change.
+"""
+
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple
+import logging
+import threading
+import time
+
+from app.models.roles import Role
+from app.models.users import User
+from app.models.user_cow_association import user_cow_association
+from app.database.database import db
+
+
+logger = logging.getLogger(__name__)
+
+
+class RecipientDirectory:
+    """TTL cache of role -> user ids and cow -> manager ids"""
+
+    DEFAULT_TTL_SECONDS = 300
+
+    def __init__(self, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._role_users: Dict[FrozenSet[str], Tuple[float, FrozenSet[int]]] = {}
+        self._cow_managers: Optional[Tuple[float, Dict[int, FrozenSet[int]]]] = None
+        self._metrics = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def init_app(self, app):
+        """Read the TTL from the app config"""
+        self.ttl_seconds = float(app.config.get(
+            'RECIPIENT_DIRECTORY_TTL_SECONDS', self.DEFAULT_TTL_SECONDS
+        ))
+
+    def _fresh(self, loaded_at: float) -> bool:
+        return time.monotonic() - loaded_at < self.ttl_seconds
+
+    def users_with_roles(self, role_names: Iterable[str]) -> FrozenSet[int]:
+        """Ids of users whose role name is in role_names (one query on a miss)"""
+        key = frozenset(role_names)
+        with self._lock:
+            cached = self._role_users.get(key)
+            if cached and self._fresh(cached[0]):
+                self._metrics['hits'] += 1
+                return cached[1]
+            self._metrics['misses'] += 1
+
+        rows = db.session.query(User.id).join(Role, User.role_id == Role.id).filter(
+            Role.name.in_(key)
+        ).all()
+        user_ids = frozenset(row.id for row in rows)
+
+        with self._lock:
+            self._role_users[key] = (time.monotonic(), user_ids)
+        return user_ids
+
+    def managers_of(self, cow_id: int) -> FrozenSet[int]:
+        """Ids of users managing the cow (whole association table loaded once)"""
+        with self._lock:
+            cached = self._cow_managers
+            if cached and self._fresh(cached[0]):
+                self._metrics['hits'] += 1
+                return cached[1].get(cow_id, frozenset())
+            self._metrics['misses'] += 1
+
+        managers: Dict[int, set] = {}
+        for user_id, managed_cow_id in db.session.query(
+            user_cow_association.c.user_id, user_cow_association.c.cow_id
+        ):
+            managers.setdefault(managed_cow_id, set()).add(user_id)
+        frozen = {key: frozenset(value) for key, value in managers.items()}
+
+        with self._lock:
+            self._cow_managers = (time.monotonic(), frozen)
+        return frozen.get(cow_id, frozenset())
+
+    def invalidate(self, roles: bool = True, managers: bool = True) -> None:
+        """Drop cached entries after users, roles or assignments changed"""
+        with self._lock:
+            if roles:
+                self._role_users.clear()
+            if managers:
+                self._cow_managers = None
+            self._metrics['invalidations'] += 1
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                'ttl_seconds': self.ttl_seconds,
+                'cached_role_sets': len(self._role_users),
+                'cow_managers_cached': self._cow_managers is not None,
+                **self._metrics
+            }
+
+
+# Global directory instance
+recipient_directory = RecipientDirectory()
@@ -0,0 +1,182 @@
+"""
+User Session Store
+
+Login tokens live in `user_sessions` (token primary key, several rows per
+user, one per device) instead of the unindexed `users.token` column. A
+bounded in-memory LRU maps token -> (user_id, role_id, expires_at), so
+validating a token on every request is a dictionary lookup: expiry is
+checked against the cached expires_at without touching the database, and
+a miss costs one primary-key lookup. Cache entries are re-read after
+AUTH_SESSION_CACHE_TTL_SECONDS so a logout on another worker is noticed
+within that window.
+"""
+
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+from typing import Dict, NamedTuple, Optional
+import logging
+import threading
+import time
+import uuid
+
+from flask import g, jsonify, request
+
+from app.models.user_session import UserSession
+from app.models.users import User
+from app.database.database import db
+
+
+logger = logging.getLogger(__name__)
+
+
+class CachedSession(NamedTuple):
+    """What a validated token resolves to"""
+    user_id: int
+    role_id: int
+    expires_at: datetime
+
+
+class SessionStore:
+    """user_sessions table behind a bounded TTL cache"""
+
+    DEFAULT_LIFETIME_SECONDS = 7200  # 2 jam
+    DEFAULT_CACHE_SIZE = 10000
+    DEFAULT_CACHE_TTL_SECONDS = 60
+
+    def __init__(self):
+        self.lifetime_seconds = self.DEFAULT_LIFETIME_SECONDS
+        self.cache_size = self.DEFAULT_CACHE_SIZE
+        self.cache_ttl_seconds = self.DEFAULT_CACHE_TTL_SECONDS
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()  # token -> (cached_at, CachedSession)
+        self._metrics = {'hits': 0, 'misses': 0, 'rejected': 0}
+
+    def init_app(self, app):
+        self.lifetime_seconds = int(app.config.get('AUTH_TOKEN_LIFETIME_SECONDS', self.DEFAULT_LIFETIME_SECONDS))
+        self.cache_size = int(app.config.get('AUTH_SESSION_CACHE_SIZE', self.DEFAULT_CACHE_SIZE))
+        self.cache_ttl_seconds = float(app.config.get(
+            'AUTH_SESSION_CACHE_TTL_SECONDS', self.DEFAULT_CACHE_TTL_SECONDS
+        ))
+
+    def _remember(self, token: str, session: CachedSession) -> None:
+        with self._lock:
+            self._cache[token] = (time.monotonic(), session)
+            self._cache.move_to_end(token)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def create(self, user: User, device: Optional[str] = None) -> UserSession:
+        """
+        Open a session for a user on one device. The caller commits and
+        then calls remember(), so a rolled back login is never cached.
+        """
+        now = datetime.utcnow()
+        session = UserSession(
+            token=str(uuid.uuid4()), user_id=user.id, device=(device or '')[:255] or None,
+            created_at=now, expires_at=now + timedelta(seconds=self.lifetime_seconds)
+        )
+        db.session.add(session)
+        return session
+
+    def remember(self, session: UserSession, user: User) -> None:
+        """Cache a committed session so its first requests skip the lookup"""
+        self._remember(session.token, CachedSession(user.id, user.role_id, session.expires_at))
+
+    def validate(self, token: Optional[str]) -> Optional[CachedSession]:
+        """The session of a live token, or None if unknown or expired"""
+        if not token:
+            return None
+        now = datetime.utcnow()
+
+        with self._lock:
+            cached = self._cache.get(token)
+            if cached and time.monotonic() - cached[0] < self.cache_ttl_seconds:
+                self._cache.move_to_end(token)
+                if cached[1].expires_at > now:
+                    self._metrics['hits'] += 1
+                    return cached[1]
+                # Expired: rejected from memory
+                del self._cache[token]
+                self._metrics['rejected'] += 1
+                return None
+            self._metrics['misses'] += 1
+
+        row = db.session.query(
+            UserSession.user_id, User.role_id, UserSession.expires_at
+        ).join(User, User.id == UserSession.user_id).filter(UserSession.token == token).first()
+        if row is None or row.expires_at <= now:
+            with self._lock:
+                self._cache.pop(token, None)
+            return None
+
+        session = CachedSession(row.user_id, row.role_id, row.expires_at)
+        self._remember(token, session)
+        return session
+
+    def revoke(self, token: str) -> Optional[int]:
+        """End one session; returns its user id if it existed (the caller commits)"""
+        with self._lock:
+            self._cache.pop(token, None)
+        session = db.session.get(UserSession, token)
+        if session is None:
+            return None
+        db.session.delete(session)
+        return session.user_id
+
+    def revoke_user(self, user_id: int) -> int:
+        """End every session of a user (the caller commits)"""
+        self.forget_user(user_id)
+        return UserSession.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+
+    def forget_user(self, user_id: int) -> None:
+        """Drop a user's cached sessions (e.g. after a role change)"""
+        with self._lock:
+            for token in [t for t, (_, s) in self._cache.items() if s.user_id == user_id]:
+                del self._cache[token]
+
+    def purge_expired(self) -> int:
+        """Delete expired sessions; returns how many"""
+        purged = UserSession.query.filter(
+            UserSession.expires_at <= datetime.utcnow()
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return purged
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                'cached_sessions': len(self._cache),
+                'cache_size': self.cache_size,
+                'cache_ttl_seconds': self.cache_ttl_seconds,
+                **self._metrics
+            }
+
+
+def token_from_request() -> Optional[str]:
+    """Token from `Authorization: Bearer <token>` or `X-Auth-Token`"""
+    authorization = request.headers.get('Authorization', '')
+    if authorization.lower().startswith('bearer '):
+        return authorization[7:].strip()
+    return request.headers.get('X-Auth-Token')
+
+
+def session_required(view):
+    """Reject requests without a live session token; the session is in g.user_session"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        session = session_store.validate(token_from_request())
+        if session is None:
+            return jsonify({"success": False, "message": "Invalid or expired token"}), 401
+        g.user_session = session
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def purge_expired_sessions() -> int:
+    """Delete expired user sessions"""
+    return session_store.purge_expired()
+
+
+# Global session store instance
+session_store = SessionStore()
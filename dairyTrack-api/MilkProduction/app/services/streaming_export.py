@@ -0,0 +1,202 @@
+"""
+Streaming Export Service
+
+Shared Excel/PDF helpers for the report endpoints. Rows are read with a
+server-side cursor (`yield_per`) and written straight into an openpyxl
+write-only workbook whose column widths are declared up front, so no
+DataFrame, ORM object list or cell-by-cell auto-size pass is ever held in
+memory. The finished file is spooled (to disk once it grows past
+SPOOL_MAX_MEMORY) and sent to the client as a chunked response.
+"""
+
+from dataclasses import dataclass
+from itertools import chain
+from tempfile import SpooledTemporaryFile
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from flask import Response
+from fpdf import FPDF
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+
+EXPORT_CHUNK_SIZE = 1000
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+RESPONSE_CHUNK_SIZE = 64 * 1024
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+PDF_MIMETYPE = 'application/pdf'
+
+HEADER_FILL_COLOR = "ADD8E6"
+TOTAL_FILL_COLOR = "E6E6E6"
+HEADER_FILL_RGB = (173, 216, 230)
+
+
+@dataclass(frozen=True)
+class ExportColumn:
+    """One report column; widths are fixed so nothing is measured per cell"""
+    header: str
+    width: float = 15       # Excel width in characters
+    pdf_width: float = 30   # PDF cell width in mm
+    align: str = 'L'        # PDF cell alignment
+
+
+def stream_query(query, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator:
+    """Iterate a query through a server-side cursor, chunk_size rows at a time"""
+    return iter(query.yield_per(chunk_size))
+
+
+def peek(rows: Iterable) -> Tuple[bool, Iterator]:
+    """Return (has_rows, iterator) without losing the first row"""
+    iterator = iter(rows)
+    first = next(iterator, None)
+    if first is None:
+        return False, iter(())
+    return True, chain([first], iterator)
+
+
+def write_xlsx(sheet_name: str, columns: Sequence[ExportColumn], rows: Iterable[Sequence],
+               footer_rows: Optional[Callable[[], List[Sequence]]] = None) -> SpooledTemporaryFile:
+    """
+    Write rows into a write-only workbook and return the spooled file.
+
+    `footer_rows` is called after all rows were written (so it can return
+    totals accumulated while streaming) and is styled as a totals row.
+    """
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(title=sheet_name)
+
+    for index, column in enumerate(columns, start=1):
+        worksheet.column_dimensions[get_column_letter(index)].width = max(
+            column.width, len(column.header) + 2
+        )
+
+    header_font = Font(bold=True)
+    header_fill = PatternFill(start_color=HEADER_FILL_COLOR, end_color=HEADER_FILL_COLOR, fill_type="solid")
+    header_alignment = Alignment(horizontal='center', vertical='center')
+    worksheet.append([
+        _styled_cell(worksheet, column.header, header_font, header_fill, header_alignment)
+        for column in columns
+    ])
+
+    for row in rows:
+        worksheet.append(list(row))
+
+    if footer_rows:
+        total_fill = PatternFill(start_color=TOTAL_FILL_COLOR, end_color=TOTAL_FILL_COLOR, fill_type="solid")
+        for row in footer_rows():
+            worksheet.append([_styled_cell(worksheet, value, header_font, total_fill) for value in row])
+
+    output = SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+def _styled_cell(worksheet, value, font, fill, alignment=None) -> WriteOnlyCell:
+    cell = WriteOnlyCell(worksheet, value=value)
+    cell.font = font
+    cell.fill = fill
+    if alignment:
+        cell.alignment = alignment
+    return cell
+
+
+def new_pdf_report(title: str, subtitle: Optional[str] = None) -> FPDF:
+    """Start a report PDF with the standard centered title block"""
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+    pdf.set_font("Arial", style="B", size=16)
+    pdf.cell(200, 10, txt=title, ln=True, align='C')
+    pdf.ln(5)
+    if subtitle:
+        pdf.set_font("Arial", size=10)
+        pdf.cell(200, 10, txt=subtitle, ln=True, align='C')
+        pdf.ln(10)
+    return pdf
+
+
+def write_pdf_table(pdf: FPDF, columns: Sequence[ExportColumn], rows: Iterable[Sequence],
+                    footer_rows: Optional[Callable[[], List[Sequence]]] = None,
+                    row_height: float = 10) -> None:
+    """Write a header row plus streamed body rows (and optional totals) to the PDF"""
+    pdf.set_fill_color(*HEADER_FILL_RGB)
+    pdf.set_text_color(0, 0, 0)
+    pdf.set_font("Arial", style="B", size=10)
+    for column in columns:
+        pdf.cell(column.pdf_width, row_height, column.header, border=1, align='C', fill=True)
+    pdf.ln()
+
+    pdf.set_font("Arial", size=10)
+    for row in rows:
+        for column, value in zip(columns, row):
+            pdf.cell(column.pdf_width, row_height, _pdf_text(value), border=1, align=column.align)
+        pdf.ln()
+
+    if footer_rows:
+        pdf.set_font("Arial", style="B", size=10)
+        for row in footer_rows():
+            # A footer row may span several leading columns: (label, span), value, ...
+            label, span = row[0]
+            pdf.cell(sum(c.pdf_width for c in columns[:span]), row_height, _pdf_text(label),
+                     border=1, align='C', fill=True)
+            for column, value in zip(columns[span:], row[1:]):
+                pdf.cell(column.pdf_width, row_height, _pdf_text(value), border=1,
+                         align=column.align, fill=True)
+            pdf.ln()
+
+
+def _pdf_text(value) -> str:
+    return "" if value is None else str(value)
+
+
+def pdf_to_file(pdf: FPDF) -> SpooledTemporaryFile:
+    """Render the PDF into a spooled file (fpdf2 returns bytes, pyfpdf a latin-1 str)"""
+    content = pdf.output(dest='S')
+    if isinstance(content, str):
+        content = content.encode('latin-1')
+    output = SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    output.write(bytes(content))
+    output.seek(0)
+    return output
+
+
+def file_response(output: SpooledTemporaryFile, filename: str, mimetype: str) -> Response:
+    """Send a spooled export as a chunked attachment and close it afterwards"""
+    output.seek(0, 2)
+    size = output.tell()
+    output.seek(0)
+
+    def generate():
+        try:
+            while True:
+                chunk = output.read(RESPONSE_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            output.close()
+
+    return Response(
+        generate(),
+        mimetype=mimetype,
+        direct_passthrough=True,
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'Content-Length': str(size)
+        }
+    )
+
+
+def xlsx_response(sheet_name: str, columns: Sequence[ExportColumn], rows: Iterable[Sequence],
+                  filename: str, footer_rows: Optional[Callable[[], List[Sequence]]] = None) -> Response:
+    """Build a single-sheet workbook from streamed rows and send it"""
+    return file_response(write_xlsx(sheet_name, columns, rows, footer_rows), filename, XLSX_MIMETYPE)
+
+
+def pdf_response(pdf: FPDF, filename: str) -> Response:
+    """Send a finished PDF report"""
+    return file_response(pdf_to_file(pdf), filename, PDF_MIMETYPE)
@@ -0,0 +1,111 @@
+"""
+Unread Notification Counter
+
+Keeps one `notification_unread_counts` row per user so unread-count polls
+are a primary-key lookup instead of a COUNT(*) over `notifications`.
+Every write path of this service that creates, reads or deletes
+notifications adjusts the counter in the same transaction (the caller
+commits). A missing row is seeded from a real count on first read.
+
+Known drift: HealthCheck and Selling insert into the shared
+`notifications` table without touching the counter, so a badge can be
+short by their unread rows until the hourly `reconcile()` repairs every
+counter with one correlated UPDATE. The badge and the total of unread
+listings both read the counter; reads never repair it.
+"""
+
+from datetime import datetime
+from typing import Dict, Iterable
+import logging
+
+from sqlalchemy import and_, bindparam, case, func, select, update
+
+from app.models.notification import Notification, NotificationUnreadCount
+from app.database.database import db
+
+
+logger = logging.getLogger(__name__)
+
+
+class UnreadCounter:
+    """Write-through per-user unread counter"""
+
+    def __init__(self):
+        self.table = NotificationUnreadCount.__table__
+
+    @staticmethod
+    def count_unread(user_id: int) -> int:
+        """The real count, from notifications"""
+        return Notification.query.filter_by(user_id=user_id, is_read=False).count()
+
+    def get(self, user_id: int) -> int:
+        """Unread count of a user; seeds the counter row on first use"""
+        counter = db.session.get(NotificationUnreadCount, user_id)
+        if counter is not None:
+            return counter.unread_count
+
+        unread_count = self.count_unread(user_id)
+        try:
+            db.session.add(NotificationUnreadCount(
+                user_id=user_id, unread_count=unread_count, updated_at=datetime.utcnow()
+            ))
+            db.session.commit()
+        except Exception as e:
+            # Another request seeded it first (or the user no longer exists)
+            db.session.rollback()
+            logger.debug(f"Unread counter for user {user_id} not seeded: {e}")
+        return unread_count
+
+    def adjust(self, deltas: Dict[int, int]) -> None:
+        """
+        Apply {user_id: delta} in one executemany UPDATE, never going below
+        zero. Users without a counter row are skipped; their row is seeded
+        from a real count on the next read.
+        """
+        deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+
+        c = self.table.c
+        new_count = c.unread_count + bindparam('delta')
+        db.session.execute(
+            update(self.table).where(c.user_id == bindparam('b_user_id')).values(
+                unread_count=case((new_count < 0, 0), else_=new_count),
+                updated_at=datetime.utcnow()
+            ),
+            [{'b_user_id': user_id, 'delta': delta} for user_id, delta in deltas.items()]
+        )
+
+    def reset(self, user_ids: Iterable[int], unread_count: int = 0) -> None:
+        """Set counters outright (e.g. after clearing every notification)"""
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        c = self.table.c
+        db.session.execute(
+            update(self.table).where(c.user_id.in_(user_ids)).values(
+                unread_count=unread_count, updated_at=datetime.utcnow()
+            )
+        )
+
+    def reconcile(self) -> int:
+        """Repair every counter that drifted from the real count; returns how many"""
+        c = self.table.c
+        actual = select(func.count(Notification.id)).where(and_(
+            Notification.user_id == c.user_id,
+            Notification.is_read == False
+        )).scalar_subquery()
+
+        result = db.session.execute(
+            update(self.table).where(c.unread_count != actual).values(
+                unread_count=actual, updated_at=datetime.utcnow()
+            ).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        if result.rowcount:
+            logger.warning(f"Reconciled {result.rowcount} drifted unread counters")
+        return result.rowcount
+
+
+# Global counter instance
+unread_counter = UnreadCounter()
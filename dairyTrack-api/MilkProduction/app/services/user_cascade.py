@@ -0,0 +1,320 @@
+"""
+User Deletion Cascade
+
+Deleting a user has to clear every row that references it across the
+whole shared database (MilkProduction, HealthCheck, Selling and the feed
+tables). The foreign key graph is read from the catalog once per process
+and cached; from it a cascade plan is generated: an ordered list of
+set-based UPDATE ... SET NULL / DELETE statements, dependents first, each
+selecting its rows through the chain of foreign keys back to the user
+(`col IN (SELECT ... WHERE ... = :b_user_id)`). The plan runs in a single
+transaction, can be dry-run to report the rows each step would touch, and
+can run in the background for users with large histories.
+
+For every foreign key edge the plan nullifies when the database says
+ON DELETE SET NULL, or when the column is nullable and only records who
+did something (`*_by` columns, and the feed/stock tables that keep their
+history); otherwise the referencing rows are deleted, recursively. A self
+or circular reference can only be nullified; if it is not nullable the
+plan cannot be built and every deletion fails with CascadePlanError
+before anything is written.
+
+Milking sessions deleted with a milker are also taken out of the daily
+summaries (in the same transaction) and of the batch provenance cache,
+which both track sessions incrementally.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import logging
+import threading
+import time
+
+from sqlalchemy import bindparam, column, delete, func, inspect, select, table, tuple_, update
+
+from app.models.milking_sessions import MilkingSession
+from app.models.scheduler import JobRun
+from app.database.database import db
+from app.services.batch_provenance import batch_provenance
+from app.services.change_counter import change_counter
+from app.services.daily_summary import SummaryDelta, daily_summary_service
+from app.services.recipient_directory import recipient_directory
+from app.services.session_store import session_store
+from app.socket import socketio
+from app.socket.presence import current_worker
+
+
+logger = logging.getLogger(__name__)
+
+
+class CascadePlanError(Exception):
+    """The foreign key graph admits no safe deletion plan"""
+
+
+class ForeignKeyEdge(NamedTuple):
+    """`table.columns` references `referred_table.referred_columns`"""
+    table: str
+    columns: Tuple[str, ...]
+    referred_table: str
+    referred_columns: Tuple[str, ...]
+    nullable: bool
+    ondelete: Optional[str]
+
+
+class ForeignKeyGraph:
+    """Reflected tables (column names) and incoming foreign keys per table"""
+
+    def __init__(self, columns: Dict[str, List[str]], edges: List[ForeignKeyEdge]):
+        self.tables = {name: table(name, *(column(c) for c in cols)) for name, cols in columns.items()}
+        self.referencing: Dict[str, List[ForeignKeyEdge]] = {}
+        for edge in edges:
+            self.referencing.setdefault(edge.referred_table, []).append(edge)
+
+    @classmethod
+    def reflect(cls, engine) -> "ForeignKeyGraph":
+        inspector = inspect(engine)
+        columns, edges = {}, []
+        for table_name in inspector.get_table_names():
+            table_columns = inspector.get_columns(table_name)
+            columns[table_name] = [c['name'] for c in table_columns]
+            nullable = {c['name']: c.get('nullable', True) for c in table_columns}
+            for fk in inspector.get_foreign_keys(table_name):
+                constrained = tuple(fk.get('constrained_columns') or ())
+                if not constrained or not fk.get('referred_table'):
+                    continue
+                edges.append(ForeignKeyEdge(
+                    table_name, constrained, fk['referred_table'],
+                    tuple(fk.get('referred_columns') or ()),
+                    all(nullable.get(c, True) for c in constrained),
+                    ((fk.get('options') or {}).get('ondelete') or '').upper() or None
+                ))
+        return cls(columns, edges)
+
+
+@dataclass(frozen=True)
+class CascadeStep:
+    """One set-based statement of a cascade plan"""
+    table: str
+    columns: Tuple[str, ...]
+    action: str  # 'nullify' or 'delete'
+    statement: object
+    count_statement: object
+    target: object
+    where: object
+
+    @property
+    def key(self) -> str:
+        suffix = 'nullified' if self.action == UserCascade.NULLIFY else 'deleted'
+        return f"{self.table}.{','.join(self.columns)}_{suffix}"
+
+
+class UserCascade:
+    """Plans and runs the deletion of a user and everything that references it"""
+
+    NULLIFY = 'nullify'
+    DELETE = 'delete'
+
+    ROOT_TABLE = 'users'
+    # Sessions are also counted in daily_milk_summary and batch provenance
+    SESSIONS_TABLE = 'milking_sessions'
+    # Tables whose rows outlive their author: nullable user references are cleared
+    KEEP_HISTORY_TABLES = frozenset({
+        'feed_stock_history', 'nutritions', 'feed_type', 'feed', 'daily_feed_schedule',
+        'daily_feed_items', 'product_stock', 'feed_stock'
+    })
+    # User columns without a foreign key constraint (rows are deleted)
+    UNLINKED_USER_COLUMNS = (('notifications_archive', 'user_id'),)
+
+    def __init__(self):
+        self.app = None
+        self._lock = threading.Lock()
+        self._graph: Optional[ForeignKeyGraph] = None
+        self._graph_built_at: Optional[str] = None
+        self._plan: Optional[List[CascadeStep]] = None
+
+    def init_app(self, app):
+        self.app = app
+
+    def graph(self) -> ForeignKeyGraph:
+        """The cached foreign key graph (reflected on first use)"""
+        with self._lock:
+            if self._graph is None:
+                started = time.perf_counter()
+                self._graph = ForeignKeyGraph.reflect(db.engine)
+                self._graph_built_at = datetime.utcnow().isoformat()
+                logger.info(f"Reflected foreign key graph of {len(self._graph.tables)} tables "
+                            f"in {(time.perf_counter() - started) * 1000:.0f} ms")
+            return self._graph
+
+    def refresh(self) -> None:
+        """Forget the cached graph (after a migration changed the schema)"""
+        with self._lock:
+            self._graph = None
+            self._plan = None
+
+    def _action(self, edge: ForeignKeyEdge) -> str:
+        if edge.ondelete == 'SET NULL':
+            return self.NULLIFY
+        if edge.ondelete == 'CASCADE' or not edge.nullable:
+            return self.DELETE
+        if edge.table in self.KEEP_HISTORY_TABLES or any('_by' in c for c in edge.columns):
+            return self.NULLIFY
+        return self.DELETE
+
+    def plan(self) -> List[CascadeStep]:
+        """Ordered steps deleting the user bound as :b_user_id, dependents first (cached)"""
+        plan = self._plan
+        if plan is None:
+            plan = self._plan = self._build_plan(self.graph())
+        return plan
+
+    def _build_plan(self, graph: ForeignKeyGraph) -> List[CascadeStep]:
+        users = graph.tables[self.ROOT_TABLE]
+        steps: List[CascadeStep] = []
+
+        for table_name, column_name in self.UNLINKED_USER_COLUMNS:
+            if table_name in graph.tables:
+                target = graph.tables[table_name]
+                steps.append(self._step(target, (column_name,), self.DELETE,
+                                        target.c[column_name] == bindparam('b_user_id')))
+
+        self._plan_delete(graph, users, ('id',), users.c.id == bindparam('b_user_id'), (self.ROOT_TABLE,), steps)
+        return steps
+
+    def _plan_delete(self, graph: ForeignKeyGraph, target, via: Tuple[str, ...], where,
+                     path: Tuple[str, ...], steps: List[CascadeStep]) -> None:
+        """
+        Append the steps clearing references to the `target` rows matching
+        `where` (reached through its `via` columns), then their delete
+        """
+        for edge in graph.referencing.get(target.name, ()):
+            child = graph.tables[edge.table]
+            circular = edge.table in path
+            parents = select(*(target.c[c] for c in edge.referred_columns)).where(where)
+            if circular:
+                # Self or circular reference: the statement's own table is in the
+                # subquery, which MySQL only accepts from a materialized derived
+                # table (DISTINCT keeps the optimizer from merging it back)
+                derived = parents.distinct().subquery()
+                parents = select(*derived.c)
+            if len(edge.columns) == 1:
+                child_match = child.c[edge.columns[0]].in_(parents)
+            else:
+                child_match = tuple_(*(child.c[c] for c in edge.columns)).in_(parents)
+
+            action = self._action(edge)
+            if action == self.DELETE and circular:
+                # Deleting would recurse forever; the reference can only be cleared
+                if not edge.nullable:
+                    raise CascadePlanError(
+                        f"Cannot cascade user deletion through the non-nullable circular "
+                        f"reference {edge.table}.{','.join(edge.columns)} -> {target.name}"
+                    )
+                action = self.NULLIFY
+
+            if action == self.NULLIFY:
+                steps.append(self._step(child, edge.columns, self.NULLIFY, child_match))
+            else:
+                self._plan_delete(graph, child, edge.columns, child_match, path + (edge.table,), steps)
+
+        steps.append(self._step(target, via, self.DELETE, where))
+
+    def _step(self, target, columns: Tuple[str, ...], action: str, where) -> CascadeStep:
+        if action == self.NULLIFY:
+            statement = update(target).where(where).values({c: None for c in columns})
+        else:
+            statement = delete(target).where(where)
+        return CascadeStep(
+            target.name, columns, action, statement,
+            select(func.count()).select_from(target).where(where), target, where
+        )
+
+    def _deleted_sessions(self, user_id: int) -> List:
+        """Milking sessions the plan deletes: (id, cow_id, milking_time, volume, milk_batch_id)"""
+        sessions = {}
+        for step in self.plan():
+            if step.table != self.SESSIONS_TABLE or step.action != self.DELETE:
+                continue
+            for row in db.session.execute(
+                select(
+                    MilkingSession.id, MilkingSession.cow_id, MilkingSession.milking_time,
+                    MilkingSession.volume, MilkingSession.milk_batch_id
+                ).where(MilkingSession.id.in_(select(step.target.c.id).where(step.where))),
+                {'b_user_id': user_id}
+            ):
+                sessions[row.id] = row
+        return list(sessions.values())
+
+    def dry_run(self, user_id: int) -> Dict[str, int]:
+        """Rows each step would touch, without changing anything"""
+        counts: Dict[str, int] = {}
+        for step in self.plan():
+            count = db.session.execute(step.count_statement, {'b_user_id': user_id}).scalar()
+            counts[step.key] = counts.get(step.key, 0) + count
+        return counts
+
+    def execute(self, user_id: int) -> Dict[str, int]:
+        """Run the whole plan in one transaction; returns rows touched per step"""
+        summary: Dict[str, int] = {}
+        try:
+            sessions = self._deleted_sessions(user_id)
+            for step in self.plan():
+                result = db.session.execute(step.statement, {'b_user_id': user_id})
+                summary[step.key] = summary.get(step.key, 0) + result.rowcount
+            daily_summary_service.apply_deltas(
+                SummaryDelta.for_session(row.cow_id, row.milking_time, row.volume, sign=-1)
+                for row in sessions
+            )
+            change_counter.bump('users', 'user_cow_association')
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        batch_provenance.forget({row.milk_batch_id for row in sessions})
+        recipient_directory.invalidate()
+        session_store.forget_user(user_id)
+        return summary
+
+    def execute_async(self, user_id: int) -> JobRun:
+        """Record a running job and execute the plan on a background task"""
+        run = JobRun(
+            job_id=f"delete_user:{user_id}", worker=current_worker(),
+            status='running', started_at=datetime.utcnow()
+        )
+        db.session.add(run)
+        db.session.commit()
+        socketio.start_background_task(self._run_in_background, run.id, user_id)
+        return run
+
+    def _run_in_background(self, run_id: int, user_id: int) -> None:
+        with self.app.app_context():
+            started = time.perf_counter()
+            status, error, rows = 'success', None, 0
+            try:
+                rows = sum(self.execute(user_id).values())
+                logger.info(f"User {user_id} deleted in background ({rows} rows)")
+            except Exception as e:
+                status, error = 'failed', str(e)
+                logger.error(f"Background deletion of user {user_id} failed: {error}")
+
+            run = db.session.get(JobRun, run_id)
+            run.status = status
+            run.error = error
+            run.rows_scanned = rows
+            run.finished_at = datetime.utcnow()
+            run.duration_ms = round((time.perf_counter() - started) * 1000, 2)
+            db.session.commit()
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                'graph_built_at': self._graph_built_at,
+                'tables': len(self._graph.tables) if self._graph else None,
+                'plan_steps': len(self._plan) if self._plan else None
+            }
+
+
+# Global cascade instance
+user_cascade = UserCascade()
@@ -1,4 +1,6 @@
 from .manager import socketio, init_socketio, emit_notification
+from .outbox import outbox
+from .presence import presence
 from . import events  # Import to register event handlers
 
-__all__ = ['socketio', 'init_socketio', 'emit_notification']
\ No newline at end of file
+__all__ = ['socketio', 'init_socketio', 'emit_notification', 'outbox', 'presence']
\ No newline at end of file
@@ -1,10 +1,8 @@
 from flask_socketio import emit, join_room, leave_room
 from flask import request
-from .manager import socketio, user_clients
+from .manager import socketio
+from .presence import presence
 import logging
-from datetime import datetime  # Correct import
-
-connected_users = {}
 
 logger = logging.getLogger(__name__)
 
@@ -17,9 +15,8 @@ def handle_connect(auth):
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle user disconnect"""
-    session_id = request.sid
-    if session_id in connected_users:
-        user_data = connected_users[session_id]
+    user_data = presence.unregister(request.sid)
+    if user_data:
         user_id = user_data['user_id']
         role_id = user_data.get('role_id')
         
@@ -28,26 +25,19 @@ def handle_disconnect():
         if role_id:
             leave_room(f"role_{role_id}")
         
-        # Remove from connected users
-        del connected_users[session_id]
-        
         logging.info(f"User {user_id} disconnected")
 
 @socketio.on('register')
 def handle_register(data):
     """Register user for notifications"""
     try:
-        user_id = str(data.get('user_id'))
-        role_id = data.get('role_id')
+        user_id = _parse_id(data.get('user_id'))
+        role_id = _parse_id(data.get('role_id'))
         session_id = request.sid
         
         if user_id:
-            # Store user connection
-            connected_users[session_id] = {
-                'user_id': user_id,
-                'role_id': role_id,
-                'connected_at': datetime.utcnow().isoformat()
-            }
+            # Store user connection (shared by all workers)
+            presence.register(session_id, user_id, role_id)
             
             # Join user-specific room
             join_room(f"user_{user_id}")
@@ -69,14 +59,20 @@ def handle_register(data):
 @socketio.on('unregister')
 def handle_unregister(data):
     """Unregister a client for a specific user"""
-    user_id = str(data.get('user_id', ''))
+    user_id = _parse_id(data.get('user_id'))
     
-    if user_id in user_clients and request.sid in user_clients[user_id]:
-        user_clients[user_id].remove(request.sid)
+    if user_id and presence.unregister(request.sid):
         leave_room(f"user_{user_id}")
         logger.info(f"Client {request.sid} left room user_{user_id}")
         print(f"Client {request.sid} left room user_{user_id}")
 
+def _parse_id(value):
+    """User/role ids arrive as numbers or numeric strings"""
+    try:
+        return int(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
 def send_notification_to_user(user_id, notification_data):
     """Send notification to specific user"""
     try:
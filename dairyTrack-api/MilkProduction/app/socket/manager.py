@@ -1,17 +1,39 @@
 from flask_socketio import SocketIO
 
+from .outbox import outbox
+from .presence import presence
+
 # Create SocketIO instance
 socketio = SocketIO(cors_allowed_origins="*", async_mode='eventlet')
 
-# Connected clients tracking
-user_clients = {}
+DEFAULT_CHANNEL = 'flask-socketio'
 
 def init_socketio(app):
-    """Initialize SocketIO with the Flask app"""
-    socketio.init_app(app)
+    """
+    Initialize SocketIO with the Flask app.
+
+    SOCKETIO_MESSAGE_QUEUE (e.g. redis://host:6379/0, amqp://..., or
+    memory:// for a single-process test broker) makes every emit go through
+    the queue, so a notification created on any worker or by the scheduler
+    reaches clients connected to any other worker.
+    """
+    message_queue = app.config.get('SOCKETIO_MESSAGE_QUEUE')
+    if message_queue:
+        socketio.init_app(
+            app,
+            message_queue=message_queue,
+            channel=app.config.get('SOCKETIO_CHANNEL', DEFAULT_CHANNEL)
+        )
+    else:
+        socketio.init_app(app)
+    presence.init_app(app, socketio)
+    outbox.init_app(app, socketio)
     return socketio
 
 def emit_notification(user_id, notification):
-    """Emit notification to specific user"""
+    """Emit notification to specific user (coalesced per room in batch mode)"""
+    if outbox.batching:
+        outbox.enqueue(user_id, notification)
+        return
     room = f"user_{user_id}"
-    socketio.emit('new_notification', notification, room=room)
\ No newline at end of file
+    socketio.emit('new_notification', notification, room=room)
@@ -0,0 +1,105 @@
+"""
+Notification Outbox
+
+Coalesces real-time notifications per user room. The first notification
+for a room starts a short window (SOCKETIO_BATCH_WINDOW_MS, default 250);
+everything queued for that room until the window closes is sent as one
+`notifications_batch` event carrying the items and the user's unread
+count, so a sweep that creates dozens of notifications triggers one client
+update instead of one per notification.
+
+SOCKETIO_NOTIFICATION_MODE selects 'single' (one `new_notification` event
+per notification, the default for existing clients) or 'batch'.
+"""
+
+from typing import Dict, List
+import logging
+import threading
+
+from app.services.unread_counter import unread_counter
+
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationOutbox:
+    """Per-room buffer flushed as one notifications_batch event"""
+
+    SINGLE = 'single'
+    BATCH = 'batch'
+    DEFAULT_WINDOW_MS = 250
+
+    def __init__(self):
+        self.app = None
+        self.socketio = None
+        self.mode = self.SINGLE
+        self.window_seconds = self.DEFAULT_WINDOW_MS / 1000
+        self._lock = threading.Lock()
+        self._pending: Dict[int, List[Dict]] = {}
+        self._metrics = {'queued': 0, 'batches': 0}
+
+    def init_app(self, app, socketio):
+        self.app = app
+        self.socketio = socketio
+        self.mode = app.config.get('SOCKETIO_NOTIFICATION_MODE', self.SINGLE)
+        if self.mode not in (self.SINGLE, self.BATCH):
+            raise ValueError(f"Unknown SOCKETIO_NOTIFICATION_MODE '{self.mode}'. "
+                             f"Available: {self.SINGLE}, {self.BATCH}")
+        self.window_seconds = int(app.config.get(
+            'SOCKETIO_BATCH_WINDOW_MS', self.DEFAULT_WINDOW_MS
+        )) / 1000
+
+    @property
+    def batching(self) -> bool:
+        return self.mode == self.BATCH and self.socketio is not None
+
+    def enqueue(self, user_id: int, notification: Dict) -> None:
+        """Buffer a notification; the first one for a room schedules its flush"""
+        with self._lock:
+            items = self._pending.setdefault(user_id, [])
+            items.append(notification)
+            self._metrics['queued'] += 1
+            first = len(items) == 1
+        if first:
+            self.socketio.start_background_task(self._flush_after_window, user_id)
+
+    def _flush_after_window(self, user_id: int) -> None:
+        self.socketio.sleep(self.window_seconds)
+        self.flush(user_id)
+
+    def flush(self, user_id: int) -> int:
+        """Send everything buffered for the room now; returns the item count"""
+        with self._lock:
+            items = self._pending.pop(user_id, [])
+        if not items:
+            return 0
+
+        try:
+            with self.app.app_context():
+                unread_count = unread_counter.get(user_id)
+        except Exception as e:
+            logger.error(f"Failed to count unread notifications for user {user_id}: {e}")
+            unread_count = None
+
+        self.socketio.emit('notifications_batch', {
+            'user_id': user_id,
+            'items': items,
+            'count': len(items),
+            'unread_count': unread_count
+        }, room=f"user_{user_id}")
+        with self._lock:
+            self._metrics['batches'] += 1
+        return len(items)
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'window_ms': int(self.window_seconds * 1000),
+                'pending_rooms': len(self._pending),
+                **self._metrics
+            }
+
+
+# Global outbox instance
+outbox = NotificationOutbox()
@@ -0,0 +1,265 @@
+"""
+Socket.IO Presence
+
+Tracks which users have a registered Socket.IO connection. Behind a
+message queue each worker only holds its own sockets, so presence is kept
+in a store every worker shares (the `socket_presence` table); the local
+store keeps the single-process behaviour. Rows carry the worker id so a
+worker removes its own connections when it shuts down. A worker that
+crashes cannot do that, so every worker also refreshes `last_seen` on its
+rows each SOCKETIO_PRESENCE_HEARTBEAT_SECONDS: rows not seen for
+SOCKETIO_PRESENCE_TTL_SECONDS no longer count as online and are purged.
+"""
+
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Set
+import atexit
+import logging
+import os
+import platform
+import threading
+
+from sqlalchemy import func
+
+from app.models.socket_presence import SocketPresence
+from app.database.database import db
+
+
+logger = logging.getLogger(__name__)
+
+
+def current_worker() -> str:
+    """Id of this worker process (re-read after fork)"""
+    return f"{platform.node()}:{os.getpid()}"
+
+
+class PresenceStore(ABC):
+    """Storage for registered connections"""
+
+    name = 'base'
+    shared = False
+
+    @abstractmethod
+    def add(self, sid: str, user_id: int, role_id: Optional[int], worker: str) -> None:
+        """Register a connection of a user on a worker"""
+
+    @abstractmethod
+    def remove(self, sid: str) -> Optional[Dict]:
+        """Forget a connection; returns its entry if it was registered"""
+
+    @abstractmethod
+    def online_user_ids(self, user_ids: Iterable[int], seen_after: datetime) -> Set[int]:
+        """The users among user_ids with a registered connection seen after seen_after"""
+
+    @abstractmethod
+    def remove_worker(self, worker: str) -> int:
+        """Forget every connection of a worker; returns how many"""
+
+    def heartbeat(self, worker: str, seen_before: datetime) -> int:
+        """
+        Mark a worker's connections as seen now and purge connections not
+        seen since seen_before; returns how many were purged
+        """
+        return 0
+
+    def status(self) -> Dict:
+        return {'backend': self.name}
+
+
+class LocalPresenceStore(PresenceStore):
+    """Connections of this process only"""
+
+    name = 'memory'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._connections: Dict[str, Dict] = {}
+
+    def add(self, sid, user_id, role_id, worker):
+        with self._lock:
+            self._connections[sid] = {
+                'sid': sid,
+                'user_id': user_id,
+                'role_id': role_id,
+                'worker': worker,
+                'connected_at': datetime.utcnow().isoformat()
+            }
+
+    def remove(self, sid):
+        with self._lock:
+            return self._connections.pop(sid, None)
+
+    def online_user_ids(self, user_ids, seen_after):
+        # Only this process registers here, so every entry is alive
+        wanted = set(user_ids)
+        with self._lock:
+            return {entry['user_id'] for entry in self._connections.values() if entry['user_id'] in wanted}
+
+    def remove_worker(self, worker):
+        with self._lock:
+            sids = [sid for sid, entry in self._connections.items() if entry['worker'] == worker]
+            for sid in sids:
+                del self._connections[sid]
+        return len(sids)
+
+    def status(self):
+        with self._lock:
+            return {
+                'backend': self.name,
+                'connections': len(self._connections),
+                'users': len({entry['user_id'] for entry in self._connections.values()})
+            }
+
+
+class SqlPresenceStore(PresenceStore):
+    """Connections of every worker in the socket_presence table"""
+
+    name = 'sql'
+    shared = True
+
+    def add(self, sid, user_id, role_id, worker):
+        now = datetime.utcnow()
+        db.session.merge(SocketPresence(
+            sid=sid, user_id=user_id, role_id=role_id,
+            worker=worker, connected_at=now, last_seen=now
+        ))
+        db.session.commit()
+
+    def remove(self, sid):
+        connection = SocketPresence.query.get(sid)
+        if not connection:
+            return None
+        entry = connection.to_dict()
+        db.session.delete(connection)
+        db.session.commit()
+        return entry
+
+    def online_user_ids(self, user_ids, seen_after):
+        user_ids = set(user_ids)
+        if not user_ids:
+            return set()
+        rows = db.session.query(SocketPresence.user_id).filter(
+            SocketPresence.user_id.in_(user_ids),
+            SocketPresence.last_seen >= seen_after
+        ).distinct().all()
+        return {row.user_id for row in rows}
+
+    def remove_worker(self, worker):
+        removed = SocketPresence.query.filter_by(worker=worker).delete()
+        db.session.commit()
+        return removed
+
+    def heartbeat(self, worker, seen_before):
+        SocketPresence.query.filter_by(worker=worker).update(
+            {SocketPresence.last_seen: datetime.utcnow()}, synchronize_session=False
+        )
+        purged = SocketPresence.query.filter(
+            SocketPresence.last_seen < seen_before
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return purged
+
+    def status(self):
+        connections, users = db.session.query(
+            func.count(SocketPresence.sid), func.count(func.distinct(SocketPresence.user_id))
+        ).one()
+        return {'backend': self.name, 'connections': connections, 'users': users}
+
+
+PRESENCE_STORES = {
+    LocalPresenceStore.name: LocalPresenceStore,
+    SqlPresenceStore.name: SqlPresenceStore,
+}
+
+
+class Presence:
+    """Presence registry used by the socket event handlers"""
+
+    DEFAULT_HEARTBEAT_SECONDS = 30
+    DEFAULT_TTL_SECONDS = 90
+
+    def __init__(self):
+        self.app = None
+        self.socketio = None
+        self.store: PresenceStore = LocalPresenceStore()
+        self.heartbeat_seconds = self.DEFAULT_HEARTBEAT_SECONDS
+        self.ttl_seconds = self.DEFAULT_TTL_SECONDS
+        self._atexit_registered = False
+        self._heartbeat_started = False
+
+    def init_app(self, app, socketio):
+        """
+        Pick the store: SOCKETIO_PRESENCE_BACKEND, or 'sql' whenever a
+        message queue is configured (presence must then be shared).
+        """
+        self.app = app
+        self.socketio = socketio
+        self.heartbeat_seconds = float(app.config.get(
+            'SOCKETIO_PRESENCE_HEARTBEAT_SECONDS', self.DEFAULT_HEARTBEAT_SECONDS
+        ))
+        self.ttl_seconds = float(app.config.get('SOCKETIO_PRESENCE_TTL_SECONDS', self.DEFAULT_TTL_SECONDS))
+        name = app.config.get('SOCKETIO_PRESENCE_BACKEND') or (
+            SqlPresenceStore.name if app.config.get('SOCKETIO_MESSAGE_QUEUE') else LocalPresenceStore.name
+        )
+        try:
+            self.store = PRESENCE_STORES[name]()
+        except KeyError:
+            raise ValueError(f"Unknown presence backend '{name}'. "
+                             f"Available: {', '.join(sorted(PRESENCE_STORES))}")
+
+        if not self._atexit_registered:
+            atexit.register(self.shutdown)
+            self._atexit_registered = True
+
+        if self.store.shared and not self._heartbeat_started:
+            # Rows left by an earlier process with this worker id (pid reuse)
+            try:
+                with app.app_context():
+                    self.store.remove_worker(current_worker())
+            except Exception as e:
+                logger.warning(f"Could not clear earlier socket presence of {current_worker()}: {e}")
+            socketio.start_background_task(self._heartbeat_loop)
+            self._heartbeat_started = True
+
+    def _heartbeat_loop(self) -> None:
+        while True:
+            self.socketio.sleep(self.heartbeat_seconds)
+            try:
+                with self.app.app_context():
+                    purged = self.store.heartbeat(current_worker(), self._seen_after())
+                if purged:
+                    logger.info(f"Purged {purged} socket connections of unresponsive workers")
+            except Exception as e:
+                logger.error(f"Socket presence heartbeat failed: {e}")
+
+    def _seen_after(self) -> datetime:
+        return datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+
+    def register(self, sid: str, user_id: int, role_id: Optional[int] = None) -> None:
+        self.store.add(sid, user_id, role_id, current_worker())
+
+    def unregister(self, sid: str) -> Optional[Dict]:
+        return self.store.remove(sid)
+
+    def online_user_ids(self, user_ids: Iterable[int]) -> Set[int]:
+        return self.store.online_user_ids(user_ids, self._seen_after())
+
+    def shutdown(self) -> None:
+        """Drop this worker's connections so other workers stop counting them"""
+        if not self.app:
+            return
+        try:
+            with self.app.app_context():
+                removed = self.store.remove_worker(current_worker())
+            if removed:
+                logger.info(f"Removed {removed} socket connections of worker {current_worker()}")
+        except Exception as e:
+            logger.error(f"Failed to remove socket presence of worker {current_worker()}: {e}")
+
+    def status(self) -> Dict:
+        return dict(self.store.status(), worker=current_worker(), ttl_seconds=self.ttl_seconds)
+
+
+# Global presence registry
+presence = Presence()
@@ -0,0 +1,114 @@
+"""
+Password hash throughput benchmark
+
+Measures how many logins per second a password hash policy allows: each
+thread verifies a hash written under the policy in a loop (what a login
+costs the API worker), and the benchmark reports verifications per second
+for 1..--threads threads and per core. With --server-url it also posts
+logins to a running API server from --threads client threads.
+
+    python benchmarks/password_hash_throughput.py --method pbkdf2:sha256:260000 --threads 4
+    python benchmarks/password_hash_throughput.py --server-url http://localhost:5000 \\
+        --username admin --password admin123 --threads 8
+
+The policy defaults to PASSWORD_HASH_METHOD / PASSWORD_HASH_SALT_LENGTH
+from the environment, as configured for the API.
+"""
+
+import argparse
+import os
+import threading
+import time
+
+
+def run_verifier(pwhash, password, deadline, results):
+    from werkzeug.security import check_password_hash
+
+    count = 0
+    while time.perf_counter() < deadline:
+        check_password_hash(pwhash, password)
+        count += 1
+    results.append(count)
+
+
+def measure_hashing(method, salt_length, threads, seconds):
+    """Verifications per second with `threads` threads"""
+    from werkzeug.security import generate_password_hash
+
+    password = 'benchmark-password'
+    pwhash = generate_password_hash(password, method, salt_length)
+    results = []
+    deadline = time.perf_counter() + seconds
+    workers = [
+        threading.Thread(target=run_verifier, args=(pwhash, password, deadline, results))
+        for _ in range(threads)
+    ]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return sum(results) / (time.perf_counter() - started), pwhash.split('$', 1)[0]
+
+
+def run_client(server_url, username, password, deadline, results):
+    import requests
+
+    session = requests.Session()
+    ok = failed = 0
+    while time.perf_counter() < deadline:
+        response = session.post(f"{server_url}/auth/login", json={'username': username, 'password': password})
+        if response.status_code == 200:
+            ok += 1
+        else:
+            failed += 1
+    results.append((ok, failed))
+
+
+def measure_server(server_url, username, password, threads, seconds):
+    results = []
+    deadline = time.perf_counter() + seconds
+    clients = [
+        threading.Thread(target=run_client, args=(server_url, username, password, deadline, results))
+        for _ in range(threads)
+    ]
+    started = time.perf_counter()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - started
+    ok = sum(r[0] for r in results)
+    failed = sum(r[1] for r in results)
+    return ok / elapsed, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--method', default=os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:260000'),
+                        help="werkzeug hash method, e.g. pbkdf2:sha256:260000")
+    parser.add_argument('--salt-length', type=int, default=int(os.environ.get('PASSWORD_HASH_SALT_LENGTH', 16)))
+    parser.add_argument('--threads', type=int, default=os.cpu_count() or 1,
+                        help="Highest number of verifying threads (or login clients)")
+    parser.add_argument('--seconds', type=float, default=3.0, help="Duration of each measurement")
+    parser.add_argument('--server-url', help="Running API server to post logins to")
+    parser.add_argument('--username')
+    parser.add_argument('--password')
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    print(f"{'threads':>7} {'logins/s':>10} {'per core':>10}")
+    for threads in sorted({1, *range(2, args.threads + 1, 2), args.threads}):
+        rate, signature = measure_hashing(args.method, args.salt_length, threads, args.seconds)
+        print(f"{threads:>7} {rate:>10.1f} {rate / min(threads, cores):>10.1f}")
+    print(f"policy {signature}, salt length {args.salt_length}, {cores} cores")
+
+    if args.server_url:
+        if not args.username or not args.password:
+            parser.error("--server-url needs --username and --password")
+        rate, failed = measure_server(args.server_url, args.username, args.password, args.threads, args.seconds)
+        print(f"server {rate:.1f} logins/s with {args.threads} clients ({failed} failed)")
+
+
+if __name__ == '__main__':
+    main()
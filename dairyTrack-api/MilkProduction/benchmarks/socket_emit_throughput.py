@@ -0,0 +1,129 @@
+"""
+Socket.IO emit throughput benchmark
+
+Starts N emitter workers that publish `new_notification` events through a
+Socket.IO message queue - the same path every API worker and the scheduler
+use once SOCKETIO_MESSAGE_QUEUE is set - and reports emits per second per
+worker and in aggregate. With --server-url, one Socket.IO client per target
+user registers on a running API server and the benchmark also reports how
+many notifications were delivered end to end, and how fast.
+
+    python benchmarks/socket_emit_throughput.py --message-queue redis://localhost:6379/0 \\
+        --workers 4 --messages 5000 --users 20 --server-url http://localhost:5000
+
+memory:// (kombu's in-process broker) runs the workers as threads of one
+process, which is enough to check the setup without a broker.
+"""
+
+import argparse
+import multiprocessing
+import queue
+import threading
+import time
+
+
+def run_emitter(worker, message_queue, channel, messages, users, results):
+    """Publish `messages` notifications round-robin over `users` rooms"""
+    from flask_socketio import SocketIO
+
+    # No app: a write-only emitter that only publishes to the queue
+    emitter = SocketIO(message_queue=message_queue, channel=channel, async_mode='threading')
+    started = time.perf_counter()
+    for index in range(messages):
+        user_id = (worker * messages + index) % users + 1
+        emitter.emit('new_notification', {
+            'id': index,
+            'user_id': user_id,
+            'cow_id': 1,
+            'message': f"Benchmark notification {worker}-{index}",
+            'type': 'benchmark',
+            'is_read': False
+        }, room=f"user_{user_id}")
+    results.put({'worker': worker, 'messages': messages, 'seconds': time.perf_counter() - started})
+
+
+class DeliveryCounter:
+    """One registered Socket.IO client per user, counting received notifications"""
+
+    def __init__(self, server_url, users):
+        import socketio
+
+        self.received = 0
+        self.last_received_at = None
+        self._lock = threading.Lock()
+        self.clients = []
+        for user_id in range(1, users + 1):
+            client = socketio.Client()
+            client.on('new_notification', self._on_notification)
+            client.connect(server_url)
+            client.emit('register', {'user_id': user_id})
+            self.clients.append(client)
+
+    def _on_notification(self, data):
+        with self._lock:
+            self.received += 1
+            self.last_received_at = time.perf_counter()
+
+    def wait_for(self, expected, timeout):
+        deadline = time.perf_counter() + timeout
+        while self.received < expected and time.perf_counter() < deadline:
+            time.sleep(0.05)
+
+    def close(self):
+        for client in self.clients:
+            client.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--message-queue', required=True,
+                        help="Queue URL, e.g. redis://localhost:6379/0, amqp://..., memory://")
+    parser.add_argument('--channel', default='flask-socketio', help="Must match SOCKETIO_CHANNEL")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--messages', type=int, default=1000, help="Emits per worker")
+    parser.add_argument('--users', type=int, default=20, help="Distinct target user rooms")
+    parser.add_argument('--server-url', help="Running API server to measure delivery against")
+    parser.add_argument('--drain-timeout', type=float, default=30.0,
+                        help="Seconds to wait for deliveries after the last emit")
+    args = parser.parse_args()
+
+    counter = DeliveryCounter(args.server_url, args.users) if args.server_url else None
+    if counter:
+        # Give the registrations time to reach the server
+        time.sleep(1)
+
+    in_process = args.message_queue.startswith('memory://')
+    results = queue.Queue() if in_process else multiprocessing.Queue()
+    worker_class = threading.Thread if in_process else multiprocessing.Process
+    workers = [
+        worker_class(target=run_emitter, args=(
+            index, args.message_queue, args.channel, args.messages, args.users, results
+        ))
+        for index in range(args.workers)
+    ]
+
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    emit_seconds = time.perf_counter() - started
+
+    total = args.workers * args.messages
+    print(f"{'worker':>6} {'emits':>8} {'seconds':>9} {'emits/s':>10}")
+    for _ in range(args.workers):
+        result = results.get()
+        print(f"{result['worker']:>6} {result['messages']:>8} {result['seconds']:>9.3f} "
+              f"{result['messages'] / result['seconds']:>10.0f}")
+    print(f"{'total':>6} {total:>8} {emit_seconds:>9.3f} {total / emit_seconds:>10.0f}")
+
+    if counter:
+        counter.wait_for(total, args.drain_timeout)
+        delivered_seconds = (counter.last_received_at or time.perf_counter()) - started
+        print(f"delivered {counter.received}/{total} in {delivered_seconds:.3f}s "
+              f"({counter.received / delivered_seconds:.0f}/s end to end)")
+        counter.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -16,3 +16,19 @@ class Config:
     
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JSON_SORT_KEYS = False
+
+    # Socket.IO: message queue shared by all workers (e.g. redis://localhost:6379/0)
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+    SOCKETIO_CHANNEL = os.environ.get('SOCKETIO_CHANNEL') or 'flask-socketio'
+    # Presence: 'memory' or 'sql' (default: 'sql' when a message queue is set)
+    SOCKETIO_PRESENCE_BACKEND = os.environ.get('SOCKETIO_PRESENCE_BACKEND')
+    SOCKETIO_PRESENCE_HEARTBEAT_SECONDS = float(os.environ.get('SOCKETIO_PRESENCE_HEARTBEAT_SECONDS') or 30)
+    SOCKETIO_PRESENCE_TTL_SECONDS = float(os.environ.get('SOCKETIO_PRESENCE_TTL_SECONDS') or 90)
+    # Notification emits: 'single' or 'batch' (coalesced per SOCKETIO_BATCH_WINDOW_MS)
+    SOCKETIO_NOTIFICATION_MODE = os.environ.get('SOCKETIO_NOTIFICATION_MODE') or 'single'
+    SOCKETIO_BATCH_WINDOW_MS = int(os.environ.get('SOCKETIO_BATCH_WINDOW_MS') or 250)
+
+    # Password hashing policy (werkzeug method, cost = iterations); see benchmarks/password_hash_throughput.py
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'pbkdf2:sha256:260000'
+    PASSWORD_HASH_SALT_LENGTH = int(os.environ.get('PASSWORD_HASH_SALT_LENGTH') or 16)
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or os.cpu_count() or 1)
@@ -0,0 +1,53 @@
+"""Unique (cow_id, date) on daily_milk_summary
+
+Revision ID: 5b7e2c9d1a34
+Revises: d66bd03740ab
+Create Date: 2025-06-02 09:12:41.530117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7e2c9d1a34'
+down_revision = 'd66bd03740ab'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Merge duplicate summaries left behind by concurrent read-modify-write
+    # updates before the unique key can be created.
+    bind = op.get_bind()
+    duplicates = bind.execute(sa.text(
+        "SELECT cow_id, date, MIN(id) AS keep_id, "
+        "SUM(morning_volume) AS morning_volume, "
+        "SUM(afternoon_volume) AS afternoon_volume, "
+        "SUM(evening_volume) AS evening_volume "
+        "FROM daily_milk_summary GROUP BY cow_id, date HAVING COUNT(*) > 1"
+    )).fetchall()
+
+    for row in duplicates:
+        bind.execute(sa.text(
+            "UPDATE daily_milk_summary SET morning_volume = :morning, "
+            "afternoon_volume = :afternoon, evening_volume = :evening, "
+            "total_volume = :morning + :afternoon + :evening WHERE id = :keep_id"
+        ), {
+            'morning': row.morning_volume or 0,
+            'afternoon': row.afternoon_volume or 0,
+            'evening': row.evening_volume or 0,
+            'keep_id': row.keep_id
+        })
+        bind.execute(sa.text(
+            "DELETE FROM daily_milk_summary "
+            "WHERE cow_id = :cow_id AND date = :date AND id <> :keep_id"
+        ), {'cow_id': row.cow_id, 'date': row.date, 'keep_id': row.keep_id})
+
+    with op.batch_alter_table('daily_milk_summary', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_daily_milk_summary_cow_date', ['cow_id', 'date'])
+
+
+def downgrade():
+    with op.batch_alter_table('daily_milk_summary', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_daily_milk_summary_cow_date', type_='unique')
@@ -0,0 +1,32 @@
+"""Add keyset pagination indexes for milking sessions and milk batches
+
+Revision ID: 8f3a6d21c5e7
+Revises: 5b7e2c9d1a34
+Create Date: 2025-06-04 14:26:03.418290
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f3a6d21c5e7'
+down_revision = '5b7e2c9d1a34'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('milking_sessions', schema=None) as batch_op:
+        batch_op.create_index('ix_milking_sessions_milking_time_id', ['milking_time', 'id'], unique=False)
+
+    with op.batch_alter_table('milk_batches', schema=None) as batch_op:
+        batch_op.create_index('ix_milk_batches_production_date_id', ['production_date', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('milk_batches', schema=None) as batch_op:
+        batch_op.drop_index('ix_milk_batches_production_date_id')
+
+    with op.batch_alter_table('milking_sessions', schema=None) as batch_op:
+        batch_op.drop_index('ix_milking_sessions_milking_time_id')
@@ -0,0 +1,38 @@
+"""Add socket_presence table for shared Socket.IO presence
+
+Revision ID: a8e3f5c1d7b4
+Revises: f1d4b7e9a260
+Create Date: 2025-06-08 09:47:31.205816
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8e3f5c1d7b4'
+down_revision = 'f1d4b7e9a260'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('socket_presence',
+    sa.Column('sid', sa.String(length=64), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('role_id', sa.Integer(), nullable=True),
+    sa.Column('worker', sa.String(length=128), nullable=False),
+    sa.Column('connected_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('sid')
+    )
+    with op.batch_alter_table('socket_presence', schema=None) as batch_op:
+        batch_op.create_index('ix_socket_presence_user_id', ['user_id'], unique=False)
+        batch_op.create_index('ix_socket_presence_worker', ['worker'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('socket_presence', schema=None) as batch_op:
+        batch_op.drop_index('ix_socket_presence_worker')
+        batch_op.drop_index('ix_socket_presence_user_id')
+
+    op.drop_table('socket_presence')
@@ -0,0 +1,36 @@
+"""Add notification_unread_counts counter table
+
+Revision ID: b6f2d9e4a135
+Revises: a8e3f5c1d7b4
+Create Date: 2025-06-08 15:22:09.873402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6f2d9e4a135'
+down_revision = 'a8e3f5c1d7b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('notification_unread_counts',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('unread_count', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    # Seed the counters from the current notifications
+    op.execute(
+        "INSERT INTO notification_unread_counts (user_id, unread_count, updated_at) "
+        "SELECT user_id, COUNT(*), CURRENT_TIMESTAMP FROM notifications "
+        "WHERE is_read = false GROUP BY user_id"
+    )
+
+
+def downgrade():
+    op.drop_table('notification_unread_counts')
@@ -0,0 +1,50 @@
+"""Add notifications_archive for notifications past retention
+
+Revision ID: c3a7e1f9b582
+Revises: b6f2d9e4a135
+Create Date: 2025-06-09 10:41:37.215846
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3a7e1f9b582'
+down_revision = 'b6f2d9e4a135'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('notifications_archive',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('notification_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('cow_id', sa.Integer(), nullable=True),
+    sa.Column('message', sa.Text(), nullable=False),
+    sa.Column('type', sa.String(length=30), nullable=False),
+    sa.Column('is_read', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at_wib', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('notifications_archive', schema=None) as batch_op:
+        batch_op.create_index('ix_notifications_archive_user_id_created_at', ['user_id', 'created_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_notifications_archive_notification_id'), ['notification_id'], unique=False)
+
+    # The retention sweep selects expired rows by age
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.create_index('ix_notifications_created_at', ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.drop_index('ix_notifications_created_at')
+
+    with op.batch_alter_table('notifications_archive', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_notifications_archive_notification_id'))
+        batch_op.drop_index('ix_notifications_archive_user_id_created_at')
+
+    op.drop_table('notifications_archive')
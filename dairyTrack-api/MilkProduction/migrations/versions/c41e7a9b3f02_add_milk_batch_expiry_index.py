@@ -0,0 +1,26 @@
+"""Add (status, expiry_date) index on milk batches for expiry scans
+
+Revision ID: c41e7a9b3f02
+Revises: 8f3a6d21c5e7
+Create Date: 2025-06-05 09:12:47.530116
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41e7a9b3f02'
+down_revision = '8f3a6d21c5e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('milk_batches', schema=None) as batch_op:
+        batch_op.create_index('ix_milk_batches_status_expiry_date', ['status', 'expiry_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('milk_batches', schema=None) as batch_op:
+        batch_op.drop_index('ix_milk_batches_status_expiry_date')
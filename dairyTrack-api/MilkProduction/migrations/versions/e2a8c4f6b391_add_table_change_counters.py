@@ -0,0 +1,33 @@
+"""Add table_change_counters for assignment view ETags
+
+Revision ID: e2a8c4f6b391
+Revises: d9f3b6a2e147
+Create Date: 2025-06-10 09:27:15.418302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a8c4f6b391'
+down_revision = 'd9f3b6a2e147'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    counters = op.create_table('table_change_counters',
+    sa.Column('table_name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+    op.bulk_insert(counters, [
+        {'table_name': name, 'version': 0}
+        for name in ('users', 'cows', 'user_cow_association')
+    ])
+
+
+def downgrade():
+    op.drop_table('table_change_counters')
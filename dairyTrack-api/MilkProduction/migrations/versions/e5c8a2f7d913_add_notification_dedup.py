@@ -0,0 +1,42 @@
+"""Add notification_dedup table and notifications read-path index
+
+Revision ID: e5c8a2f7d913
+Revises: d7b2e5a1c8f4
+Create Date: 2025-06-07 08:26:54.118734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5c8a2f7d913'
+down_revision = 'd7b2e5a1c8f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('notification_dedup',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('cow_id', sa.Integer(), nullable=False),
+    sa.Column('type', sa.String(length=20), nullable=False),
+    sa.Column('bucket_date', sa.Date(), nullable=False),
+    sa.Column('batch_number', sa.String(length=50), nullable=False),
+    sa.Column('notification_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['cow_id'], ['cows.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'cow_id', 'type', 'bucket_date', 'batch_number', name='uq_notification_dedup_key')
+    )
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.create_index('ix_notifications_user_id_is_read_created_at', ['user_id', 'is_read', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.drop_index('ix_notifications_user_id_is_read_created_at')
+
+    op.drop_table('notification_dedup')
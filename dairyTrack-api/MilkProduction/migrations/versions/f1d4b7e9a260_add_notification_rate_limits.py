@@ -0,0 +1,30 @@
+"""Add notification_rate_limits table for the shared rate limiter
+
+Revision ID: f1d4b7e9a260
+Revises: e5c8a2f7d913
+Create Date: 2025-06-07 14:03:12.640591
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1d4b7e9a260'
+down_revision = 'e5c8a2f7d913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('notification_rate_limits',
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('window_start', sa.DateTime(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('previous_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+
+
+def downgrade():
+    op.drop_table('notification_rate_limits')
@@ -0,0 +1,28 @@
+"""Add last_seen heartbeat to socket_presence
+
+Revision ID: f3b9d2c7a418
+Revises: e2a8c4f6b391
+Create Date: 2025-06-10 14:12:40.563927
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b9d2c7a418'
+down_revision = 'e2a8c4f6b391'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('socket_presence', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_seen', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False))
+        batch_op.create_index('ix_socket_presence_last_seen', ['last_seen'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('socket_presence', schema=None) as batch_op:
+        batch_op.drop_index('ix_socket_presence_last_seen')
+        batch_op.drop_column('last_seen')
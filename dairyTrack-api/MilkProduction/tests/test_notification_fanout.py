@@ -0,0 +1,99 @@
+"""
+Notification fan-out against MySQL
+
+Runs only when TEST_MYSQL_URI points at an empty, disposable MySQL
+database (its tables are created and dropped by the test):
+
+    TEST_MYSQL_URI=mysql+pymysql://root:@127.0.0.1/dairy_test python -m unittest tests.test_notification_fanout
+"""
+
+from datetime import date, timedelta
+import os
+import unittest
+
+TEST_MYSQL_URI = os.environ.get('TEST_MYSQL_URI')
+
+
+@unittest.skipUnless(TEST_MYSQL_URI, "TEST_MYSQL_URI is not set")
+class NotificationFanOutMySQLTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        os.environ['DATABASE_URI'] = TEST_MYSQL_URI
+        from app import create_app
+        from app.database.database import db
+        from app.services.notificationScheduler import notification_scheduler
+
+        from app.models import Cow, Role, User
+
+        cls.app, _ = create_app()
+        cls.db = db
+        with cls.app.app_context():
+            db.drop_all()
+            db.create_all()
+            notification_scheduler.shutdown()
+
+            role = Role(name='Farmer')
+            db.session.add(role)
+            db.session.flush()
+            users = [
+                User(name=f'u{i}', username=f'fanout{i}', email=f'fanout{i}@test', password='x', role_id=role.id)
+                for i in range(3)
+            ]
+            cow = Cow(name='fanout', birth=date(2020, 1, 1), breed='Girolando', gender='Female')
+            db.session.add_all([*users, cow])
+            db.session.commit()
+            cls.user_ids = [user.id for user in users]
+            cls.cow_id = cow.id
+
+    @classmethod
+    def tearDownClass(cls):
+        with cls.app.app_context():
+            cls.db.session.remove()
+            cls.db.drop_all()
+
+    def setUp(self):
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+    def tearDown(self):
+        from app.models import Notification, NotificationUnreadCount
+        from app.services.notification_dedup import notification_dedup
+
+        self.db.session.rollback()
+        notification_dedup.purge_before(date.today() + timedelta(days=1))
+        Notification.query.delete()
+        NotificationUnreadCount.query.delete()
+        self.db.session.commit()
+        self.ctx.pop()
+
+    def test_inserted_rows_get_their_ids(self):
+        from app.models import Notification
+        from app.services.notification import notification_service
+
+        fan_out = notification_service.new_fan_out()
+        fan_out.add(self.user_ids, 'first', 'low_production', cow_id=self.cow_id)
+        fan_out.add(self.user_ids, 'second', 'high_production', cow_id=self.cow_id)
+        rows = list(fan_out._rows)
+        self.assertEqual(fan_out.flush(), 6)
+
+        self.assertTrue(all(row['id'] is not None for row in rows))
+        stored = {n.id: (n.user_id, n.message) for n in Notification.query.all()}
+        self.assertEqual({row['id']: (row['user_id'], row['message']) for row in rows}, stored)
+
+    def test_refresh_updates_the_recorded_row(self):
+        from app.models import Notification
+        from app.services.notification import notification_service
+
+        for volume in (10, 12):
+            fan_out = notification_service.new_fan_out()
+            fan_out.add(self.user_ids[:1], f'volume {volume}', 'production_increase',
+                        cow_id=self.cow_id, replace_on=date.today())
+            fan_out.flush()
+
+        notifications = Notification.query.filter_by(type='production_increase').all()
+        self.assertEqual([n.message for n in notifications], ['volume 12'])
+
+
+if __name__ == '__main__':
+    unittest.main()
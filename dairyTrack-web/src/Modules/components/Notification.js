@@ -29,6 +29,7 @@ const NotificationDropdown = React.memo(() => {
     notifications,
     unreadCount,
     markAsRead,
+    markAllAsRead,
     fetchNotifications,
     clearAllNotifications,
   } = useSocket();
@@ -402,10 +403,8 @@ const NotificationDropdown = React.memo(() => {
   );
 
   const handleMarkAllAsRead = useCallback(() => {
-    notifications.forEach((n) => {
-      if (!n.is_read) markAsRead(n.id);
-    });
-  }, [notifications, markAsRead]);
+    markAllAsRead();
+  }, [markAllAsRead]);
 
   const formatTimeAgo = useCallback((dateString) => {
     try {
@@ -113,6 +113,28 @@ export const SocketProvider = ({ children }) => {
     [userId]
   );
 
+  // Fungsi untuk menandai semua notifikasi sudah dibaca (satu request)
+  const markAllAsRead = useCallback(async () => {
+    if (!userId) return;
+
+    try {
+      const response = await fetch(`${API_URL1}/notification/read-all`, {
+        method: "PUT",
+        headers: {
+          "Content-Type": "application/json",
+        },
+        body: JSON.stringify({ user_id: userId }),
+      });
+
+      if (response.ok) {
+        setNotifications((prev) => prev.map((n) => ({ ...n, is_read: true })));
+        setUnreadCount(0);
+      }
+    } catch (error) {
+      console.error("Error marking all notifications as read:", error);
+    }
+  }, [userId]);
+
   // Fungsi untuk menghapus semua notifikasi
   const clearAllNotifications = useCallback(async () => {
     if (!userId) return;
@@ -203,7 +225,9 @@ export const SocketProvider = ({ children }) => {
       if (String(notification.user_id) === String(userId)) {
         setNotifications((prev) => {
           // Cegah duplikasi notifikasi
-          const exists = prev.find((n) => n.id === notification.id);
+          const exists =
+            notification.id != null &&
+            prev.find((n) => n.id === notification.id);
           if (exists) {
             return prev;
           }
@@ -221,6 +245,46 @@ export const SocketProvider = ({ children }) => {
       }
     });
 
+    // Event menerima beberapa notifikasi sekaligus (mode batch di backend)
+    newSocket.on("notifications_batch", (batch) => {
+      console.log("Notification batch received:", batch);
+
+      // Hanya proses jika batch untuk user ini
+      if (String(batch.user_id) !== String(userId)) {
+        return;
+      }
+
+      const items = batch.items || [];
+      setNotifications((prev) => {
+        // Cegah duplikasi notifikasi (hanya yang punya id)
+        const knownIds = new Set(
+          prev.filter((n) => n.id != null).map((n) => n.id)
+        );
+        const fresh = items
+          .filter((n) => n.id == null || !knownIds.has(n.id))
+          .reverse();
+        return fresh.length ? [...fresh, ...prev] : prev;
+      });
+
+      // Backend mengirim jumlah belum dibaca terbaru, tidak perlu refetch
+      if (typeof batch.unread_count === "number") {
+        setUnreadCount(batch.unread_count);
+      } else {
+        setUnreadCount((count) => count + items.length);
+      }
+
+      // Satu browser notification untuk seluruh batch
+      if (items.length && Notification.permission === "granted") {
+        new Notification("New DairyTrack Notification", {
+          body:
+            items.length === 1
+              ? items[0].message
+              : `${items.length} new notifications`,
+          icon: "/favicon.ico",
+        });
+      }
+    });
+
     // Fetch notifikasi awal saat socket connect
     fetchNotifications(userId);
 
@@ -239,6 +303,7 @@ export const SocketProvider = ({ children }) => {
       unreadCount,
       loading,
       markAsRead,
+      markAllAsRead,
       clearAllNotifications,
       fetchNotifications: () => fetchNotifications(userId),
     }),
@@ -248,6 +313,7 @@ export const SocketProvider = ({ children }) => {
       unreadCount,
       loading,
       markAsRead,
+      markAllAsRead,
       clearAllNotifications,
       fetchNotifications,
       userId,